@@ -0,0 +1,31 @@
+"""
+Token check for the operator endpoints under `/admin`.
+
+Set `ADMIN_TOKEN` and send it as the `X-Admin-Token` header. With no token
+configured the admin endpoints are disabled.
+"""
+import hmac
+import os
+
+
+class AdminError(Exception):
+    def __init__(self, detail: str, status_code: int):
+        super().__init__(detail)
+        self.status_code = status_code
+
+
+def admin_token() -> str | None:
+    return os.environ.get("ADMIN_TOKEN", "").strip() or None
+
+
+def is_admin(token: str | None) -> bool:
+    expected = admin_token()
+    return bool(expected and token and hmac.compare_digest(token.encode(), expected.encode()))
+
+
+def require_admin(token: str | None) -> None:
+    """Raise `AdminError` unless `token` matches `ADMIN_TOKEN`."""
+    if admin_token() is None:
+        raise AdminError("Admin endpoints are disabled; set ADMIN_TOKEN", 404)
+    if not is_admin(token):
+        raise AdminError("Invalid or missing X-Admin-Token", 401)
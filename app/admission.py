@@ -0,0 +1,169 @@
+"""
+Admission control and load shedding for the analysis endpoints.
+
+Each request is weighted by its item count and text length (`request_weight`).
+The controller tracks the weight in flight and a moving average of how long
+admitted requests waited for a worker thread, which decays (half-life 1 s)
+while no request reports a wait. Past the soft limits requests are
+still served, but without embeddings (`meta.degraded`); past the hard limits
+they are rejected with 503 and `Retry-After` before any work is queued. A
+request is always admitted when nothing else is in flight.
+
+Configured with `ADMISSION_SOFT_LIMIT` / `ADMISSION_HARD_LIMIT` (in-flight
+weight, default 32 / 128), `ADMISSION_SOFT_WAIT_MS` / `ADMISSION_HARD_WAIT_MS`
+(queue wait, default 250 / 2000) and `ADMISSION_RETRY_AFTER` (seconds,
+default 1).
+"""
+import os
+import threading
+import time
+from typing import Any, Callable
+
+# characters of text that weigh as much as one extra item
+_CHARS_PER_UNIT = 5000
+_WAIT_SMOOTHING = 0.2
+# the wait average halves every this many seconds without a new sample, so a
+# spike that got everything rejected can't keep rejecting an idle server
+_WAIT_HALF_LIFE = 1.0
+# in-flight weight is summed in integer millionths so a drain returns to exactly 0
+_UNITS = 1_000_000
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("Server is overloaded, retry later")
+        self.retry_after = retry_after
+
+
+def _units(weight: float) -> int:
+    return round(weight * _UNITS)
+
+
+def request_weight(texts: list[str]) -> float:
+    return sum(1 + len(text) / _CHARS_PER_UNIT for text in texts)
+
+
+class Ticket:
+    """
+    One admitted request; releases its weight when the `with` block exits, or,
+    if `run` is still going on a worker thread by then (the request was
+    cancelled), when that call returns. Work the client abandoned still counts
+    until it is done.
+    """
+
+    __slots__ = ("controller", "weight", "degraded", "admitted_at", "_running", "_closed")
+
+    def __init__(self, controller: "AdmissionController", weight: float, degraded: bool):
+        self.controller = controller
+        self.weight = weight
+        self.degraded = degraded
+        self.admitted_at = time.monotonic()
+        self._running = False
+        self._closed = False
+
+    def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Call `fn` on the worker thread, recording how long the request queued."""
+        self.controller._record_wait(time.monotonic() - self.admitted_at)
+        with self.controller._lock:
+            if self._closed:
+                # cancelled while queued for a thread: its weight is gone, so don't start
+                raise RuntimeError("Request was cancelled before it started")
+            self._running = True
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self.controller._lock:
+                self._running = False
+                release = self._closed
+            if release:
+                self.controller._release(self.weight)
+
+    def __enter__(self) -> "Ticket":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        with self.controller._lock:
+            self._closed = True
+            release = not self._running
+        if release:
+            self.controller._release(self.weight)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        soft_limit: float = 32,
+        hard_limit: float = 128,
+        soft_wait_ms: float = 250,
+        hard_wait_ms: float = 2000,
+        retry_after: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.soft_limit = soft_limit
+        self.hard_limit = hard_limit
+        self.soft_wait = soft_wait_ms / 1000
+        self.hard_wait = hard_wait_ms / 1000
+        self.retry_after = retry_after
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._wait = 0.0
+        self._wait_at = clock()
+
+    def admit(self, weight: float) -> Ticket:
+        """Admit a request of `weight`, possibly degraded; raise `Overloaded` past the hard limits."""
+        units = _units(weight)
+        with self._lock:
+            if self._in_flight <= 0:
+                # nothing queued ahead of this request, so no stale wait either
+                self._in_flight = 0
+                self._wait = 0.0
+                degraded = False
+            else:
+                load = (self._in_flight + units) / _UNITS
+                wait = self._decayed_wait()
+                if load > self.hard_limit or wait > self.hard_wait:
+                    raise Overloaded(self.retry_after)
+                degraded = load > self.soft_limit or wait > self.soft_wait
+            self._in_flight += units
+        return Ticket(self, weight, degraded)
+
+    def _release(self, weight: float) -> None:
+        with self._lock:
+            self._in_flight -= _units(weight)
+
+    def _decayed_wait(self) -> float:
+        """The wait average, decayed for the time since it was last updated. Call under the lock."""
+        now = self._clock()
+        self._wait *= 0.5 ** ((now - self._wait_at) / _WAIT_HALF_LIFE)
+        self._wait_at = now
+        return self._wait
+
+    def _record_wait(self, seconds: float) -> None:
+        with self._lock:
+            wait = self._decayed_wait()
+            self._wait = wait + _WAIT_SMOOTHING * (seconds - wait)
+
+    def snapshot(self) -> dict[str, float]:
+        with self._lock:
+            return {
+                "in_flight": round(self._in_flight / _UNITS, 3),
+                "queue_wait_ms": round(self._decayed_wait() * 1000, 1),
+            }
+
+
+_controller: AdmissionController | None = None
+
+
+def get_admission() -> AdmissionController:
+    """The process-wide controller, configured from the environment on first use."""
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController(
+            soft_limit=float(os.environ.get("ADMISSION_SOFT_LIMIT", 32)),
+            hard_limit=float(os.environ.get("ADMISSION_HARD_LIMIT", 128)),
+            soft_wait_ms=float(os.environ.get("ADMISSION_SOFT_WAIT_MS", 250)),
+            hard_wait_ms=float(os.environ.get("ADMISSION_HARD_WAIT_MS", 2000)),
+            retry_after=int(os.environ.get("ADMISSION_RETRY_AFTER", 1)),
+        )
+    return _controller
@@ -1,10 +1,242 @@
 import os
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Literal
 
-from app.models import AnalyzeMeta, AnalyzeResponse
+from app import budget, tracing
+from app.analyzers.result import AnalysisMeta, AnalysisResult
+from app.lexicons.bundle import LexiconBundle, get_lexicons
 
+Engine = Literal["python", "vectorized"]
 
-def analyze_text(text: str, ml: bool | None = None) -> AnalyzeResponse:
-    """Analyze text and return heuristic metrics plus optional ML score."""
+
+def _embeddings_plan(ml: bool | None, backend: str | None) -> tuple[bool, bool, bool]:
+    """Return (openai_available, embeddings_requested, embeddings_used)."""
+    from app.ml.backends import get_backend
+
+    openai_available = bool(os.environ.get("OPENAI_API_KEY", "").strip().startswith("sk-"))
+    backend_available = get_backend(backend).available()
+    embeddings_requested = ml if ml is not None else backend_available
+    return openai_available, embeddings_requested, embeddings_requested and backend_available
+
+
+class _EmbeddingPlan:
+    """
+    Embedding decision for a request. Remote backends, and any backend under a
+    deadline, are dispatched before the heuristics run so the network round
+    trip overlaps the CPU work; `results()` joins them at the end.
+
+    With the near-duplicate index enabled, texts close enough to a recently
+    scored one reuse its score, if it was scored with the centroid version this
+    process scores with (and, with `NEARDUP_REUSE=all`, its metrics if they were
+    computed with the same lexicon version), instead of being embedded.
+    """
+
+    __slots__ = (
+        "openai_available",
+        "requested",
+        "used",
+        "degraded",
+        "texts",
+        "backend",
+        "deadline",
+        "future",
+        "index",
+        "signatures",
+        "matches",
+        "score_reused",
+        "pending",
+    )
+
+    def __init__(
+        self,
+        texts: list[str],
+        ml: bool | None,
+        backend: str | None,
+        deadline: float | None,
+        degraded: bool = False,
+        lexicon_version: str | None = None,
+    ):
+        from app.ml.backends import get_backend
+        from app.neardup import get_index, reuse_mode
+
+        self.openai_available, self.requested, self.used = _embeddings_plan(ml, backend)
+        # load shedding: skip embeddings that would otherwise have run
+        self.degraded = True if degraded and self.used else None
+        if self.degraded:
+            self.used = False
+        self.texts = texts
+        self.backend = backend
+        self.deadline = deadline
+        self.future = None
+
+        self.index = get_index()
+        self.signatures = [self.index.signature(text) for text in texts] if self.index is not None else []
+        self.matches = [None] * len(texts)
+        # reusing a score is cheap, so it also applies while shedding load
+        want_score = self.used or bool(self.degraded)
+        name = get_backend(backend).name
+        centroids = None
+        if self.index is not None and (want_score or reuse_mode() == "all"):
+            from app.ml.scorer import centroid_version
+
+            # reused metrics must come from the same lexicon version, reused scores from the same centroids
+            version = lexicon_version if reuse_mode() == "all" else None
+            centroids = centroid_version(name)
+            for i, sig in enumerate(self.signatures):
+                match = self.index.lookup(sig, name, version, centroids) if want_score else None
+                if match is None and reuse_mode() == "all":
+                    match = self.index.lookup(sig, lexicon_version=version)
+                self.matches[i] = match
+        self.score_reused = [
+            want_score
+            and match is not None
+            and match.score is not None
+            and match.backend == name
+            and match.centroid_version == centroids
+            for match in self.matches
+        ]
+        self.pending = [i for i, reused in enumerate(self.score_reused) if not reused]
+
+        if self.used and self.pending and (deadline is not None or get_backend(backend).remote):
+            from app.ml.scorer import submit_engagement_bait_results
+
+            self.future = submit_engagement_bait_results([texts[i] for i in self.pending], backend)
+
+    def reuse(self, i: int) -> str | None:
+        """Which parts of text `i`'s result come from a near duplicate: score, metrics, all or None."""
+        from app.neardup import reuse_mode
+
+        if self.matches[i] is None:
+            return None
+        score = self.score_reused[i]
+        metrics = reuse_mode() == "all"
+        return "all" if score and metrics else "score" if score else "metrics" if metrics else None
+
+    def results(self) -> tuple[list[tuple[float | None, str, bool]], bool | None]:
+        """Return (score, vector_backend, embeddings_used) per text and the deadline_exceeded flag."""
+        from app.ml.backends import get_backend
+
+        vb = get_backend(self.backend)
+        out: list[tuple[float | None, str, bool]] = [(None, "none", False)] * len(self.texts)
+        for i, match in enumerate(self.matches):
+            if self.score_reused[i]:
+                out[i] = (match.score, vb.meta_name, True)
+        if not self.used or not self.pending:
+            return out, None
+
+        pending_texts = [self.texts[i] for i in self.pending]
+        deadline_exceeded = None
+        if self.future is None:
+            from app.ml.scorer import compute_engagement_bait_results
+
+            scored = compute_engagement_bait_results(pending_texts, self.backend)
+        elif self.deadline is None:
+            scored = self.future.result()
+        else:
+            try:
+                scored = self.future.result(timeout=max(0.0, self.deadline - time.monotonic()))
+                deadline_exceeded = False
+            except FutureTimeout:
+                # serve the heuristics now; the embeddings finish in the background
+                return out, True
+        for i, (score, vector_backend) in zip(self.pending, scored):
+            out[i] = (score, vector_backend, True)
+        return out, deadline_exceeded
+
+
+def _deadline(timeout_ms: int | None) -> float | None:
+    return time.monotonic() + timeout_ms / 1000 if timeout_ms else None
+
+
+def _analyze(
+    texts: list[str],
+    ml: bool | None,
+    engine: Engine,
+    backend: str | None,
+    timeout_ms: int | None,
+    degraded: bool,
+    cpu_budget_ms: float | None = None,
+) -> list[AnalysisResult]:
+    from app.ml.backends import get_backend
+
+    vb = get_backend(backend)
+    with budget.limit(cpu_budget_ms * len(texts) if cpu_budget_ms else None), tracing.span(
+        "analyze",
+        **{"batch.items": len(texts), "text.length": sum(map(len, texts)), "vector.backend": vb.name, "engine": engine},
+    ):
+        with tracing.span("preprocess"):
+            # one bundle for the whole request, so a concurrent reload can't mix versions
+            lexicons = get_lexicons()
+            plan = _EmbeddingPlan(texts, ml, backend, _deadline(timeout_ms), degraded, lexicons.version)
+            reuse = [plan.reuse(i) for i in range(len(texts))]
+        fresh = [i for i, parts in enumerate(reuse) if parts not in ("metrics", "all")]
+        with tracing.span("heuristics", **{"batch.items": len(fresh)}):
+            computed = iter(_metrics([texts[i] for i in fresh], engine, lexicons))
+            all_metrics = [
+                next(computed) if parts not in ("metrics", "all") else plan.matches[i].metrics
+                for i, parts in enumerate(reuse)
+            ]
+        with tracing.span("embeddings", **{"embeddings.used": plan.used, "batch.items": len(plan.pending)}):
+            scored, deadline_exceeded = plan.results()
+
+        results = []
+        for i, (metrics, (score, vector_backend, used)) in enumerate(zip(all_metrics, scored)):
+            match = plan.matches[i]
+            chunking = vb.chunking(texts[i]) if score is not None and not plan.score_reused[i] else None
+            results.append(
+                AnalysisResult(
+                    metrics,
+                    score,
+                    AnalysisMeta(
+                        embeddings_requested=plan.requested,
+                        embeddings_used=used,
+                        openai_available=plan.openai_available,
+                        vector_backend=vector_backend,
+                        lexicon_version=lexicons.version,
+                        deadline_exceeded=deadline_exceeded,
+                        degraded=plan.degraded,
+                        near_duplicate_similarity=round(match.similarity, 4) if reuse[i] else None,
+                        near_duplicate_reuse=reuse[i],
+                        embedding_chunks=chunking[0] if chunking else None,
+                        embedding_truncation=("head" if chunking[1] else "none") if chunking else None,
+                    ),
+                )
+            )
+            # index fresh work only, so reused results never seed further reuse
+            if plan.index is not None and (reuse[i] is None or (reuse[i] == "metrics" and score is not None)):
+                from app.ml.scorer import centroid_version
+
+                name = vb.name if score is not None else None
+                version = centroid_version(vb.name)
+                plan.index.insert(plan.signatures[i], metrics, score, name, lexicons.version, version)
+        return results
+
+
+def analyze_text(
+    text: str,
+    ml: bool | None = None,
+    backend: str | None = None,
+    timeout_ms: int | None = None,
+    degraded: bool = False,
+    cpu_budget_ms: float | None = None,
+) -> AnalysisResult:
+    """
+    Analyze text and return heuristic metrics plus optional ML score.
+    `backend` picks the vector backend (default: `VECTOR_BACKEND`).
+    With `timeout_ms`, the embedding starts before the heuristics and the
+    result falls back to heuristics only (`meta.deadline_exceeded`) if it is
+    not ready by then. `degraded=True` (set by admission control under load)
+    skips embeddings and records it in `meta.degraded`. With `cpu_budget_ms`,
+    analysis stops with `BudgetExceeded` once it has used that much CPU time.
+    Returns the compact internal result; call `to_response()` or `to_payload()`
+    at the HTTP edge.
+    """
+    return _analyze([text], ml, "python", backend, timeout_ms, degraded, cpu_budget_ms)[0]
+
+
+def _analyzer_calls(text: str, lexicons: LexiconBundle) -> tuple:
+    """(metric, analyzer, args) for each heuristic, in `METRIC_LAYOUT` order."""
     from app.analyzers.arousal import analyze_arousal
     from app.analyzers.claim_volume import analyze_claim_volume
     from app.analyzers.narrative import analyze_counterargument_absence
@@ -12,29 +244,100 @@ def analyze_text(text: str, ml: bool | None = None) -> AnalyzeResponse:
     from app.analyzers.urgency import analyze_urgency
     from app.analyzers.lexical_diversity import analyze_lexical_diversity
 
-    openai_available = bool(os.environ.get("OPENAI_API_KEY", "").strip().startswith("sk-"))
-    embeddings_requested = ml if ml is not None else openai_available
-    embeddings_used = embeddings_requested and openai_available
-
-    engagement_bait_score = None
-    vector_backend = "none"
-    if embeddings_used:
-        from app.ml.scorer import compute_engagement_bait_result
-
-        engagement_bait_score, vector_backend = compute_engagement_bait_result(text)
-
-    return AnalyzeResponse(
-        urgency_pressure=analyze_urgency(text),
-        evidence_density=analyze_evidence(text),
-        arousal_intensity=analyze_arousal(text),
-        counterargument_absence=analyze_counterargument_absence(text),
-        claim_volume_vs_depth=analyze_claim_volume(text),
-        lexical_diversity=analyze_lexical_diversity(text),
-        engagement_bait_score=engagement_bait_score,
-        meta=AnalyzeMeta(
-            embeddings_requested=embeddings_requested,
-            embeddings_used=embeddings_used,
-            openai_available=openai_available,
-            vector_backend=vector_backend,
-        ),
+    return (
+        ("urgency_pressure", analyze_urgency, (text, lexicons)),
+        ("evidence_density", analyze_evidence, (text,)),
+        ("arousal_intensity", analyze_arousal, (text, lexicons)),
+        ("counterargument_absence", analyze_counterargument_absence, (text, lexicons)),
+        ("claim_volume_vs_depth", analyze_claim_volume, (text,)),
+        ("lexical_diversity", analyze_lexical_diversity, (text,)),
     )
+
+
+def _heuristics(text: str, lexicons: LexiconBundle) -> tuple:
+    if tracing.enabled():
+        return _traced_heuristics(text, lexicons)
+    out = []
+    for _name, analyzer, args in _analyzer_calls(text, lexicons):
+        budget.check()
+        out.append(analyzer(*args))
+    return tuple(out)
+
+
+def _traced_heuristics(text: str, lexicons: LexiconBundle) -> tuple:
+    """`_heuristics` with one span per analyzer."""
+    out = []
+    for name, analyzer, args in _analyzer_calls(text, lexicons):
+        budget.check()
+        with tracing.span(f"analyzer.{name}", **{"text.length": len(text)}):
+            out.append(analyzer(*args))
+    return tuple(out)
+
+
+def _compute_metrics(texts: list[str], engine: Engine, lexicons: LexiconBundle) -> list[tuple]:
+    from app.analyzers import vectorized
+
+    if engine != "vectorized" or not vectorized.available():
+        return [_heuristics(text, lexicons) for text in texts]
+
+    from app.analyzers.claim_volume import analyze_claim_volume
+    from app.analyzers.evidence import analyze_evidence
+
+    with tracing.span("analyzer.vectorized_lexicons", **{"batch.items": len(texts)}):
+        lexicon = vectorized.lexicon_metrics(texts, lexicons)
+        urgency = vectorized.urgency_metrics(texts, lexicons)
+    out = []
+    for text, urgency_result, (arousal_result, counterargument_result, diversity_result) in zip(
+        texts, urgency, lexicon
+    ):
+        budget.check()
+        out.append(
+            (
+                urgency_result,
+                analyze_evidence(text),
+                arousal_result,
+                counterargument_result,
+                analyze_claim_volume(text),
+                diversity_result,
+            )
+        )
+    return out
+
+
+def _metrics(texts: list[str], engine: Engine, lexicons: LexiconBundle) -> list[tuple]:
+    """Heuristic metrics per text, through the shared result cache when one is configured."""
+    from app.cache import get_result_cache, result_key
+
+    cache = get_result_cache()
+    if cache is None:
+        return _compute_metrics(texts, engine, lexicons)
+    keys = [result_key(text, lexicons.version) for text in texts]
+    with tracing.span("cache.lookup", **{"cache.tier": "results", "batch.items": len(keys)}):
+        found = cache.get_many(keys)
+        tracing.set_attributes(**{"cache.hits": len(found)})
+    missing = [i for i, key in enumerate(keys) if key not in found]
+    if missing:
+        computed = _compute_metrics([texts[i] for i in missing], engine, lexicons)
+        cache.put_many([(keys[i], metrics) for i, metrics in zip(missing, computed)])
+        found.update((keys[i], metrics) for i, metrics in zip(missing, computed))
+    return [found[key] for key in keys]
+
+
+def analyze_batch(
+    texts: list[str],
+    ml: bool | None = None,
+    engine: Engine = "python",
+    backend: str | None = None,
+    timeout_ms: int | None = None,
+    degraded: bool = False,
+    cpu_budget_ms: float | None = None,
+) -> list[AnalysisResult]:
+    """
+    Analyze many texts. `engine="vectorized"` resolves the token-lexicon signals
+    for the whole batch at once (see `app.analyzers.vectorized`); scores are
+    identical to `analyze_text`. Falls back to the per-text path without numpy.
+    Embeddings for the batch go out as one request; `timeout_ms` is one
+    deadline for the whole batch, and `cpu_budget_ms` is per text, pooled
+    over the batch.
+    """
+    return _analyze(texts, ml, engine, backend, timeout_ms, degraded, cpu_budget_ms)
@@ -1,92 +1,134 @@
-from app.models import MetricBreakdown
+import math
+
+from app.analyzers.result import METRIC_LAYOUT, MetricResult
 from app.analyzers.base import (
-    count_to_score, clamp_score,
+    count_to_score, clamp_score, saturation,
     is_negated, get_modifier, length_confidence,
 )
-from app.lexicons.loader import (
-    get_arousal_weighted_terms, get_moralized_terms,
-    get_curiosity_gap_phrases, get_superlative_terms,
-)
-from app.lexicons.nrc import get_nrc_arousal_words
-
-_EMOTION_WEIGHTED = get_arousal_weighted_terms()
-_NRC = get_nrc_arousal_words()
-_MORALIZED = get_moralized_terms() or {
-    "wrong", "evil", "traitor", "betray", "sin", "corrupt", "immoral",
-    "disgrace", "shameful", "outrage", "outrageous", "vile", "wicked",
-}
-_CURIOSITY_GAP = get_curiosity_gap_phrases()
-_SUPERLATIVES = get_superlative_terms() or {
-    "best", "worst", "most", "least", "incredible", "astonishing",
-    "unbelievable", "shocking",
-}
-
-
-def _count_phrases(text: str, phrases: frozenset[str]) -> int:
+from app.lexicons.bundle import LexiconBundle, get_lexicons
+
+_KEYS = METRIC_LAYOUT["arousal_intensity"]
+
+_EMOTION_THRESHOLDS = (0, 6)
+_MORALIZED_THRESHOLDS = (0, 4)
+_SUPERLATIVE_THRESHOLDS = (0, 5)
+_CURIOSITY_THRESHOLDS = (0, 2)
+# density sub-scores: min(1, density * scale) saturates at density >= 1 / scale
+_CAPS_SCALE = 15
+
+
+def _count_phrases(text: str, phrases: frozenset[str], cap: float = math.inf) -> int:
     t = text.lower()
-    return sum(1 for p in phrases if p in t)
+    count = 0
+    for p in phrases:
+        if p in t:
+            count += 1
+            if count >= cap:
+                break
+    return count
 
 
-def _count_terms(tokens: list[str], terms) -> float:
-    # for each token that matches, skip it if preceded by a negation word,
-    # otherwise scale it by any nearby amplifier/diminisher
-    total = 0.0
+def _count_terms(tokens: list[str], lexicons: LexiconBundle) -> tuple[float, float, float]:
+    """
+    Negation- and modifier-adjusted (emotion, moralized, superlative) totals,
+    accumulated in token order. Each total stops growing once its sub-score
+    has saturated, and the scan ends when all three have.
+    """
+    emotion, moralized, superlatives = lexicons.emotion, lexicons.moralized, lexicons.superlatives
+    emotion_cap = saturation(_EMOTION_THRESHOLDS)
+    moralized_cap = saturation(_MORALIZED_THRESHOLDS)
+    superlative_cap = saturation(_SUPERLATIVE_THRESHOLDS)
+    e = m = s = 0.0
     for i, w in enumerate(tokens):
         cleaned = w.rstrip(".,;:!?")
-        base = terms.get(cleaned, 0.0) if isinstance(terms, dict) else (
-            1.0 if cleaned in terms else 0.0
-        )
-        if base > 0.0 and not is_negated(tokens, i):
-            total += base * get_modifier(tokens, i)
-    return total
+        weight = emotion.get(cleaned, 0.0) if e < emotion_cap else 0.0
+        in_moralized = m < moralized_cap and cleaned in moralized
+        in_superlatives = s < superlative_cap and cleaned in superlatives
+        if not (weight > 0.0 or in_moralized or in_superlatives):
+            continue
+        # hits are sparse, so the window scans cost less than per-document masks
+        if is_negated(tokens, i):
+            continue
+        modifier = get_modifier(tokens, i)
+        if weight > 0.0:
+            e += weight * modifier
+        if in_moralized:
+            m += modifier
+        if in_superlatives:
+            s += modifier
+        if e >= emotion_cap and m >= moralized_cap and s >= superlative_cap:
+            break
+    return e, m, s
+
 
+def _count_caps(words: list[str], token_count: int) -> int:
+    # stop once the caps sub-score is pinned at 1, as score_arousal computes it
+    wc = token_count or 1
+    count = 0
+    for w in words:
+        if len(w) > 2 and w.isupper():
+            count += 1
+            if count / wc * _CAPS_SCALE >= 1:
+                break
+    return count
 
-def analyze_arousal(text: str) -> MetricBreakdown:
+
+def analyze_arousal(text: str, lexicons: LexiconBundle | None = None) -> MetricResult:
+    lexicons = lexicons or get_lexicons()
     t = text.lower()
     tokens = [w.rstrip(".,;:!?") for w in t.split()]
-    wc = len(tokens) or 1
-    lc = length_confidence(wc)
+    # need original case for caps — lowercased words never pass isupper()
+    caps_count = _count_caps(text.split(), len(tokens))
+    return score_arousal(text, len(tokens), caps_count, *_count_terms(tokens, lexicons), lexicons)
 
-    # arousal.txt words carry tier weights; NRC words default to 1.0
-    merged_emotion: dict[str, float] = {**{w: 1.0 for w in _NRC}, **_EMOTION_WEIGHTED}
-    emotion_weighted = _count_terms(tokens, merged_emotion)
+
+def score_arousal(
+    text: str,
+    token_count: int,
+    caps_count: int,
+    emotion_weighted: float,
+    moralized_weighted: float,
+    superlative_weighted: float,
+    lexicons: LexiconBundle | None = None,
+) -> MetricResult:
+    """Combine the weighted lexicon counts with the text-level signals into the metric."""
+    curiosity_gap = (lexicons or get_lexicons()).curiosity_gap
+    t = text.lower()
+    wc = token_count or 1
+    lc = length_confidence(wc)
 
     exclamations = text.count("!")
     exclamation_density = exclamations / wc
     questions = text.count("?")
     question_density = questions / wc
 
-    # need original case for caps — lowercased words never pass isupper()
-    orig_words = text.split()
-    caps_count = sum(1 for w in orig_words if len(w) > 2 and w.isupper())
     caps_ratio = caps_count / wc
 
-    moralized_weighted = _count_terms(tokens, _MORALIZED)
-    superlative_weighted = _count_terms(tokens, _SUPERLATIVES)
-    curiosity_count = _count_phrases(t, _CURIOSITY_GAP) if _CURIOSITY_GAP else 0
+    curiosity_count = _count_phrases(t, curiosity_gap, saturation(_CURIOSITY_THRESHOLDS)) if curiosity_gap else 0
 
-    s_emotion = count_to_score(emotion_weighted, (0, 6))
+    s_emotion = count_to_score(emotion_weighted, _EMOTION_THRESHOLDS)
     # density scores scaled by text length so short texts don't spike on one punctuation mark
     s_exclamation = clamp_score(min(1, exclamation_density * 20) * lc)
     s_question = clamp_score(min(1, question_density * 20) * lc)
-    s_caps = clamp_score(min(1, caps_ratio * 15) * lc)
-    s_moralized = count_to_score(moralized_weighted, (0, 4))
-    s_superlative = count_to_score(superlative_weighted, (0, 5))
-    s_curiosity = count_to_score(curiosity_count, (0, 2))
+    s_caps = clamp_score(min(1, caps_ratio * _CAPS_SCALE) * lc)
+    s_moralized = count_to_score(moralized_weighted, _MORALIZED_THRESHOLDS)
+    s_superlative = count_to_score(superlative_weighted, _SUPERLATIVE_THRESHOLDS)
+    s_curiosity = count_to_score(curiosity_count, _CURIOSITY_THRESHOLDS)
 
     score = (
         s_emotion + s_exclamation + s_question + s_caps
         + s_moralized + s_superlative + s_curiosity
     ) / 7
-    return MetricBreakdown(
-        score=round(clamp_score(score), 2),
-        breakdown={
-            "emotion_words": round(s_emotion, 2),
-            "exclamation_density": round(s_exclamation, 2),
-            "question_density": round(s_question, 2),
-            "caps_ratio": round(s_caps, 2),
-            "moralized_language": round(s_moralized, 2),
-            "superlative_density": round(s_superlative, 2),
-            "curiosity_gap": round(s_curiosity, 2),
-        },
+    return MetricResult(
+        _KEYS,
+        round(clamp_score(score), 2),
+        (
+            round(s_emotion, 2),
+            round(s_exclamation, 2),
+            round(s_question, 2),
+            round(s_caps, 2),
+            round(s_moralized, 2),
+            round(s_superlative, 2),
+            round(s_curiosity, 2),
+        ),
     )
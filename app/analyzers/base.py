@@ -1,3 +1,6 @@
+import re
+from bisect import bisect_left
+
 from app.models import MetricBreakdown
 
 # ---------------------------------------------------------------------------
@@ -43,6 +46,14 @@ def count_to_score(count: float, thresholds: tuple[float, float]) -> float:
     return clamp_score((count - low) / (high - low))
 
 
+def saturation(thresholds: tuple[float, float]) -> float:
+    """
+    The count at which `count_to_score(count, thresholds)` reaches 1.0. Counts
+    only grow, so a matcher can stop once it gets there without changing the score.
+    """
+    return thresholds[1]
+
+
 def length_confidence(word_count: int, full_scale: int = 80) -> float:
     """
     Returns 1.0 for texts >= full_scale words, scales linearly toward 0 below.
@@ -81,3 +92,48 @@ def get_modifier(tokens: list[str], hit_index: int, window: int = 2) -> float:
         if tokens[i] in _DIMINISHERS:
             return 0.7
     return 1.0
+
+
+_WORD_SPAN = re.compile(r"\S+")
+
+
+class PhraseNegation:
+    """
+    Answers is_phrase_negated(text, start) for many phrase starts in one text
+    without re-splitting the prefix for every hit. Words are scanned lazily,
+    only as far as the furthest start asked about, so a matcher that stops
+    early never tokenizes the rest of the text.
+    """
+
+    __slots__ = ("_text", "_words", "_starts", "_ends", "_neg_prefix", "_window")
+
+    def __init__(self, text: str, window: int = 3):
+        self._text = text
+        self._window = window
+        self._words = _WORD_SPAN.finditer(text)
+        self._starts: list[int] = []
+        self._ends: list[int] = []
+        self._neg_prefix = [0]
+
+    def _scan_to(self, position: int) -> None:
+        # read words until one starts at or after `position`, or the text ends
+        while not self._starts or self._starts[-1] < position:
+            m = next(self._words, None)
+            if m is None:
+                return
+            self._starts.append(m.start())
+            self._ends.append(m.end())
+            self._neg_prefix.append(self._neg_prefix[-1] + (m.group() in _NEGATORS))
+
+    def __call__(self, phrase_start: int) -> bool:
+        self._scan_to(phrase_start)
+        # tokens of text[:phrase_start] are the words starting before it, the
+        # last of which may be cut short at phrase_start
+        k = bisect_left(self._starts, phrase_start)
+        if k == 0:
+            return False
+        lo = max(0, k - self._window)
+        if self._ends[k - 1] > phrase_start:
+            partial = self._text[self._starts[k - 1]:phrase_start]
+            return partial in _NEGATORS or self._neg_prefix[k - 1] - self._neg_prefix[lo] > 0
+        return self._neg_prefix[k] - self._neg_prefix[lo] > 0
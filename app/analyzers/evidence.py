@@ -1,21 +1,35 @@
+import math
 import re
-from app.models import MetricBreakdown
+from app.analyzers.result import METRIC_LAYOUT, MetricResult
 from app.analyzers.base import clamp_score
 
+_KEYS = METRIC_LAYOUT["evidence_density"]
+
+# Number patterns are written so a long run of digits or thousands groups is
+# tried in linear time, with the same match spans as the plain patterns. A run
+# of digits is only entered at its first digit: any later start that matches
+# means the first digit matches too. A thousands chain is only entered where
+# the plain pattern could start, i.e. not at the second or later digit of a
+# run unless exactly three digits remain, and not at a full group right after
+# `<digit>,` (starting one group earlier matches whenever these do), so a chain
+# is walked from its head only. The checks come after the first digit, so the
+# regex engine can still skip ahead to the next digit instead of trying every
+# position.
+_GROUPED_START = r"\d(?:(?<!\d\d)(?<!\d,\d)|(?<=\d\d)(?=\d\d(?!\d))|(?<=\d,\d)(?!\d\d))"
 _CITATION_PATTERNS = [
     re.compile(r"\[\s*\d+\s*\]"),
     re.compile(r"\(\s*[Ss]ource\s*[:\s]"),
     re.compile(r"\([A-Za-z]+\s+et\s+al\.?\s*\d{4}\)"),
-    re.compile(r"\d+\s*%\s*(?:of|from)"),
+    re.compile(r"\d(?<!\d\d)\d*\s*%\s*(?:of|from)"),
     re.compile(r"\bpeer-reviewed\b", re.I),
     re.compile(r"\bconfidence interval\b", re.I),
     re.compile(r"\bappendix\b", re.I),
 ]
 _STATS_PATTERNS = [
-    re.compile(r"\d+\.?\d*\s*%"),
-    re.compile(r"\d{1,3}(?:,\d{3})*(?:\.\d+)?\s*(?:people|users|studies|percent)"),
-    re.compile(r"\d{1,3}(?:,\d{3})*(?:\.\d+)?\s+(?:participants|patients|respondents|trials?)", re.I),
-    re.compile(r"\d+\s*(?:million|billion|thousand)"),
+    re.compile(r"\d(?<!\d\d)\d*(?:\.\d*)?\s*%"),
+    re.compile(_GROUPED_START + r"\d{0,2}(?:,\d{3})*(?:\.\d+)?\s*(?:people|users|studies|percent)"),
+    re.compile(_GROUPED_START + r"\d{0,2}(?:,\d{3})*(?:\.\d+)?\s+(?:participants|patients|respondents|trials?)", re.I),
+    re.compile(r"\d(?<!\d\d)\d*\s*(?:million|billion|thousand)"),
     re.compile(r"study\s+(?:shows|found|reveals)"),
     re.compile(r"research\s+(?:shows|indicates|suggests)"),
     re.compile(r"\b(?:data|analysis|evidence|findings)\s+(?:suggests|indicates|shows)\b", re.I),
@@ -37,24 +51,29 @@ _EXTERNAL_PATTERNS = [
 ]
 
 
-def _count_matches(text: str, patterns: list[re.Pattern]) -> int:
-    return sum(len(p.findall(text)) for p in patterns)
-
+def _count_matches(text: str, patterns: list[re.Pattern], scale: float = math.inf) -> int:
+    # stop once count / scale reaches 1: the normalized sub-score is 0 from there on
+    count = 0
+    for p in patterns:
+        for _ in p.finditer(text):
+            count += 1
+            if count / scale >= 1:
+                return count
+    return count
 
-def analyze_evidence(text: str) -> MetricBreakdown:
-    citations = _count_matches(text, _CITATION_PATTERNS)
-    stats = _count_matches(text, _STATS_PATTERNS)
-    external = _count_matches(text, _EXTERNAL_PATTERNS)
 
+def analyze_evidence(text: str) -> MetricResult:
     # Evidence density: higher = more evidence. Inverse for "engagement bait" score:
     # low evidence density = more bait-like. So we invert: score = 1 - normalized_evidence
     words = len(text.split()) or 1
     scale = max(1, words / 30)  # unified scaling for citations, stats, external
+    citations = _count_matches(text, _CITATION_PATTERNS, scale)
+    stats = _count_matches(text, _STATS_PATTERNS, scale)
+    external = _count_matches(text, _EXTERNAL_PATTERNS, scale)
     c_norm = clamp_score(1 - min(1, citations / scale))
     s_norm = clamp_score(1 - min(1, stats / scale))
     e_norm = clamp_score(1 - min(1, external / scale))
     score = (c_norm + s_norm + e_norm) / 3
-    return MetricBreakdown(
-        score=round(score, 2),
-        breakdown={"citations": round(c_norm, 2), "stats": round(s_norm, 2), "external_sources": round(e_norm, 2)},
+    return MetricResult(
+        _KEYS, round(score, 2), (round(c_norm, 2), round(s_norm, 2), round(e_norm, 2))
     )
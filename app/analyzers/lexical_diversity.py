@@ -1,6 +1,8 @@
-from app.models import MetricBreakdown
+from app.analyzers.result import METRIC_LAYOUT, MetricResult
 from app.analyzers.base import clamp_score
 
+_KEYS = METRIC_LAYOUT["lexical_diversity"]
+
 
 def _mattr(tokens: list[str], base_window: int = 40) -> float:
     # Moving Average Type-Token Ratio — slide a window across the token list,
@@ -20,25 +22,20 @@ def _mattr(tokens: list[str], base_window: int = 40) -> float:
     return sum(ratios) / len(ratios)
 
 
-def analyze_lexical_diversity(text: str) -> MetricBreakdown:
+def analyze_lexical_diversity(text: str) -> MetricResult:
     # strip punctuation and lowercase so "angry!" and "angry" count as the same word
     tokens = [w.lower().rstrip(".,;:!?\"'") for w in text.split()]
     tokens = [w for w in tokens if w]
-    n = len(tokens)
+    return score_lexical_diversity(len(tokens), len(set(tokens)), _mattr(tokens))
 
-    if n == 0:
-        return MetricBreakdown(score=0.0, breakdown={"mattr": 0.0, "type_token_ratio": 0.0})
 
-    ttr = len(set(tokens)) / n
-    mattr_val = _mattr(tokens)
+def score_lexical_diversity(token_count: int, distinct: int, mattr_val: float) -> MetricResult:
+    """Turn token / distinct-token counts and the MATTR into the metric."""
+    if token_count == 0:
+        return MetricResult(_KEYS, 0.0, (0.0, 0.0))
+    ttr = distinct / token_count
 
     # low diversity = repetitive vocab = bait signal, so invert
     bait_score = clamp_score(1.0 - mattr_val)
 
-    return MetricBreakdown(
-        score=round(bait_score, 2),
-        breakdown={
-            "mattr": round(mattr_val, 2),
-            "type_token_ratio": round(ttr, 2),
-        },
-    )
+    return MetricResult(_KEYS, round(bait_score, 2), (round(mattr_val, 2), round(ttr, 2)))
@@ -1,15 +1,8 @@
 from app.analyzers.base import clamp_score
-from app.lexicons.loader import get_conditional_terms, get_tradeoff_terms
-from app.models import MetricBreakdown
+from app.lexicons.bundle import LexiconBundle, get_lexicons
+from app.analyzers.result import METRIC_LAYOUT, MetricResult
 
-_TRADEOFF = get_tradeoff_terms() or {
-    "however",
-    "although",
-    "trade-off",
-    "tradeoff",
-    "on the other hand",
-}
-_CONDITIONAL = get_conditional_terms() or {"if", "when", "unless", "depending on"}
+_KEYS = METRIC_LAYOUT["counterargument_absence"]
 
 
 def _count_markers(text: str, terms: frozenset[str]) -> int:
@@ -27,21 +20,23 @@ def _count_markers(text: str, terms: frozenset[str]) -> int:
     return len(token_hits) + len(phrase_hits)
 
 
-def analyze_counterargument_absence(text: str) -> MetricBreakdown:
+def analyze_counterargument_absence(text: str, lexicons: LexiconBundle | None = None) -> MetricResult:
+    lexicons = lexicons or get_lexicons()
     t = text.lower()
-    wc = len(t.split()) or 1
+    return score_counterargument_absence(
+        len(t.split()), _count_markers(t, lexicons.tradeoff), _count_markers(t, lexicons.conditional)
+    )
 
-    tradeoff = _count_markers(t, _TRADEOFF)
-    conditional = _count_markers(t, _CONDITIONAL)
 
+def score_counterargument_absence(word_count: int, tradeoff: int, conditional: int) -> MetricResult:
+    """Turn tradeoff/conditional marker counts into the metric."""
+    wc = word_count or 1
     s_tradeoff_absence = clamp_score(1 - tradeoff / max(1, wc / 20))
     s_conditional_absence = clamp_score(1 - conditional / max(1, wc / 18))
     score = (s_tradeoff_absence + s_conditional_absence) / 2
 
-    return MetricBreakdown(
-        score=round(clamp_score(score), 2),
-        breakdown={
-            "tradeoff_absence": round(s_tradeoff_absence, 2),
-            "conditional_absence": round(s_conditional_absence, 2),
-        },
+    return MetricResult(
+        _KEYS,
+        round(clamp_score(score), 2),
+        (round(s_tradeoff_absence, 2), round(s_conditional_absence, 2)),
     )
@@ -0,0 +1,190 @@
+"""
+Compact internal result types for the analyzers.
+
+Analyzers return `MetricResult` objects: a score plus a tuple of breakdown
+values whose keys come from the shared `METRIC_LAYOUT` table. `AnalysisResult`
+bundles the six metrics for one text and flattens to a fixed-layout float row
+(`COLUMNS`) for caches and corpus statistics. Pydantic models are only built at
+the HTTP edge via `to_response()`.
+"""
+import math
+from array import array
+from typing import Any, Iterable
+
+from app.models import AnalyzeMeta, AnalyzeResponse, MetricBreakdown
+
+# Metric name -> breakdown keys, in response order. This is the single source of
+# truth for the breakdown layout; analyzers read their keys from here.
+METRIC_LAYOUT: dict[str, tuple[str, ...]] = {
+    "urgency_pressure": ("time_pressure", "scarcity", "fomo"),
+    "evidence_density": ("citations", "stats", "external_sources"),
+    "arousal_intensity": (
+        "emotion_words",
+        "exclamation_density",
+        "question_density",
+        "caps_ratio",
+        "moralized_language",
+        "superlative_density",
+        "curiosity_gap",
+    ),
+    "counterargument_absence": ("tradeoff_absence", "conditional_absence"),
+    "claim_volume_vs_depth": ("claims_per_word", "explanation_depth", "listicle"),
+    "lexical_diversity": ("mattr", "type_token_ratio"),
+}
+METRIC_FIELDS: tuple[str, ...] = tuple(METRIC_LAYOUT)
+
+# Flat row layout: per metric its score then each breakdown value, followed by
+# the engagement bait score (NaN when absent).
+COLUMNS: tuple[str, ...] = tuple(
+    col
+    for name, keys in METRIC_LAYOUT.items()
+    for col in (f"{name}.score", *(f"{name}.{k}" for k in keys))
+) + ("engagement_bait_score",)
+
+
+def pack_metrics(metrics: Iterable["MetricResult"]) -> array:
+    """Flatten metrics to a float64 array laid out per `COLUMNS` (without the bait score)."""
+    row = array("d")
+    for metric in metrics:
+        row.append(metric.score)
+        row.extend(metric.values)
+    return row
+
+
+def unpack_metrics(values: list[float]) -> tuple["MetricResult", ...]:
+    """Inverse of `pack_metrics`; extra trailing values are ignored."""
+    metrics = []
+    pos = 0
+    for keys in METRIC_LAYOUT.values():
+        n = len(keys)
+        metrics.append(MetricResult(keys, values[pos], tuple(values[pos + 1 : pos + 1 + n])))
+        pos += n + 1
+    return tuple(metrics)
+
+
+class MetricResult:
+    """One metric's score and breakdown values, laid out per `METRIC_LAYOUT`."""
+
+    __slots__ = ("keys", "score", "values")
+
+    def __init__(self, keys: tuple[str, ...], score: float, values: tuple[float, ...]):
+        self.keys = keys
+        self.score = score
+        self.values = values
+
+    @property
+    def breakdown(self) -> dict[str, float]:
+        return dict(zip(self.keys, self.values))
+
+    def to_model(self) -> MetricBreakdown:
+        return MetricBreakdown(score=self.score, breakdown=self.breakdown)
+
+    def __repr__(self) -> str:
+        return f"MetricResult(score={self.score}, breakdown={self.breakdown})"
+
+
+class AnalysisMeta:
+    """
+    Execution metadata for one analysis; mirrors `AnalyzeMeta`. Optional fields
+    default to None and are left out of the payload until something sets them.
+    """
+
+    _REQUIRED = (
+        "embeddings_requested",
+        "embeddings_used",
+        "openai_available",
+        "vector_backend",
+        "lexicon_version",
+    )
+    _OPTIONAL = (
+        "deadline_exceeded",
+        "degraded",
+        "near_duplicate_similarity",
+        "near_duplicate_reuse",
+        "profile_id",
+        "embedding_chunks",
+        "embedding_truncation",
+    )
+    __slots__ = _REQUIRED + _OPTIONAL
+
+    def __init__(
+        self,
+        embeddings_requested: bool,
+        embeddings_used: bool,
+        openai_available: bool,
+        vector_backend: str,
+        lexicon_version: str,
+        **optional: Any,
+    ):
+        self.embeddings_requested = embeddings_requested
+        self.embeddings_used = embeddings_used
+        self.openai_available = openai_available
+        self.vector_backend = vector_backend
+        self.lexicon_version = lexicon_version
+        for name in self._OPTIONAL:
+            setattr(self, name, optional.pop(name, None))
+        if optional:
+            raise TypeError(f"Unknown meta fields: {sorted(optional)}")
+
+    def to_dict(self) -> dict[str, Any]:
+        out = {name: getattr(self, name) for name in self._REQUIRED}
+        for name in self._OPTIONAL:
+            value = getattr(self, name)
+            if value is not None:
+                out[name] = value
+        return out
+
+
+class AnalysisResult:
+    """The six heuristic metrics, optional engagement bait score and meta for one text."""
+
+    __slots__ = ("metrics", "engagement_bait_score", "meta")
+
+    def __init__(
+        self,
+        metrics: tuple[MetricResult, ...],
+        engagement_bait_score: float | None,
+        meta: AnalysisMeta,
+    ):
+        self.metrics = metrics
+        self.engagement_bait_score = engagement_bait_score
+        self.meta = meta
+
+    def __getattr__(self, name: str) -> MetricResult:
+        # result.urgency_pressure etc., matching the AnalyzeResponse field names
+        try:
+            return self.metrics[METRIC_FIELDS.index(name)]
+        except ValueError:
+            raise AttributeError(name) from None
+
+    def to_row(self) -> array:
+        """Flatten to a float64 array laid out per `COLUMNS`."""
+        row = pack_metrics(self.metrics)
+        score = self.engagement_bait_score
+        row.append(math.nan if score is None else score)
+        return row
+
+    @classmethod
+    def from_row(cls, row: Iterable[float], meta: AnalysisMeta) -> "AnalysisResult":
+        """Rebuild a result from a `to_row()` array."""
+        values = list(row)
+        score = values[len(COLUMNS) - 1]
+        return cls(unpack_metrics(values), None if math.isnan(score) else score, meta)
+
+    def to_payload(self) -> dict[str, Any]:
+        """JSON-ready dict matching the `AnalyzeResponse` schema, without Pydantic."""
+        payload: dict[str, Any] = {
+            name: {"score": metric.score, "breakdown": metric.breakdown}
+            for name, metric in zip(METRIC_FIELDS, self.metrics)
+        }
+        payload["engagement_bait_score"] = self.engagement_bait_score
+        payload["meta"] = self.meta.to_dict()
+        return payload
+
+    def to_response(self) -> AnalyzeResponse:
+        """Build the validated Pydantic response model."""
+        return AnalyzeResponse(
+            **{name: metric.to_model() for name, metric in zip(METRIC_FIELDS, self.metrics)},
+            engagement_bait_score=self.engagement_bait_score,
+            meta=AnalyzeMeta(**self.meta.to_dict()),
+        )
@@ -1,60 +1,48 @@
-from app.models import MetricBreakdown
-from app.analyzers.base import count_to_score, clamp_score, is_phrase_negated
-from app.lexicons.loader import get_urgency_sections
-
-_DEFAULT_TIME = frozenset({
-    "act now", "do it now", "hurry", "limited time", "last chance", "don't miss",
-    "expires soon", "before it's too late", "urgency", "urgent", "immediately",
-    "right now", "today only", "ends soon", "final hours", "countdown", "deadline",
-    "now or never", "must act",
-})
-_DEFAULT_SCARCITY = frozenset({
-    "limited", "exclusive", "only a few left", "sold out", "almost gone",
-    "last remaining", "one of a kind", "rare", "scarce", "first come first served",
-    "supplies limited",
-})
-_DEFAULT_FOMO = frozenset({
-    "don't miss out", "you'll regret", "everyone else is", "join thousands",
-    "see what others are missing", "be the first", "act before everyone else",
-    "limited availability", "going fast", "running out",
-})
-
-
-def _get_urgency_sets() -> tuple[frozenset[str], frozenset[str], frozenset[str]]:
-    sections = get_urgency_sections()
-    return (
-        sections.get("time_pressure") or _DEFAULT_TIME,
-        sections.get("scarcity") or _DEFAULT_SCARCITY,
-        sections.get("fomo") or _DEFAULT_FOMO,
-    )
+import math
 
+from app.analyzers.result import METRIC_LAYOUT, MetricResult
+from app.analyzers.base import PhraseNegation, count_to_score, clamp_score, saturation
+from app.lexicons.bundle import LexiconBundle, get_lexicons
 
-def _count_phrases(text: str, phrases: set[str]) -> int:
-    # count each phrase occurrence, skipping hits where a negation word precedes it
-    t = text.lower()
+_KEYS = METRIC_LAYOUT["urgency_pressure"]
+
+_TIME_THRESHOLDS = (0, 3)
+_SCARCITY_THRESHOLDS = (1, 4)
+_FOMO_THRESHOLDS = (0, 3)
+
+
+def _count_phrases(text: str, phrases: set[str], negated: PhraseNegation, cap: float = math.inf) -> int:
+    # count each phrase occurrence, skipping hits where a negation word precedes it;
+    # stop at `cap`, past which the sub-score can't change
     count = 0
     for p in phrases:
-        idx = t.find(p)
+        idx = text.find(p)
         while idx != -1:
-            if not is_phrase_negated(t, idx):
+            if not negated(idx):
                 count += 1
-            idx = t.find(p, idx + len(p))
+                if count >= cap:
+                    return count
+            idx = text.find(p, idx + len(p))
     return count
 
 
-def analyze_urgency(text: str) -> MetricBreakdown:
+def analyze_urgency(text: str, lexicons: LexiconBundle | None = None) -> MetricResult:
+    lexicons = lexicons or get_lexicons()
     t = text.lower()
-    time_set, scarcity_set, fomo_set = _get_urgency_sets()
-    time_pressure = _count_phrases(t, time_set)
-    scarcity = _count_phrases(t, scarcity_set)
-    fomo = _count_phrases(t, fomo_set)
-
-    s_time = count_to_score(time_pressure, (0, 3))
-    s_scarcity = count_to_score(scarcity, (1, 4))
-    s_fomo = count_to_score(fomo, (0, 3))
+    negated = PhraseNegation(t)
+    time_pressure = _count_phrases(t, lexicons.urgency_time, negated, saturation(_TIME_THRESHOLDS))
+    scarcity = _count_phrases(t, lexicons.urgency_scarcity, negated, saturation(_SCARCITY_THRESHOLDS))
+    fomo = _count_phrases(t, lexicons.urgency_fomo, negated, saturation(_FOMO_THRESHOLDS))
+    return score_urgency(time_pressure, scarcity, fomo)
+
+
+def score_urgency(time_pressure: int, scarcity: int, fomo: int) -> MetricResult:
+    """Turn non-negated phrase counts into the metric."""
+    s_time = count_to_score(time_pressure, _TIME_THRESHOLDS)
+    s_scarcity = count_to_score(scarcity, _SCARCITY_THRESHOLDS)
+    s_fomo = count_to_score(fomo, _FOMO_THRESHOLDS)
     avg_score = (s_time + s_scarcity + s_fomo) / 3
     score = clamp_score((0.7 * avg_score) + (0.3 * max(s_time, s_scarcity, s_fomo)))
-    return MetricBreakdown(
-        score=round(score, 2),
-        breakdown={"time_pressure": round(s_time, 2), "scarcity": round(s_scarcity, 2), "fomo": round(s_fomo, 2)},
+    return MetricResult(
+        _KEYS, round(score, 2), (round(s_time, 2), round(s_scarcity, 2), round(s_fomo, 2))
     )
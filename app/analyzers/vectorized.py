@@ -0,0 +1,345 @@
+"""
+Vectorized batch engine for the token-lexicon signals.
+
+Whitespace-delimited words from every text in a batch are interned into one
+global vocabulary of integer ids and laid out as a flat id array with
+per-document offsets. Each id carries a bitmask (negator / amplifier /
+diminisher / tradeoff / conditional / all-caps) and one weight column per
+weighted lexicon, resolved once from the word's lowercased, punctuation-stripped
+form. Lexicon membership, negation windows and degree modifiers for the whole
+batch then come from array operations. Per-document sums use `np.bincount`,
+which accumulates in token order and so reproduces the per-text Python loops
+bit for bit, up to where those stop counting a saturated sub-score; the
+sub-scores are identical either way.
+
+The vocabulary is built for one `LexiconBundle` and replaced when a reload
+swaps in a new version.
+
+Covers the arousal lexicon and caps counts, the counterargument single-word
+markers and the lexical-diversity MATTR windows. Urgency phrases are found
+in one newline-joined string for the batch, with negation read off word
+boundaries computed for all of it at once. The evidence and claim-volume
+regexes run per text. Requires numpy
+(optional); `available()` reports whether it is installed.
+"""
+import threading
+from collections import defaultdict
+
+from app.analyzers import arousal, lexical_diversity, narrative, urgency
+from app.analyzers.base import _AMPLIFIERS, _DIMINISHERS, _NEGATORS, saturation
+from app.analyzers.result import MetricResult
+from app.lexicons.bundle import LexiconBundle, get_lexicons
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+NEGATOR = 1
+AMPLIFIER = 2
+DIMINISHER = 4
+TRADEOFF = 8
+CONDITIONAL = 16
+CAPS = 32
+
+# Weight columns, in the order the arousal metric consumes them.
+_WEIGHT_COLUMNS = ("emotion", "moralized", "superlative")
+
+# Matches base.is_negated / base.get_modifier defaults.
+_NEGATION_WINDOW = 3
+_MODIFIER_WINDOW = 2
+
+# Drop and rebuild the vocabulary past this many distinct tokens so a stream
+# of unique junk tokens cannot grow memory without bound.
+MAX_VOCAB_SIZE = 2_000_000
+
+# Code points `str.split()` and regex `\s` treat as whitespace (none above U+3000).
+_SPACE_CODES = [c for c in range(0x3001) if chr(c).isspace()]
+
+
+def available() -> bool:
+    return np is not None
+
+
+class Vocabulary:
+    """Global token -> id table with per-id lexicon flags and weights for one bundle."""
+
+    def __init__(self, lexicons: LexiconBundle) -> None:
+        self.lexicons = lexicons
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        ids: defaultdict[str, int] = defaultdict()
+        ids.default_factory = ids.__len__  # unseen token -> next id
+        self.ids = ids
+        self.tokens: list[str] = []
+        # id of each word's normalized form, for counting distinct markers
+        self._forms: dict[str, int] = {}
+        # id of each word's lexical-diversity form, -1 where that is empty
+        self._types: dict[str, int] = {}
+        self.canonical = np.zeros(0, dtype=np.int64)
+        self.types = np.zeros(0, dtype=np.int64)
+        self.flags = np.zeros(0, dtype=np.uint8)
+        self.weights = np.zeros((0, len(_WEIGHT_COLUMNS)), dtype=np.float64)
+        lexicons = self.lexicons
+        self._emotion = lexicons.emotion
+        self._moralized = lexicons.moralized
+        self._superlatives = lexicons.superlatives
+        self._tradeoff = frozenset(t for t in lexicons.tradeoff if " " not in t)
+        self._conditional = frozenset(t for t in lexicons.conditional if " " not in t)
+
+    def encode(self, tokens: list[str]) -> tuple["np.ndarray", ...]:
+        """
+        Intern raw words and return (canonical ids, flags, weights, type ids) for them,
+        resolved under one lock so a concurrent reset cannot mix generations.
+        """
+        with self._lock:
+            if len(self.ids) > MAX_VOCAB_SIZE:
+                self._reset()
+            out = np.fromiter(map(self.ids.__getitem__, tokens), dtype=np.int64, count=len(tokens))
+            if len(self.ids) > len(self.tokens):
+                # ids are handed out contiguously, so the first occurrence of each
+                # new id, in id order, gives the newly interned tokens
+                fresh = np.flatnonzero(out >= len(self.tokens))
+                _, first = np.unique(out[fresh], return_index=True)
+                self._grow([tokens[i] for i in fresh[first]])
+            return self.canonical[out], self.flags[out], self.weights[out], self.types[out]
+
+    def _grow(self, new: list[str]) -> None:
+        # only the newly interned tokens need their lexicon properties resolved
+        flags = np.zeros(len(new), dtype=np.uint8)
+        weights = np.zeros((len(new), len(_WEIGHT_COLUMNS)), dtype=np.float64)
+        canonical = np.zeros(len(new), dtype=np.int64)
+        types = np.full(len(new), -1, dtype=np.int64)
+        for i, word in enumerate(new):
+            tok = word.lower().rstrip(".,;:!?")
+            canonical[i] = self._forms.setdefault(tok, len(self._forms))
+            form = word.lower().rstrip(".,;:!?\"'")  # as analyze_lexical_diversity has it
+            if form:
+                types[i] = self._types.setdefault(form, len(self._types))
+            f = CAPS if len(word) > 2 and word.isupper() else 0
+            if tok in _NEGATORS:
+                f |= NEGATOR
+            if tok in _AMPLIFIERS:
+                f |= AMPLIFIER
+            if tok in _DIMINISHERS:
+                f |= DIMINISHER
+            if tok in self._tradeoff:
+                f |= TRADEOFF
+            if tok in self._conditional:
+                f |= CONDITIONAL
+            flags[i] = f
+            weights[i, 0] = self._emotion.get(tok, 0.0)
+            weights[i, 1] = 1.0 if tok in self._moralized else 0.0
+            weights[i, 2] = 1.0 if tok in self._superlatives else 0.0
+        self.tokens.extend(new)
+        self.canonical = np.concatenate([self.canonical, canonical])
+        self.types = np.concatenate([self.types, types])
+        self.flags = np.concatenate([self.flags, flags])
+        self.weights = np.concatenate([self.weights, weights])
+
+
+_vocab: Vocabulary | None = None
+_vocab_lock = threading.Lock()
+
+
+def get_vocabulary(lexicons: LexiconBundle | None = None) -> Vocabulary:
+    """The shared vocabulary for `lexicons` (default: the current bundle)."""
+    global _vocab
+    lexicons = lexicons or get_lexicons()
+    vocab = _vocab
+    if vocab is not None and vocab.lexicons.version == lexicons.version:
+        return vocab
+    with _vocab_lock:
+        if _vocab is None or _vocab.lexicons.version != lexicons.version:
+            if _vocab is not None and lexicons is not get_lexicons():
+                # a request still finishing on a superseded bundle: don't evict the new vocabulary
+                return Vocabulary(lexicons)
+            _vocab = Vocabulary(lexicons)
+        return _vocab
+
+
+def lexicon_metrics(
+    texts: list[str], lexicons: LexiconBundle | None = None
+) -> list[tuple[MetricResult, MetricResult]]:
+    """
+    Return (arousal_intensity, counterargument_absence, lexical_diversity) for
+    each text, identical to `analyze_arousal` /
+    `analyze_counterargument_absence` / `analyze_lexical_diversity`.
+    """
+    if not texts:
+        return []
+    lexicons = lexicons or get_lexicons()
+    vocab = get_vocabulary(lexicons)
+
+    flat: list[str] = []
+    lengths = np.empty(len(texts), dtype=np.int64)
+    for d, text in enumerate(texts):
+        words = text.split()
+        lengths[d] = len(words)
+        flat.extend(words)
+
+    ids, flags, weights, types = vocab.encode(flat)
+    n_docs = len(texts)
+    n = len(ids)
+
+    doc = np.repeat(np.arange(n_docs), lengths)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    pos = np.arange(n) - starts[doc]  # position within its document
+
+    # negated: any negator in the preceding window, clipped at the document start
+    neg_cum = np.concatenate(([0], np.cumsum(flags & NEGATOR != 0)))
+    idx = np.arange(n)
+    lo = idx - np.minimum(pos, _NEGATION_WINDOW)
+    negated = neg_cum[idx] - neg_cum[lo] > 0
+
+    # modifier: the earliest amplifier/diminisher in the preceding window wins,
+    # so apply offsets nearest-first and let farther ones overwrite
+    modifier = np.ones(n, dtype=np.float64)
+    for offset in range(1, _MODIFIER_WINDOW + 1):
+        prev = np.zeros(n, dtype=np.uint8)
+        prev[offset:] = flags[:-offset]
+        valid = pos >= offset
+        modifier = np.where(
+            valid & (prev & AMPLIFIER != 0),
+            1.3,
+            np.where(valid & (prev & DIMINISHER != 0), 0.7, modifier),
+        )
+
+    live = ~negated
+    totals = []
+    for col in range(len(_WEIGHT_COLUMNS)):
+        w = weights[:, col]
+        contrib = np.where((w > 0.0) & live, w * modifier, 0.0)
+        totals.append(np.bincount(doc, weights=contrib, minlength=n_docs))
+
+    caps = np.bincount(doc, weights=flags & CAPS != 0, minlength=n_docs)
+    tradeoff_tokens = _distinct_per_doc(doc, ids, flags & TRADEOFF != 0, n_docs)
+    conditional_tokens = _distinct_per_doc(doc, ids, flags & CONDITIONAL != 0, n_docs)
+    diversity = _lexical_diversity(doc[types >= 0], types[types >= 0], n_docs)
+
+    out = []
+    for d, text in enumerate(texts):
+        t = text.lower()
+        wc = int(lengths[d])
+        arousal_result = arousal.score_arousal(
+            text, wc, int(caps[d]), float(totals[0][d]), float(totals[1][d]), float(totals[2][d]), lexicons
+        )
+        tradeoff = int(tradeoff_tokens[d]) + _count_phrase_markers(t, lexicons.tradeoff)
+        conditional = int(conditional_tokens[d]) + _count_phrase_markers(t, lexicons.conditional)
+        out.append(
+            (
+                arousal_result,
+                narrative.score_counterargument_absence(wc, tradeoff, conditional),
+                diversity[d],
+            )
+        )
+    return out
+
+
+def urgency_metrics(texts: list[str], lexicons: LexiconBundle | None = None) -> list[MetricResult]:
+    """Return urgency_pressure for each text, identical to `analyze_urgency`."""
+    if not texts:
+        return []
+    lexicons = lexicons or get_lexicons()
+    lowered = [text.lower() for text in texts]
+    # one newline-separated string: phrases hold no newline, so no match spans
+    # two texts, and whitespace-delimited words stop at each text's end
+    joined = "\n".join(lowered)
+    doc_starts = np.concatenate(([0], np.cumsum([len(t) + 1 for t in lowered])[:-1]))
+
+    codes = np.frombuffer(joined.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+    word = ~np.isin(codes, _SPACE_CODES)
+    edge = np.diff(word.astype(np.int8), prepend=0, append=0)
+    word_starts = np.flatnonzero(edge == 1)
+    word_ends = np.flatnonzero(edge == -1)
+    words = joined.split()
+    neg_prefix = np.concatenate(
+        ([0], np.cumsum(np.fromiter(map(_NEGATORS.__contains__, words), dtype=bool, count=len(words))))
+    )
+
+    counts = []
+    for phrases, thresholds in (
+        (lexicons.urgency_time, urgency._TIME_THRESHOLDS),
+        (lexicons.urgency_scarcity, urgency._SCARCITY_THRESHOLDS),
+        (lexicons.urgency_fomo, urgency._FOMO_THRESHOLDS),
+    ):
+        hits = _find_all(joined, phrases)
+        doc = np.searchsorted(doc_starts, hits, side="right") - 1
+        # as base.PhraseNegation: a negator among the (up to) `window` words
+        # before the phrase start, the last of which may be cut short by it
+        k = np.searchsorted(word_starts, hits)
+        first = np.searchsorted(word_starts, doc_starts[doc])
+        lo = np.maximum(first, k - _NEGATION_WINDOW)
+        before = k > first
+        prev = np.maximum(k - 1, 0)
+        partial = before & (word_ends[prev] > hits)
+        negated = before & (neg_prefix[np.where(partial, prev, k)] - neg_prefix[lo] > 0)
+        for i in np.flatnonzero(partial & ~negated):
+            negated[i] = joined[word_starts[prev[i]]:hits[i]] in _NEGATORS
+        found = np.bincount(doc[~negated], minlength=len(texts))
+        counts.append(np.minimum(found, saturation(thresholds)))
+    return [urgency.score_urgency(int(t), int(s), int(f)) for t, s, f in zip(*counts)]
+
+
+def _find_all(text: str, phrases: set[str]) -> "np.ndarray":
+    """Start of every non-overlapping occurrence of each phrase, as `_count_phrases` scans."""
+    hits = []
+    for p in phrases:
+        idx = text.find(p)
+        while idx != -1:
+            hits.append(idx)
+            idx = text.find(p, idx + len(p))
+    return np.array(hits, dtype=np.int64)
+
+
+def _lexical_diversity(doc: "np.ndarray", types: "np.ndarray", n_docs: int) -> list[MetricResult]:
+    """
+    `analyze_lexical_diversity` over the batch's non-empty tokens. A token
+    counts toward every MATTR window that starts after its previous occurrence
+    and no more than a window before it, so per-window distinct counts come
+    from one difference array instead of a set per window.
+    """
+    n = len(types)
+    lengths = np.bincount(doc, minlength=n_docs)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    pos = np.arange(n)
+
+    order = np.lexsort((pos, types))
+    prev = np.full(n, -1, dtype=np.int64)
+    same = types[order[1:]] == types[order[:-1]]
+    prev[order[1:][same]] = order[:-1][same]
+    first_in_doc = prev < starts[doc]
+    distinct = np.bincount(doc[first_in_doc], minlength=n_docs)
+
+    window = np.minimum(40, np.maximum(10, lengths // 2))
+    lo = np.maximum(prev + 1, np.maximum(pos - window[doc] + 1, starts[doc]))
+    cover = np.cumsum(np.bincount(lo, minlength=n + 1) - np.bincount(pos + 1, minlength=n + 1))
+
+    out = []
+    for d in range(n_docs):
+        m, w = int(lengths[d]), int(window[d])
+        if m == 0:
+            mattr_val = 0.0
+        elif m < w * 2:
+            mattr_val = int(distinct[d]) / m
+        else:
+            # summed as Python floats, in window order, as `_mattr` does
+            ratios = (cover[starts[d]:starts[d] + m - w + 1] / w).tolist()
+            mattr_val = sum(ratios) / len(ratios)
+        out.append(lexical_diversity.score_lexical_diversity(m, int(distinct[d]), mattr_val))
+    return out
+
+
+def _distinct_per_doc(doc: "np.ndarray", ids: "np.ndarray", mask: "np.ndarray", n_docs: int) -> "np.ndarray":
+    """Number of distinct masked token ids in each document."""
+    if not mask.any():
+        return np.zeros(n_docs, dtype=np.int64)
+    width = int(ids.max()) + 1
+    keys = np.unique(doc[mask] * width + ids[mask])
+    return np.bincount(keys // width, minlength=n_docs)
+
+
+def _count_phrase_markers(text: str, terms: frozenset[str]) -> int:
+    return sum(1 for term in terms if " " in term and term in text)
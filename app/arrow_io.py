@@ -0,0 +1,236 @@
+"""
+Offline scoring of Arrow / Parquet text columns into a flat Parquet file.
+
+The input is read one record batch at a time (Parquet via `iter_batches`,
+Arrow IPC files and streams batch by batch). Each batch is cut into chunks that
+are analyzed on a process pool, and the results are written with one
+`ParquetWriter` row group per batch, in input order. The next batch is read
+only while fewer than two chunks per worker are queued, and at most one batch
+beyond that, so memory stays bounded whatever the input size.
+
+Texts are decoded straight from the Arrow offsets and data buffers, one row at
+a time right before it is analyzed, so a batch never becomes a list of Python
+strings. Null and out-of-range texts are detected from the buffers too
+(`utf8_length`), without decoding them.
+
+Output columns: the id column (copied from the input when `id_column` is given,
+otherwise `row`, the input row number), `error` (null when the row was scored),
+then one float64 column per metric score and breakdown value, named as in
+`COLUMNS` (`urgency_pressure.score`, `urgency_pressure.time_pressure`, ...).
+Rows with an error, and rows without an embedding score, have nulls there.
+
+Requires the optional `pyarrow` package.
+"""
+import os
+from array import array
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator
+
+from app.analyzers.result import COLUMNS
+from app.models import MAX_TEXT_LEN, MIN_TEXT_LEN
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency
+    pa = None
+
+CHUNK_ROWS = 256
+# chunks queued per worker, enough to keep the pool busy while a batch is written
+_IN_FLIGHT_PER_WORKER = 2
+
+
+def available() -> bool:
+    return pa is not None
+
+
+def split_chunks(texts: "pa.Array", rows: int = CHUNK_ROWS) -> Iterator["pa.Array"]:
+    """`texts` cut into arrays of at most `rows` rows that own their buffers.
+
+    A plain slice shares (and pickles) the whole parent buffers, which would
+    send each batch to the pool once per chunk; `concat_arrays` copies just the
+    sliced range.
+    """
+    for start in range(0, len(texts), rows):
+        yield pa.concat_arrays([texts.slice(start, rows)])
+
+
+def output_schema(id_type: "pa.DataType | None" = None, id_column: str = "row") -> "pa.Schema":
+    return pa.schema(
+        [pa.field(id_column, id_type or pa.int64()), pa.field("error", pa.string())]
+        + [pa.field(name, pa.float64()) for name in COLUMNS]
+    )
+
+
+def _string_array(array: "pa.Array") -> "pa.Array":
+    """A (large_)string array over the same data, decoding dictionaries and views."""
+    if pa.types.is_dictionary(array.type):
+        array = array.dictionary_decode()
+    if pa.types.is_string(array.type) or pa.types.is_large_string(array.type):
+        return array
+    return array.cast(pa.large_string())
+
+
+def iter_texts(array: "pa.Array") -> Iterator[str | None]:
+    """Decode each row of a string array from its Arrow buffers, None for nulls."""
+    array = _string_array(array)
+    validity, offsets, data = array.buffers()
+    offsets = memoryview(offsets).cast("q" if pa.types.is_large_string(array.type) else "i")
+    data = memoryview(data) if data is not None else memoryview(b"")
+    bits = memoryview(validity) if validity is not None and array.null_count else None
+    base = array.offset
+    for i in range(base, base + len(array)):
+        if bits is not None and not bits[i >> 3] >> (i & 7) & 1:
+            yield None
+        else:
+            yield str(data[offsets[i] : offsets[i + 1]], "utf-8")
+
+
+def _errors(texts: "pa.Array") -> list[str | None]:
+    """Per-row validation error, matching the API's text checks, from lengths alone."""
+    lengths = pc.utf8_length(_string_array(texts))
+    out: list[str | None] = [None] * len(texts)
+    if lengths.null_count == 0 and len(lengths) and MIN_TEXT_LEN <= pc.min(lengths).as_py() and pc.max(lengths).as_py() <= MAX_TEXT_LEN:
+        return out  # the common case: every row is valid
+    for i, n in enumerate(lengths.to_pylist()):
+        if n is None:
+            out[i] = "Missing text"
+        elif n < MIN_TEXT_LEN:
+            out[i] = f"Text must be at least {MIN_TEXT_LEN} characters (got {n})"
+        elif n > MAX_TEXT_LEN:
+            out[i] = f"Text must be at most {MAX_TEXT_LEN} characters (got {n})"
+    return out
+
+
+def score_chunk(texts: "pa.Array", ml: bool, engine: str) -> tuple[list[bytes], list[str | None]]:
+    """
+    Analyze one chunk of a text column. Returns one packed float64 column per
+    `COLUMNS` entry (NaN where the row has no value) and the per-row errors.
+    Runs in the worker processes.
+    """
+    from app.analyzers import analyze_batch
+
+    errors = _errors(texts)
+    valid = [text for text, error in zip(iter_texts(texts), errors) if error is None]
+    results = iter(analyze_batch(valid, ml=ml, engine=engine)) if valid else iter(())
+    columns = [array("d") for _ in COLUMNS]
+    missing = array("d", [float("nan")]) * len(COLUMNS)
+    for error in errors:
+        row = next(results).to_row() if error is None else missing
+        for column, value in zip(columns, row):
+            column.append(value)
+    return [column.tobytes() for column in columns], errors
+
+
+def _to_table(ids: "pa.Array", schema: "pa.Schema", parts: list[tuple[list[bytes], list[str | None]]]) -> "pa.Table":
+    errors = [error for _columns, chunk_errors in parts for error in chunk_errors]
+    columns = [ids, pa.array(errors, type=pa.string())]
+    for j in range(len(COLUMNS)):
+        values = pa.Array.from_buffers(pa.float64(), len(errors), [None, pa.py_buffer(b"".join(p[0][j] for p in parts))])
+        columns.append(pc.if_else(pc.is_nan(values), pa.scalar(None, pa.float64()), values))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def _is_ipc(path: Path) -> bool:
+    return path.suffix.lower() in (".arrow", ".feather", ".ipc", ".arrows")
+
+
+def _open_ipc(source: "pa.NativeFile") -> tuple["pa.Schema", Iterator["pa.RecordBatch"]]:
+    try:
+        reader = pa.ipc.open_file(source)
+        return reader.schema, (reader.get_batch(i) for i in range(reader.num_record_batches))
+    except pa.ArrowInvalid:  # not the file format: try the streaming one
+        source.seek(0)
+        reader = pa.ipc.open_stream(source)
+        return reader.schema, iter(reader)
+
+
+def read_schema(path: Path) -> "pa.Schema":
+    """The schema of a Parquet file or an Arrow IPC file or stream."""
+    path = Path(path)
+    if _is_ipc(path):
+        with pa.memory_map(str(path)) as source:
+            return _open_ipc(source)[0]
+    return pq.ParquetFile(path).schema_arrow
+
+
+def read_batches(path: Path, columns: list[str], batch_size: int) -> Iterator["pa.RecordBatch"]:
+    """Record batches of `columns` from a Parquet file or an Arrow IPC file or stream."""
+    path = Path(path)
+    if _is_ipc(path):
+        with pa.memory_map(str(path)) as source:
+            # IPC batches keep the size they were written with; the file is
+            # memory-mapped, so selecting columns copies nothing
+            for batch in _open_ipc(source)[1]:
+                yield batch.select(columns)
+        return
+    yield from pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=columns)
+
+
+def score_file(
+    input_path: Path,
+    output_path: Path,
+    text_column: str = "text",
+    id_column: str | None = None,
+    ml: bool = False,
+    engine: str = "vectorized",
+    batch_size: int = 10_000,
+    workers: int | None = None,
+    executor: Executor | None = None,
+) -> int:
+    """
+    Score `text_column` of an Arrow/Parquet file into a Parquet file at
+    `output_path`; returns the number of rows written. `workers` processes
+    (default: one per CPU; 0 scores in this process) analyze the chunks.
+    """
+    if pa is None:
+        raise RuntimeError("Parquet scoring needs the pyarrow package")
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    if executor is None and workers > 0:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return score_file(input_path, output_path, text_column, id_column, ml, engine, batch_size, workers, pool)
+
+    input_schema = read_schema(input_path)
+    for name in (text_column, id_column):
+        if name is not None and input_schema.get_field_index(name) < 0:
+            raise ValueError(f"{input_path} has no column {name!r}")
+    schema = output_schema(input_schema.field(id_column).type if id_column else None, id_column or "row")
+    columns = [text_column] + ([id_column] if id_column and id_column != text_column else [])
+    in_flight = max(1, workers) * _IN_FLIGHT_PER_WORKER
+    pending: deque[tuple[pa.Array, list[Future | tuple]]] = deque()
+    writer = None
+    rows = 0
+    tmp = Path(output_path).with_suffix(Path(output_path).suffix + ".tmp")
+
+    def submit(texts: "pa.Array") -> "Future | tuple":
+        if executor is None:
+            return score_chunk(texts, ml, engine)
+        return executor.submit(score_chunk, texts, ml, engine)
+
+    def write_oldest() -> None:
+        ids, parts = pending.popleft()
+        writer.write_table(_to_table(ids, schema, [p.result() if isinstance(p, Future) else p for p in parts]))
+
+    try:
+        writer = pq.ParquetWriter(tmp, schema)
+        for batch in read_batches(input_path, columns, batch_size):
+            texts = batch.column(text_column)
+            ids = batch.column(id_column) if id_column else pa.array(range(rows, rows + len(batch)), pa.int64())
+            pending.append((ids, [submit(chunk) for chunk in split_chunks(texts)]))
+            rows += len(batch)
+            while sum(len(parts) for _ids, parts in pending) > in_flight and len(pending) > 1:
+                write_oldest()
+        while pending:
+            write_oldest()
+        writer.close()
+        writer = None
+        tmp.replace(output_path)
+    finally:
+        if writer is not None:
+            writer.close()
+        tmp.unlink(missing_ok=True)
+    return rows
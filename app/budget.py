@@ -0,0 +1,62 @@
+"""
+Per-request CPU budget for the heuristic analyzers.
+
+The 50,000-character limit bounds input size, not cost. The analysis
+endpoints run under `limit()`, which allows `ANALYSIS_CPU_BUDGET_MS` of CPU
+time (default 2000, 0 = no budget) per text in the request, measured with the
+worker thread's own CPU clock so time spent waiting on locks or the network
+does not count. The analyzers call `check()` between steps. Once the budget is
+spent, the next check raises `BudgetExceeded` and the request fails with 422
+instead of holding a worker thread.
+
+Checks are cooperative: a single step (one analyzer, one regex pass) always
+runs to completion, so the analyzers are kept linear in the text length;
+`scripts/bench_adversarial.py` measures their worst cases.
+"""
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+# (thread CPU time at which the budget runs out, budget in ms) for the running analysis
+_budget: contextvars.ContextVar[tuple[float, float] | None] = contextvars.ContextVar("cpu_budget", default=None)
+
+
+class BudgetExceeded(Exception):
+    def __init__(self, budget_ms: float):
+        super().__init__(
+            f"Analysis exceeded its CPU budget of {budget_ms:.0f} ms; the text is too expensive to analyze"
+        )
+        self.budget_ms = budget_ms
+        # set by `app.profiling.run_profiled` when the request was profiled
+        self.profile_id: str | None = None
+
+
+def cpu_budget_ms() -> int | None:
+    """CPU budget per text from `ANALYSIS_CPU_BUDGET_MS` (default 2000; 0 = none)."""
+    try:
+        value = int(os.environ.get("ANALYSIS_CPU_BUDGET_MS", "2000"))
+    except ValueError:
+        return 2000
+    return value if value > 0 else None
+
+
+@contextmanager
+def limit(budget_ms: float | None) -> Iterator[None]:
+    """Run the block under a CPU budget of `budget_ms` (None: unlimited)."""
+    if budget_ms is None:
+        yield
+        return
+    token = _budget.set((time.thread_time() + budget_ms / 1000, budget_ms))
+    try:
+        yield
+    finally:
+        _budget.reset(token)
+
+
+def check() -> None:
+    """Raise `BudgetExceeded` if the running analysis has used up its CPU budget."""
+    budget = _budget.get()
+    if budget is not None and time.thread_time() > budget[0]:
+        raise BudgetExceeded(budget[1])
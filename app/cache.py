@@ -0,0 +1,164 @@
+"""
+Host-wide cache tier shared by all worker processes.
+
+Set `SHARED_CACHE_DIR` to a local directory (tmpfs works well) and every worker
+on the host shares:
+
+- heuristic results: the six metrics per text as a packed float64 row
+  (`pack_metrics`) in a SQLite database in WAL mode, keyed by a digest of the
+  text, the row layout and the lexicon version
+- embeddings: the memory-mapped vector store (`app.ml.store`) at
+  `vectors.bin`, unless `EMBEDDING_STORE_PATH` points elsewhere
+
+Readers never block each other. The result table is bounded by
+`SHARED_CACHE_MAX_RESULTS` (default 200000 rows); past that the least recently
+used tenth is evicted. Cache errors, such as a busy database, count as misses;
+a database that can't be opened at all leaves the process uncached, retrying
+every `_REOPEN_AFTER` seconds.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+
+from app.analyzers.result import COLUMNS, MetricResult, pack_metrics, unpack_metrics
+
+# results written under a different row layout are never read back
+_LAYOUT_TAG = hashlib.blake2b("\0".join(COLUMNS).encode(), digest_size=8).digest()
+# how stale a row's access time may get before a hit refreshes it
+_TOUCH_AFTER = 60.0
+_EVICT_CHECK_EVERY = 1000
+_MAX_PARAMS = 500
+_REOPEN_AFTER = 60.0
+
+
+def shared_cache_dir() -> Path | None:
+    value = os.environ.get("SHARED_CACHE_DIR", "").strip()
+    return Path(value) if value else None
+
+
+def result_key(text: str, lexicon_version: str) -> bytes:
+    # results computed with another lexicon bundle are never read back either
+    salt = _LAYOUT_TAG + hashlib.blake2b(lexicon_version.encode(), digest_size=8).digest()
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16, salt=salt).digest()
+
+
+class ResultCache:
+    def __init__(self, path: Path, max_entries: int = 200_000):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=1.0)
+        try:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results (key BLOB PRIMARY KEY, row BLOB NOT NULL, accessed REAL NOT NULL)"
+                " WITHOUT ROWID"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+        except sqlite3.Error:
+            self._db.close()
+            raise
+
+    def get_many(self, keys: list[bytes]) -> dict[bytes, tuple[MetricResult, ...]]:
+        """Return the cached metrics for whichever of `keys` are present."""
+        if not keys:
+            return {}
+        now = time.time()
+        found: dict[bytes, tuple[MetricResult, ...]] = {}
+        try:
+            with self._lock:
+                rows = []
+                for start in range(0, len(keys), _MAX_PARAMS):
+                    chunk = keys[start : start + _MAX_PARAMS]
+                    rows += self._db.execute(
+                        f"SELECT key, row, accessed FROM results WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                    ).fetchall()
+                stale = [(now, key) for key, _row, accessed in rows if now - accessed > _TOUCH_AFTER]
+                if stale:
+                    self._db.executemany("UPDATE results SET accessed = ? WHERE key = ?", stale)
+        except sqlite3.Error:
+            rows = []
+        for key, data, _accessed in rows:
+            values = array("d")
+            values.frombytes(data)
+            found[key] = unpack_metrics(values.tolist())
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items: list[tuple[bytes, tuple[MetricResult, ...]]]) -> None:
+        if not items:
+            return
+        now = time.time()
+        try:
+            with self._lock:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+                    [(key, pack_metrics(metrics).tobytes(), now) for key, metrics in items],
+                )
+                self._writes += len(items)
+                if self._writes >= _EVICT_CHECK_EVERY:
+                    self._writes = 0
+                    self._evict()
+        except sqlite3.Error:
+            pass
+
+    def _evict(self) -> None:
+        count = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        if count > self.max_entries:
+            excess = count - self.max_entries + self.max_entries // 10
+            self._db.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY accessed LIMIT ?)", (excess,)
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+_cache: ResultCache | None = None
+_cache_lock = threading.Lock()
+# (pid, path, when) of the last failed open, so requests don't each retry it
+_cache_failed: tuple[int, Path, float] | None = None
+
+
+def get_result_cache() -> ResultCache | None:
+    """
+    This process's handle on the shared result cache, or None if
+    `SHARED_CACHE_DIR` is unset or the database can't be opened.
+    """
+    global _cache, _cache_failed
+    root = shared_cache_dir()
+    if root is None:
+        return None
+    path = root / "results.sqlite3"
+    # SQLite connections must not cross a fork: reopen in each worker process
+    if _cache is None or _cache._pid != os.getpid() or _cache.path != path:
+        with _cache_lock:
+            if _cache is None or _cache._pid != os.getpid() or _cache.path != path:
+                pid = os.getpid()
+                if _cache_failed is not None and _cache_failed[:2] == (pid, path):
+                    if time.monotonic() - _cache_failed[2] < _REOPEN_AFTER:
+                        return None
+                try:
+                    _cache = ResultCache(path, int(os.environ.get("SHARED_CACHE_MAX_RESULTS", 200_000)))
+                except (sqlite3.Error, OSError):
+                    _cache, _cache_failed = None, (pid, path, time.monotonic())
+                    return None
+                _cache_failed = None
+    return _cache
@@ -0,0 +1,289 @@
+"""
+Content-Encoding support for request and response bodies.
+
+`CompressionMiddleware` decodes gzip/zstd request bodies (`Content-Encoding`)
+before they reach FastAPI, and compresses buffered responses according to the
+client's `Accept-Encoding`. Bodies may hold several gzip members or zstd
+frames; one that stops mid-member is rejected. Routes listed in
+`streaming_paths` get the encoded body as sent and decode it themselves with
+`decode_stream`, under their own size limit. zstd requires the optional
+`zstandard` package; gzip is always available.
+"""
+import gzip
+import os
+import zlib
+from typing import AsyncIterator, Collection, Iterator
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+MAX_DECOMPRESSED_BYTES = int(os.environ.get("MAX_DECOMPRESSED_BYTES", 32 * 1024 * 1024))
+COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", 1024))
+
+_COMPRESSIBLE_TYPES = ("application/json", "application/msgpack", "application/x-ndjson", "text/")
+
+# decoded bytes produced per step, so no single call inflates a bomb in one go
+_OUTPUT_STEP = 1 << 20
+# compressed bytes fed to zstd per step: a zstd block expands at most ~32768x,
+# which keeps one step's output within a few MiB
+_ZSTD_STEP = 256
+
+
+class UnsupportedEncoding(ValueError):
+    pass
+
+
+class PayloadTooLarge(ValueError):
+    pass
+
+
+class InvalidEncoding(ValueError):
+    pass
+
+
+def supported_encodings() -> tuple[str, ...]:
+    """Encodings this server can decode and produce, in preference order."""
+    return ("zstd", "gzip") if zstandard is not None else ("gzip",)
+
+
+class Inflater:
+    """
+    Incremental gzip/zstd decoder for a body fed in pieces. Decodes every
+    member or frame in turn, yields the output in bounded steps and raises
+    `PayloadTooLarge` past `limit` decoded bytes.
+    """
+
+    __slots__ = ("encoding", "limit", "size", "_new", "_d")
+
+    def __init__(self, encoding: str, limit: int) -> None:
+        if encoding == "gzip":
+            self._new = lambda: zlib.decompressobj(wbits=31)
+        elif encoding == "zstd" and zstandard is not None:
+            self._new = zstandard.ZstdDecompressor().decompressobj
+        else:
+            raise UnsupportedEncoding(f"Unsupported Content-Encoding: {encoding}")
+        self.encoding = encoding
+        self.limit = limit
+        self.size = 0
+        self._d = None  # decoder for the member or frame in progress
+
+    def feed(self, data: bytes) -> Iterator[bytes]:
+        try:
+            pieces = self._gzip(data) if self.encoding == "gzip" else self._zstd(data)
+            for piece in pieces:
+                self.size += len(piece)
+                if self.size > self.limit:
+                    raise PayloadTooLarge(f"Decompressed body exceeds {self.limit} bytes")
+                yield piece
+        except (zlib.error, *((zstandard.ZstdError,) if zstandard is not None else ())) as exc:
+            raise InvalidEncoding(f"Request body is not valid {self.encoding} data") from exc
+
+    def _gzip(self, data: bytes) -> Iterator[bytes]:
+        pending = False  # zlib may hold decoded output back once a step is full
+        while data or pending:
+            if self._d is None:
+                self._d = self._new()
+            step = min(_OUTPUT_STEP, self.limit - self.size + 1)
+            piece = self._d.decompress(data, step)
+            pending = len(piece) == step and not self._d.eof
+            if self._d.eof:
+                # the next member starts right after this one, in unused_data
+                data = self._d.unused_data
+                self._d = None
+            else:
+                data = self._d.unconsumed_tail
+            yield piece
+
+    def _zstd(self, data: bytes) -> Iterator[bytes]:
+        view = memoryview(data)
+        pos = 0
+        while pos < len(view):
+            if self._d is None:
+                self._d = self._new()
+            step = view[pos : pos + _ZSTD_STEP]
+            piece = self._d.decompress(step)
+            pos += len(step)
+            if self._d.eof:
+                # the next frame starts right after this one
+                pos -= len(self._d.unused_data)
+                self._d = None
+            yield piece
+
+    def close(self) -> None:
+        """Check the body ended on a member or frame boundary."""
+        if self._d is not None:
+            raise InvalidEncoding(f"Request body is not valid {self.encoding} data: it ends mid-stream")
+
+
+def decompress(body: bytes, encoding: str, limit: int = MAX_DECOMPRESSED_BYTES) -> bytes:
+    """Decode `body`, refusing to inflate past `limit` bytes."""
+    if len(body) > limit:
+        raise PayloadTooLarge(f"Request body exceeds {limit} bytes")
+    inflater = Inflater(encoding, limit)
+    out = b"".join(inflater.feed(body))
+    inflater.close()
+    return out
+
+
+async def decode_stream(chunks: AsyncIterator[bytes], encoding: str, limit: int) -> AsyncIterator[bytes]:
+    """Decode a streamed body as it arrives; at most `limit` bytes in, and out."""
+    inflater = Inflater(encoding, limit)
+    received = 0
+    async for chunk in chunks:
+        received += len(chunk)
+        if received > limit:
+            raise PayloadTooLarge(f"Request body exceeds {limit} bytes")
+        for piece in inflater.feed(chunk):
+            yield piece
+    inflater.close()
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    return gzip.compress(body, compresslevel=6)
+
+
+def negotiate_encoding(accept_encoding: str) -> str | None:
+    """Pick the best supported encoding from an `Accept-Encoding` header, or None."""
+    weights: dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        token, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if token:
+            weights[token.strip()] = q
+    best = None
+    for enc in supported_encodings():
+        q = weights.get(enc, weights.get("*", 0.0))
+        if q > 0 and (best is None or q > best[1]):
+            best = (enc, q)
+    return best[0] if best else None
+
+
+class CompressionMiddleware:
+    def __init__(
+        self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_BYTES, streaming_paths: Collection[str] = ()
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.streaming_paths = frozenset(streaming_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        encoding = headers.get("content-encoding", "identity").strip().lower()
+        if encoding not in ("", "identity") and scope["path"] not in self.streaming_paths:
+            try:
+                body = decompress(await _read_body(receive, MAX_DECOMPRESSED_BYTES), encoding)
+            except UnsupportedEncoding as exc:
+                await _error(415, str(exc))(scope, receive, send)
+                return
+            except PayloadTooLarge as exc:
+                await _error(413, str(exc))(scope, receive, send)
+                return
+            except InvalidEncoding as exc:
+                await _error(400, str(exc))(scope, receive, send)
+                return
+            scope = dict(scope)
+            raw = [(k, v) for k, v in scope["headers"] if k not in (b"content-encoding", b"content-length")]
+            raw.append((b"content-length", str(len(body)).encode()))
+            scope["headers"] = raw
+            receive = _replay(body, receive)
+
+        chosen = negotiate_encoding(headers.get("accept-encoding", ""))
+        if chosen is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressingResponder(chosen, self.minimum_size, send).run(self.app, scope, receive)
+
+
+class _CompressingResponder:
+    """Buffers fixed-length compressible responses and compresses them; streams pass through."""
+
+    def __init__(self, encoding: str, minimum_size: int, send: Send) -> None:
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send = send
+        self.start: Message | None = None
+        self.buffering = False
+        self.chunks: list[bytes] = []
+
+    async def run(self, app: ASGIApp, scope: Scope, receive: Receive) -> None:
+        await app(scope, receive, self.on_send)
+
+    async def on_send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "")
+            self.buffering = (
+                "content-length" in headers
+                and "content-encoding" not in headers
+                and content_type.startswith(_COMPRESSIBLE_TYPES)
+            )
+            if self.buffering:
+                self.start = message
+            else:
+                await self.send(message)
+            return
+        if message["type"] != "http.response.body" or not self.buffering:
+            await self.send(message)
+            return
+
+        self.chunks.append(message.get("body", b""))
+        if message.get("more_body", False):
+            return
+        body = b"".join(self.chunks)
+        headers = MutableHeaders(raw=self.start["headers"])
+        headers.add_vary_header("Accept-Encoding")
+        if len(body) >= self.minimum_size:
+            body = compress(body, self.encoding)
+            headers["Content-Encoding"] = self.encoding
+            headers["Content-Length"] = str(len(body))
+        await self.send(self.start)
+        await self.send({"type": "http.response.body", "body": body})
+
+
+async def _read_body(receive: Receive, limit: int) -> bytes:
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        size += len(chunks[-1])
+        if size > limit:
+            raise PayloadTooLarge(f"Request body exceeds {limit} bytes")
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+def _replay(body: bytes, upstream: Receive) -> Receive:
+    # hand the decoded body over once, then defer to the server for disconnects
+    sent = False
+
+    async def receive() -> Message:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await upstream()
+
+    return receive
+
+
+def _error(status_code: int, detail: str) -> JSONResponse:
+    return JSONResponse(status_code=status_code, content={"detail": detail, "field": None})
@@ -0,0 +1,379 @@
+"""
+Asynchronous scoring jobs for workloads too large for one HTTP request.
+
+A job reads a JSONL file (uploaded to `POST /jobs`, or a path under the shared
+`JOBS_INPUT_DIR` volume) with one `{"text": ..., "id": ...}` object per line,
+the same input as `scripts/score_offline.py`. Background worker threads score
+it in batches through `analyze_batch`, so the vectorized engine, batched
+embedding calls and the embedding caches all apply. Each batch's results and
+progress are committed to SQLite in one transaction, so a restarted server
+resumes unfinished jobs where they stopped. Finished jobs and their results
+expire after `JOBS_TTL_SECONDS`.
+
+Configured with `JOBS_DIR` (database and uploads, default `var/jobs`),
+`JOBS_INPUT_DIR` (unset = path submissions disabled), `JOBS_WORKERS` (default
+2), `JOBS_BATCH_SIZE` (default 500), `JOBS_TTL_SECONDS` (default 7 days) and
+`JOBS_MAX_UPLOAD_BYTES` (default 1 GiB).
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterator
+
+from app.models import validate_text_length_value
+from app.serialization import dumps
+
+_ROOT = Path(__file__).resolve().parent.parent
+_SWEEP_INTERVAL = 60.0
+# a running job whose owner has not committed a batch for this long is requeued
+_LEASE_SECONDS = 600.0
+_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    input_path TEXT NOT NULL,
+    owns_input INTEGER NOT NULL,
+    options TEXT NOT NULL,
+    total INTEGER,
+    processed INTEGER NOT NULL DEFAULT 0,
+    errors INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    owner TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS results (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    payload BLOB NOT NULL,
+    PRIMARY KEY (job_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+class JobError(ValueError):
+    def __init__(self, detail: str, field: str | None = None, status_code: int = 400):
+        super().__init__(detail)
+        self.field = field
+        self.status_code = status_code
+
+
+def _read_records(path: Path, skip: int) -> Iterator[tuple[str, str | None, str | None]]:
+    """Yield (id, text, error) per non-blank line, after the first `skip` records."""
+    seq = 0
+    with path.open(encoding="utf-8") as f:
+        for lineno, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            seq += 1
+            if seq <= skip:
+                continue
+            try:
+                record = json.loads(line)
+                item_id = str(record.get("id", lineno))
+            except (ValueError, AttributeError):
+                yield str(lineno), None, "Line is not a JSON object"
+                continue
+            text = record.get("text")
+            if not isinstance(text, str):
+                yield item_id, None, "Missing text"
+                continue
+            try:
+                yield item_id, validate_text_length_value(text), None
+            except ValueError as exc:
+                yield item_id, None, str(exc)
+
+
+def _alive(pid: int) -> bool:
+    if pid <= 0:
+        return False
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _count_records(path: Path) -> int:
+    with path.open("rb") as f:
+        return sum(1 for line in f if line.strip())
+
+
+class JobManager:
+    def __init__(
+        self,
+        root: Path,
+        input_dir: Path | None = None,
+        workers: int = 2,
+        batch_size: int = 500,
+        ttl: float = 7 * 86400,
+        max_upload_bytes: int = 1 << 30,
+    ):
+        self.root = Path(root)
+        self.input_dir = Path(input_dir).resolve() if input_dir else None
+        self.workers = workers
+        self.batch_size = batch_size
+        self.ttl = ttl
+        self.max_upload_bytes = max_upload_bytes
+        (self.root / "uploads").mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.root / "jobs.sqlite3", check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._last_sweep = 0.0
+
+    async def create_from_stream(self, chunks: AsyncIterator[bytes], options: dict[str, Any]) -> dict[str, Any]:
+        """Store an uploaded JSONL body and queue a job for it."""
+        job_id = uuid.uuid4().hex
+        path = self.root / "uploads" / f"{job_id}.jsonl"
+        size = 0
+        try:
+            with path.open("wb") as f:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if size > self.max_upload_bytes:
+                        raise JobError(f"Upload exceeds {self.max_upload_bytes} bytes", status_code=413)
+                    f.write(chunk)
+        except BaseException:
+            path.unlink(missing_ok=True)
+            raise
+        if size == 0:
+            path.unlink(missing_ok=True)
+            raise JobError("Upload is empty")
+        return self._insert(job_id, path, True, options)
+
+    def create_from_path(self, path: str, options: dict[str, Any]) -> dict[str, Any]:
+        """Queue a job reading a file that already sits on the shared input volume."""
+        if self.input_dir is None:
+            raise JobError("Path submissions are disabled (JOBS_INPUT_DIR is not set)", "path")
+        resolved = (self.input_dir / path).resolve()
+        if not resolved.is_relative_to(self.input_dir):
+            raise JobError("Path must be inside JOBS_INPUT_DIR", "path")
+        if not resolved.is_file():
+            raise JobError("File not found", "path", 404)
+        return self._insert(uuid.uuid4().hex, resolved, False, options)
+
+    def _insert(self, job_id: str, path: Path, owns_input: bool, options: dict[str, Any]) -> dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, status, input_path, owns_input, options, created_at, updated_at)"
+                " VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, str(path), int(owns_input), json.dumps(options), now, now),
+            )
+        self.start()
+        self._wake.set()
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> dict[str, Any] | None:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        finished_at = row["finished_at"]
+        return {
+            "id": row["id"],
+            "status": row["status"],
+            "processed": row["processed"],
+            "total": row["total"],
+            "errors": row["errors"],
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "finished_at": finished_at,
+            "expires_at": finished_at + self.ttl if finished_at is not None else None,
+            "results": f"/jobs/{row['id']}/results",
+        }
+
+    def results_page(self, job_id: str, offset: int, limit: int) -> list[bytes]:
+        """Stored result lines `offset` .. `offset + limit`, as serialized JSON."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT payload FROM results WHERE job_id = ? AND seq >= ? ORDER BY seq LIMIT ?",
+                (job_id, offset, limit),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def iter_results(self, job_id: str, page_size: int = 1000) -> Iterator[bytes]:
+        offset = 0
+        while page := self.results_page(job_id, offset, page_size):
+            yield from page
+            offset += len(page)
+
+    def start(self) -> None:
+        """Start the worker threads (idempotent), requeueing jobs orphaned by a dead process."""
+        self._requeue_orphans()
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"jobs-{i}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _work(self) -> None:
+        while not self._stop.is_set():
+            job = self._claim()
+            if job is None:
+                self._requeue_orphans()
+                self.expire()
+                self._wake.wait(1.0)
+                self._wake.clear()
+                continue
+            self._run(job)
+
+    def _claim(self) -> sqlite3.Row | None:
+        with self._lock:
+            while True:
+                row = self._db.execute(
+                    "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    return None
+                # other processes may share the database; only one claim can win
+                claimed = self._db.execute(
+                    "UPDATE jobs SET status = 'running', owner = ?, updated_at = ? WHERE id = ? AND status = 'queued'",
+                    (_OWNER, time.time(), row["id"]),
+                ).rowcount
+                if claimed:
+                    return row
+
+    def _requeue_orphans(self) -> None:
+        """Requeue running jobs whose owner process on this host is gone, or whose lease lapsed."""
+        host = _OWNER.rsplit(":", 1)[0]
+        with self._lock:
+            rows = self._db.execute("SELECT id, owner, updated_at FROM jobs WHERE status = 'running'").fetchall()
+            for row in rows:
+                owner_host, _, pid = (row["owner"] or ":").rpartition(":")
+                stale = row["updated_at"] < time.time() - _LEASE_SECONDS
+                if stale or row["owner"] is None or (owner_host == host and not _alive(int(pid or 0))):
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'queued', owner = NULL WHERE id = ? AND owner IS ?",
+                        (row["id"], row["owner"]),
+                    )
+
+    def _run(self, job: sqlite3.Row) -> None:
+        from app.analyzers import analyze_batch
+
+        job_id = job["id"]
+        options = json.loads(job["options"])
+        try:
+            path = Path(job["input_path"])
+            if job["total"] is None:
+                total = _count_records(path)
+                with self._lock:
+                    self._db.execute("UPDATE jobs SET total = ? WHERE id = ?", (total, job_id))
+            seq = job["processed"]
+            records = _read_records(path, seq)
+            while batch := [r for _, r in zip(range(self.batch_size), records)]:
+                if self._stop.is_set():
+                    self._set_status(job_id, "queued")
+                    return
+                valid = [(item_id, text) for item_id, text, error in batch if error is None]
+                results = iter(analyze_batch([text for _, text in valid], **options)) if valid else iter(())
+                rows = []
+                errors = 0
+                for item_id, _text, error in batch:
+                    if error is None:
+                        line = {"id": item_id, "result": next(results).to_payload()}
+                    else:
+                        line = {"id": item_id, "error": error}
+                        errors += 1
+                    rows.append((job_id, seq, dumps(line)))
+                    seq += 1
+                with self._lock:
+                    self._db.execute("BEGIN")
+                    self._db.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?)", rows)
+                    self._db.execute(
+                        "UPDATE jobs SET processed = ?, errors = errors + ?, updated_at = ? WHERE id = ?",
+                        (seq, errors, time.time(), job_id),
+                    )
+                    self._db.execute("COMMIT")
+            self._set_status(job_id, "done")
+        except Exception as exc:
+            self._set_status(job_id, "failed", f"{type(exc).__name__}: {exc}")
+
+    def _set_status(self, job_id: str, status: str, error: str | None = None) -> None:
+        now = time.time()
+        finished = now if status in ("done", "failed") else None
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ?, finished_at = ? WHERE id = ?",
+                (status, error, now, finished, job_id),
+            )
+
+    def expire(self, now: float | None = None) -> int:
+        """Delete finished jobs older than the TTL with their results and uploads; return the count."""
+        now = time.time() if now is None else now
+        if now - self._last_sweep < _SWEEP_INTERVAL:
+            return 0
+        self._last_sweep = now
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, input_path, owns_input FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                (now - self.ttl,),
+            ).fetchall()
+            for row in rows:
+                self._db.execute("DELETE FROM results WHERE job_id = ?", (row["id"],))
+                self._db.execute("DELETE FROM jobs WHERE id = ?", (row["id"],))
+        for row in rows:
+            if row["owns_input"]:
+                Path(row["input_path"]).unlink(missing_ok=True)
+        return len(rows)
+
+
+_manager: JobManager | None = None
+_manager_lock = threading.Lock()
+
+
+def _jobs_dir() -> Path:
+    return Path(os.environ.get("JOBS_DIR", _ROOT / "var" / "jobs"))
+
+
+def has_pending_jobs() -> bool:
+    """True if the configured job database has queued or running jobs, without opening a manager."""
+    path = _jobs_dir() / "jobs.sqlite3"
+    if not path.exists():
+        return False
+    with sqlite3.connect(path) as db:
+        return db.execute("SELECT 1 FROM jobs WHERE status IN ('queued', 'running') LIMIT 1").fetchone() is not None
+
+
+def get_jobs() -> JobManager:
+    """The process-wide job manager, configured from the environment on first use."""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                input_dir = os.environ.get("JOBS_INPUT_DIR", "").strip()
+                _manager = JobManager(
+                    _jobs_dir(),
+                    Path(input_dir) if input_dir else None,
+                    workers=int(os.environ.get("JOBS_WORKERS", 2)),
+                    batch_size=int(os.environ.get("JOBS_BATCH_SIZE", 500)),
+                    ttl=float(os.environ.get("JOBS_TTL_SECONDS", 7 * 86400)),
+                    max_upload_bytes=int(os.environ.get("JOBS_MAX_UPLOAD_BYTES", 1 << 30)),
+                )
+    return _manager
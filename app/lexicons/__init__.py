@@ -6,3 +6,4 @@ from app.lexicons.loader import (
     get_urgency_terms,
     load_lexicon,
 )
+from app.lexicons.bundle import LexiconBundle, get_lexicons, reload_lexicons
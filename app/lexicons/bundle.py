@@ -0,0 +1,217 @@
+"""
+Immutable, versioned snapshot of every lexicon the analyzers read.
+
+A `LexiconBundle` is built once from the lexicon files (fallback term lists
+applied, NRC words merged into the arousal weights) and never modified. Its
+`version` is a digest of the files' contents, so every worker that loads the
+same files reports the same version.
+
+`get_lexicons()` returns the current bundle. Each analysis takes one reference
+up front and passes it down, so a request that started before a reload finishes
+on the bundle it started with. `reload_lexicons()` builds the replacement off
+the request path and swaps the module reference in one assignment.
+
+Reloads run on `POST /admin/lexicons/reload` or, with `LEXICON_WATCH_SECONDS`
+set, whenever a watcher thread sees a lexicon file's mtime or size change.
+`LEXICON_DIR` points at a directory of lexicon files to use instead of the
+bundled `custom/`.
+"""
+import hashlib
+import os
+import threading
+from pathlib import Path
+from types import MappingProxyType
+from typing import Mapping
+
+from app.lexicons.loader import _LEXICON_DIR, read_terms, read_urgency_sections, read_weighted_terms
+from app.lexicons.nrc import _NRC_PATH, read_nrc_arousal_words
+
+# used when a lexicon file is missing or empty
+_DEFAULT_MORALIZED = frozenset({
+    "wrong", "evil", "traitor", "betray", "sin", "corrupt", "immoral",
+    "disgrace", "shameful", "outrage", "outrageous", "vile", "wicked",
+})
+_DEFAULT_SUPERLATIVES = frozenset({
+    "best", "worst", "most", "least", "incredible", "astonishing",
+    "unbelievable", "shocking",
+})
+_DEFAULT_TRADEOFF = frozenset({"however", "although", "trade-off", "tradeoff", "on the other hand"})
+_DEFAULT_CONDITIONAL = frozenset({"if", "when", "unless", "depending on"})
+_DEFAULT_TIME = frozenset({
+    "act now", "do it now", "hurry", "limited time", "last chance", "don't miss",
+    "expires soon", "before it's too late", "urgency", "urgent", "immediately",
+    "right now", "today only", "ends soon", "final hours", "countdown", "deadline",
+    "now or never", "must act",
+})
+_DEFAULT_SCARCITY = frozenset({
+    "limited", "exclusive", "only a few left", "sold out", "almost gone",
+    "last remaining", "one of a kind", "rare", "scarce", "first come first served",
+    "supplies limited",
+})
+_DEFAULT_FOMO = frozenset({
+    "don't miss out", "you'll regret", "everyone else is", "join thousands",
+    "see what others are missing", "be the first", "act before everyone else",
+    "limited availability", "going fast", "running out",
+})
+
+
+class LexiconBundle:
+    """One immutable generation of the lexicons; compare bundles by `version`."""
+
+    __slots__ = (
+        "version",
+        "emotion",
+        "moralized",
+        "superlatives",
+        "curiosity_gap",
+        "tradeoff",
+        "conditional",
+        "urgency_time",
+        "urgency_scarcity",
+        "urgency_fomo",
+    )
+
+    def __init__(
+        self,
+        version: str,
+        emotion: Mapping[str, float],
+        moralized: frozenset[str],
+        superlatives: frozenset[str],
+        curiosity_gap: frozenset[str],
+        tradeoff: frozenset[str],
+        conditional: frozenset[str],
+        urgency_time: frozenset[str],
+        urgency_scarcity: frozenset[str],
+        urgency_fomo: frozenset[str],
+    ):
+        values = (
+            version,
+            MappingProxyType(dict(emotion)),
+            moralized,
+            superlatives,
+            curiosity_gap,
+            tradeoff,
+            conditional,
+            urgency_time,
+            urgency_scarcity,
+            urgency_fomo,
+        )
+        for name, value in zip(self.__slots__, values):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name: str, value: object) -> None:
+        raise AttributeError("LexiconBundle is immutable")
+
+
+def lexicon_dir() -> Path:
+    value = os.environ.get("LEXICON_DIR", "").strip()
+    return Path(value) if value else _LEXICON_DIR
+
+
+def _sources(directory: Path) -> list[Path]:
+    files = sorted(directory.glob("*.txt")) if directory.is_dir() else []
+    return files + ([_NRC_PATH] if _NRC_PATH.exists() else [])
+
+
+def _fingerprint(directory: Path) -> tuple:
+    """Cheap change check for the watcher: (name, mtime, size) of every source file."""
+    out = []
+    for path in _sources(directory):
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        out.append((path.name, st.st_mtime_ns, st.st_size))
+    return tuple(out)
+
+
+def build_bundle(directory: Path | None = None) -> LexiconBundle:
+    """Read every lexicon file under `directory` (default `lexicon_dir()`) into a new bundle."""
+    directory = directory or lexicon_dir()
+    digest = hashlib.blake2b(digest_size=8)
+    for path in _sources(directory):
+        digest.update(path.name.encode() + b"\0" + path.read_bytes() + b"\0")
+    urgency = read_urgency_sections(directory / "urgency.txt")
+    # arousal.txt words carry tier weights; NRC words default to 1.0
+    emotion = {
+        **{w: 1.0 for w in read_nrc_arousal_words(_NRC_PATH)},
+        **read_weighted_terms(directory / "arousal.txt"),
+    }
+    return LexiconBundle(
+        version=digest.hexdigest(),
+        emotion=emotion,
+        moralized=read_terms(directory / "moralized.txt") or _DEFAULT_MORALIZED,
+        superlatives=read_terms(directory / "superlatives.txt") or _DEFAULT_SUPERLATIVES,
+        curiosity_gap=read_terms(directory / "curiosity_gap.txt"),
+        tradeoff=read_terms(directory / "tradeoff.txt") or _DEFAULT_TRADEOFF,
+        conditional=read_terms(directory / "conditional.txt") or _DEFAULT_CONDITIONAL,
+        urgency_time=urgency["time_pressure"] or _DEFAULT_TIME,
+        urgency_scarcity=urgency["scarcity"] or _DEFAULT_SCARCITY,
+        urgency_fomo=urgency["fomo"] or _DEFAULT_FOMO,
+    )
+
+
+_current: LexiconBundle | None = None
+_reload_lock = threading.Lock()
+_watcher: threading.Thread | None = None
+_stop_watching = threading.Event()
+
+
+def get_lexicons() -> LexiconBundle:
+    """The current bundle. Hold on to the returned object for the rest of a request."""
+    return _current or reload_lexicons()[0]
+
+
+def reload_lexicons() -> tuple[LexiconBundle, bool]:
+    """
+    Rebuild the bundle from disk and swap it in if its version changed.
+    Returns (current bundle, whether it changed). Errors reading the files
+    propagate and leave the current bundle in place.
+    """
+    global _current
+    with _reload_lock:
+        bundle = build_bundle()
+        if _current is not None and _current.version == bundle.version:
+            return _current, False
+        _current = bundle
+        return bundle, True
+
+
+def _watch(directory: Path, seen: tuple, interval: float) -> None:
+    while not _stop_watching.wait(interval):
+        current = _fingerprint(directory)
+        if current == seen:
+            continue
+        try:
+            reload_lexicons()
+        except (OSError, UnicodeDecodeError):
+            continue  # half-written file: keep the old bundle, retry next tick
+        seen = current
+
+
+def start_watching(interval: float | None = None) -> bool:
+    """Start the mtime watcher (idempotent); `interval` defaults to `LEXICON_WATCH_SECONDS`, 0 = off."""
+    global _watcher
+    if interval is None:
+        interval = float(os.environ.get("LEXICON_WATCH_SECONDS", 0) or 0)
+    if interval <= 0:
+        return False
+    directory = lexicon_dir()
+    seen = _fingerprint(directory)
+    get_lexicons()
+    with _reload_lock:
+        if _watcher is None or not _watcher.is_alive():
+            _stop_watching.clear()
+            _watcher = threading.Thread(
+                target=_watch, args=(directory, seen, interval), name="lexicon-watch", daemon=True
+            )
+            _watcher.start()
+    return True
+
+
+def stop_watching(timeout: float | None = None) -> None:
+    global _watcher
+    _stop_watching.set()
+    if _watcher is not None:
+        _watcher.join(timeout)
+        _watcher = None
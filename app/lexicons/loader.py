@@ -10,34 +10,21 @@ _WEIGHTED_CACHE: dict[str, dict[str, float]] = {}
 _TIER_WEIGHTS: dict[int, float] = {1: 1.0, 2: 1.3, 3: 1.6}
 
 
-def load_lexicon(name: str) -> frozenset[str]:
-    """Load lexicon from custom/<name>.txt, lowercase, strip, skip comments."""
-    if name in _CACHE:
-        return _CACHE[name]
-    path = _LEXICON_DIR / f"{name}.txt"
+def read_terms(path: Path) -> frozenset[str]:
+    """Read a term list from `path`, lowercase, strip, skip comments. Missing file -> empty."""
     if not path.exists():
-        _CACHE[name] = frozenset()
-        return _CACHE[name]
+        return frozenset()
     terms = set()
     for line in path.read_text(encoding="utf-8").splitlines():
         line = line.strip().lower()
         if line and not line.startswith("#"):
             terms.add(line)
-    _CACHE[name] = frozenset(terms)
-    return _CACHE[name]
+    return frozenset(terms)
 
 
-def load_weighted_lexicon(name: str) -> dict[str, float]:
-    """
-    Load lexicon with optional ':N' valence tier annotations (N = 1, 2, or 3).
-    Returns {word: weight}. Bare entries (no colon) default to weight 1.0.
-    Cached separately from load_lexicon.
-    """
-    if name in _WEIGHTED_CACHE:
-        return _WEIGHTED_CACHE[name]
-    path = _LEXICON_DIR / f"{name}.txt"
+def read_weighted_terms(path: Path) -> dict[str, float]:
+    """Read a term list with optional ':N' valence tiers from `path` as {word: weight}."""
     if not path.exists():
-        _WEIGHTED_CACHE[name] = {}
         return {}
     result: dict[str, float] = {}
     for line in path.read_text(encoding="utf-8").splitlines():
@@ -55,27 +42,11 @@ def load_weighted_lexicon(name: str) -> dict[str, float]:
             word = line
             weight = 1.0
         result[word] = weight
-    _WEIGHTED_CACHE[name] = result
     return result
 
 
-def get_arousal_terms() -> frozenset[str]:
-    """Return arousal words as a frozenset (tier annotations stripped)."""
-    return frozenset(load_weighted_lexicon("arousal").keys())
-
-
-def get_arousal_weighted_terms() -> dict[str, float]:
-    """Return {word: valence_weight} for the arousal lexicon."""
-    return load_weighted_lexicon("arousal")
-
-
-def get_urgency_terms() -> frozenset[str]:
-    return load_lexicon("urgency")
-
-
-def get_urgency_sections() -> dict[str, frozenset[str]]:
-    """Return {time_pressure, scarcity, fomo} from urgency.txt with # section headers."""
-    path = _LEXICON_DIR / "urgency.txt"
+def read_urgency_sections(path: Path) -> dict[str, frozenset[str]]:
+    """Read {time_pressure, scarcity, fomo} from an urgency file with # section headers."""
     result: dict[str, set[str]] = {"time_pressure": set(), "scarcity": set(), "fomo": set()}
     current: str | None = None
     if not path.exists():
@@ -98,6 +69,43 @@ def get_urgency_sections() -> dict[str, frozenset[str]]:
     return {k: frozenset(v) if v else frozenset() for k, v in result.items()}
 
 
+def load_lexicon(name: str) -> frozenset[str]:
+    """Load lexicon from custom/<name>.txt, lowercase, strip, skip comments."""
+    if name not in _CACHE:
+        _CACHE[name] = read_terms(_LEXICON_DIR / f"{name}.txt")
+    return _CACHE[name]
+
+
+def load_weighted_lexicon(name: str) -> dict[str, float]:
+    """
+    Load lexicon with optional ':N' valence tier annotations (N = 1, 2, or 3).
+    Returns {word: weight}. Bare entries (no colon) default to weight 1.0.
+    Cached separately from load_lexicon.
+    """
+    if name not in _WEIGHTED_CACHE:
+        _WEIGHTED_CACHE[name] = read_weighted_terms(_LEXICON_DIR / f"{name}.txt")
+    return _WEIGHTED_CACHE[name]
+
+
+def get_arousal_terms() -> frozenset[str]:
+    """Return arousal words as a frozenset (tier annotations stripped)."""
+    return frozenset(load_weighted_lexicon("arousal").keys())
+
+
+def get_arousal_weighted_terms() -> dict[str, float]:
+    """Return {word: valence_weight} for the arousal lexicon."""
+    return load_weighted_lexicon("arousal")
+
+
+def get_urgency_terms() -> frozenset[str]:
+    return load_lexicon("urgency")
+
+
+def get_urgency_sections() -> dict[str, frozenset[str]]:
+    """Return {time_pressure, scarcity, fomo} from urgency.txt with # section headers."""
+    return read_urgency_sections(_LEXICON_DIR / "urgency.txt")
+
+
 def get_moralized_terms() -> frozenset[str]:
     return load_lexicon("moralized")
 
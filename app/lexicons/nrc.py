@@ -6,18 +6,21 @@ _HIGH_AROUSAL = {"anger", "fear", "disgust"}
 _CACHE: set[str] | None = None
 
 
-def get_nrc_arousal_words() -> frozenset[str]:
-    """Return high-arousal emotion words from NRC if file exists, else empty set."""
-    global _CACHE
-    if _CACHE is not None:
-        return frozenset(_CACHE)
-    if not _NRC_PATH.exists():
-        _CACHE = set()
+def read_nrc_arousal_words(path: Path) -> frozenset[str]:
+    """Read high-arousal emotion words from an NRC file at `path`; missing file -> empty set."""
+    if not path.exists():
         return frozenset()
     words = set()
-    for line in _NRC_PATH.read_text(encoding="utf-8").splitlines():
+    for line in path.read_text(encoding="utf-8").splitlines():
         parts = line.strip().split("\t")
         if len(parts) >= 3 and parts[2] == "1" and parts[1] in _HIGH_AROUSAL:
             words.add(parts[0].lower())
-    _CACHE = words
     return frozenset(words)
+
+
+def get_nrc_arousal_words() -> frozenset[str]:
+    """Return high-arousal emotion words from NRC if file exists, else empty set."""
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = set(read_nrc_arousal_words(_NRC_PATH))
+    return frozenset(_CACHE)
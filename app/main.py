@@ -1,19 +1,49 @@
+import json
 import os
+from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import AsyncIterator, Literal
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Header, Query, Request, WebSocket
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-
+from starlette.concurrency import run_in_threadpool
+
+from app import tracing
+from app.admin import AdminError, require_admin
+from app.admission import Overloaded, get_admission, request_weight
+from app.analyzers import Engine
+from app.budget import BudgetExceeded, cpu_budget_ms
+from app.cache import get_result_cache
+from app.compression import (
+    MAX_DECOMPRESSED_BYTES,
+    CompressionMiddleware,
+    InvalidEncoding,
+    PayloadTooLarge,
+    UnsupportedEncoding,
+    decode_stream,
+)
+from app.jobs import JobError, get_jobs, has_pending_jobs
+from app.lexicons.bundle import get_lexicons, reload_lexicons, start_watching, stop_watching
+from app.ml.backends import BackendName, check_default_backend
+from app.ml.centroids import CentroidError
+from app.ml.scorer import default_timeout_ms
 from app.models import (
     AnalyzeRequest,
     AnalyzeResponse,
     BatchAnalyzeRequest,
     BatchAnalyzeResponse,
-    BatchAnalyzeResult,
+    CentroidVersion,
+    FeedbackRequest,
+    FeedbackResponse,
+    JobResultsPage,
+    JobStatus,
 )
+from app.profiling import list_profiles, profile_path, render_text, run_profiled, sampled
+from app.serialization import Layout, columnar_payload, dumps, encoded_response
+from app.ws import ScoringSession
 
 load_dotenv()
 
@@ -66,14 +96,37 @@ _TAGS = [
         "name": "Analysis",
         "description": "Score text for engagement-bait signals. Supports single and batch requests.",
     },
+    {
+        "name": "Jobs",
+        "description": "Background scoring of large JSONL archives.",
+    },
+    {
+        "name": "Admin",
+        "description": "Operator endpoints (lexicon reloads, centroid feedback, request profiles); require the `X-Admin-Token` header.",
+    },
     {
         "name": "System",
         "description": "Health, metadata, and the browser demo.",
     },
 ]
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # a bad VECTOR_BACKEND would otherwise fail every request with a 500
+    check_default_backend()
+    # resume jobs a previous process left queued or running
+    if has_pending_jobs():
+        get_jobs().start()
+    # LEXICON_WATCH_SECONDS: reload lexicons when their files change
+    start_watching()
+    yield
+    stop_watching(timeout=1)
+    tracing.shutdown()
+
+
 app = FastAPI(
     title="Engagement Bait API",
+    lifespan=lifespan,
     description=_DESCRIPTION,
     version="0.1.0",
     openapi_tags=_TAGS,
@@ -81,6 +134,12 @@ app = FastAPI(
     redoc_url="/redoc",
 )
 
+# /jobs uploads can be far larger than MAX_DECOMPRESSED_BYTES; create_job decodes them as they stream in
+app.add_middleware(CompressionMiddleware, streaming_paths=("/jobs",))
+# TRACING_EXPORTER / OTEL_EXPORTER_OTLP_ENDPOINT: one span per request, outermost so it covers compression
+if tracing.configure():
+    app.add_middleware(tracing.TracingMiddleware)
+
 STATIC_DIR = Path(__file__).resolve().parent / "static"
 app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 
@@ -89,6 +148,14 @@ def _openai_enabled() -> bool:
     return bool(os.environ.get("OPENAI_API_KEY", "").strip().startswith("sk-"))
 
 
+def _profile_requested(request: Request) -> bool:
+    # X-Profile is admin-only; PROFILE_SAMPLE_RATE covers everyone else
+    if request.headers.get("x-profile", "").strip().lower() in ("1", "true"):
+        require_admin(request.headers.get("x-admin-token"))
+        return True
+    return sampled()
+
+
 @app.get(
     "/",
     tags=["System"],
@@ -105,6 +172,8 @@ async def root():
         "health": "/health",
         "analyze": "/analyze",
         "analyze_batch": "/analyze/batch",
+        "analyze_ws": "/ws/analyze",
+        "jobs": "/jobs",
     }
 
 
@@ -121,6 +190,9 @@ async def health():
     return {
         "status": "ok",
         "openai_enabled": _openai_enabled(),
+        "lexicon_version": get_lexicons().version,
+        "admission": get_admission().snapshot(),
+        **({"shared_cache": cache.stats()} if (cache := get_result_cache()) is not None else {}),
     }
 
 
@@ -149,6 +221,38 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     )
 
 
+@app.exception_handler(Overloaded)
+async def overloaded_exception_handler(request: Request, exc: Overloaded):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "field": None},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(BudgetExceeded)
+async def budget_exception_handler(request: Request, exc: BudgetExceeded):
+    content = {"detail": str(exc), "field": "text"}
+    if exc.profile_id is not None:
+        content["profile_id"] = exc.profile_id
+    return JSONResponse(status_code=422, content=content)
+
+
+@app.exception_handler(AdminError)
+async def admin_exception_handler(request: Request, exc: AdminError):
+    return JSONResponse(status_code=exc.status_code, content={"detail": str(exc), "field": "x-admin-token"})
+
+
+@app.exception_handler(JobError)
+async def job_exception_handler(request: Request, exc: JobError):
+    return JSONResponse(status_code=exc.status_code, content={"detail": str(exc), "field": exc.field})
+
+
+@app.exception_handler(CentroidError)
+async def centroid_exception_handler(request: Request, exc: CentroidError):
+    return JSONResponse(status_code=exc.status_code, content={"detail": str(exc), "field": exc.field})
+
+
 @app.post(
     "/analyze",
     tags=["Analysis"],
@@ -162,7 +266,26 @@ Also returns a `meta` object describing whether the embeddings path ran.
 **Query parameter:** `embeddings=true|false`
 - `true` — always attempt embeddings scoring (requires OpenAI key on server)
 - `false` — heuristics only, no external calls
-- omitted — embeddings run automatically if an OpenAI key is configured
+- omitted — embeddings run automatically if the vector backend is available
+
+**Query parameter:** `backend=openai|local`
+- `openai` — OpenAI `text-embedding-3-small` (`meta.vector_backend: "centroid"`)
+- `local` — offline hashed n-gram vectors, no external calls (`meta.vector_backend: "local"`)
+- omitted — the server default from `VECTOR_BACKEND` (`openai` unless configured)
+
+**Query parameter:** `timeout_ms=1..60000`
+- the embedding starts before the heuristics; if it is not ready within `timeout_ms`, the response
+  carries the heuristics with `engagement_bait_score: null` and `meta.deadline_exceeded: true`
+- omitted — the server default from `EMBEDDING_TIMEOUT_MS` (no deadline unless configured)
+
+**Under load:** past the soft admission limit embeddings are skipped and `meta.degraded: true` is set;
+past the hard limit the request is rejected with `503` and a `Retry-After` header.
+
+**CPU budget:** analysis that uses more than `ANALYSIS_CPU_BUDGET_MS` of CPU time (default 2000) is
+stopped and the request fails with `422`.
+
+**Profiling:** `X-Profile: 1` with a valid `X-Admin-Token` runs the request under cProfile and returns the
+artifact id in `meta.profile_id`; see `GET /admin/profiles`.
 
 **Text constraints:** 50–50,000 characters
 
@@ -174,10 +297,35 @@ curl -s -X POST "https://engagbaitapi.onrender.com/analyze?embeddings=false" \\
 ```
 """,
 )
-async def analyze(request: AnalyzeRequest, embeddings: bool | None = None):
+async def analyze(
+    request: AnalyzeRequest,
+    http_request: Request,
+    embeddings: bool | None = None,
+    backend: BackendName | None = None,
+    timeout_ms: int | None = Query(None, ge=1, le=60_000),
+):
     from app.analyzers import analyze_text
 
-    return analyze_text(request.text, ml=embeddings)
+    profile = _profile_requested(http_request)
+    with get_admission().admit(request_weight([request.text])) as ticket:
+        result, profile_id = await run_in_threadpool(
+            ticket.run,
+            run_profiled,
+            profile,
+            analyze_text,
+            request.text,
+            ml=embeddings,
+            backend=backend,
+            timeout_ms=timeout_ms or default_timeout_ms(),
+            degraded=ticket.degraded,
+            cpu_budget_ms=cpu_budget_ms(),
+        )
+    result.meta.profile_id = profile_id
+    # returning a Response skips FastAPI's re-validation against response_model
+    return encoded_response(
+        result.to_payload(),
+        http_request.headers.get("accept"),
+    )
 
 
 @app.post(
@@ -188,7 +336,20 @@ async def analyze(request: AnalyzeRequest, embeddings: bool | None = None):
     description="""Analyze up to 10 texts in a single request.
 
 Response preserves submission order and echoes each caller-supplied `id`.
-Accepts the same `embeddings` query parameter as `/analyze` — applies uniformly to all items.
+Accepts the same `embeddings`, `backend` and `timeout_ms` query parameters as `/analyze` — applies uniformly to all items.
+Embeddings for all items go out as one request; `timeout_ms` is one deadline for it, and if it is missed every item falls back to heuristics only.
+
+**Wire formats:**
+- `layout=columnar` — list every score key once under `columns`, with one parallel value array per column under `data`
+- `Accept: application/msgpack` — MessagePack instead of JSON (any layout)
+- `Content-Encoding: gzip|zstd` request bodies and `Accept-Encoding: gzip|zstd` responses are supported
+
+**Engine:** `engine=python|vectorized` — `vectorized` resolves the lexicon, urgency-phrase and lexical-diversity
+signals for the whole batch with NumPy over interned token ids. Scores are identical; falls back to `python` when NumPy is not installed.
+
+**Under load:** admission control weighs a batch by its item count and text length; see `/analyze`.
+
+**Profiling:** `X-Profile: 1` (admin only) profiles the whole batch; every item carries the same `meta.profile_id`.
 
 **Batch constraints:**
 - 1–10 items per request
@@ -207,12 +368,307 @@ curl -s -X POST "https://engagbaitapi.onrender.com/analyze/batch?embeddings=fals
 ```
 """,
 )
-async def analyze_batch(request: BatchAnalyzeRequest, embeddings: bool | None = None):
-    from app.analyzers import analyze_text
+async def analyze_batch(
+    request: BatchAnalyzeRequest,
+    http_request: Request,
+    embeddings: bool | None = None,
+    layout: Layout = "items",
+    engine: Engine = "python",
+    backend: BackendName | None = None,
+    timeout_ms: int | None = Query(None, ge=1, le=60_000),
+):
+    from app.analyzers import analyze_batch
+
+    texts = [item.text for item in request.items]
+    profile = _profile_requested(http_request)
+    with get_admission().admit(request_weight(texts)) as ticket:
+        results, profile_id = await run_in_threadpool(
+            ticket.run,
+            run_profiled,
+            profile,
+            analyze_batch,
+            texts,
+            ml=embeddings,
+            engine=engine,
+            backend=backend,
+            timeout_ms=timeout_ms or default_timeout_ms(),
+            degraded=ticket.degraded,
+            cpu_budget_ms=cpu_budget_ms(),
+        )
+    for result in results:
+        result.meta.profile_id = profile_id
+    if layout == "columnar":
+        payload = columnar_payload([item.id for item in request.items], results)
+    else:
+        payload = {
+            "items": [
+                {"id": item.id, "result": result.to_payload()}
+                for item, result in zip(request.items, results)
+            ]
+        }
+    return encoded_response(payload, http_request.headers.get("accept"))
+
+
+@app.websocket("/ws/analyze")
+async def analyze_ws(
+    websocket: WebSocket,
+    embeddings: bool | None = None,
+    backend: BackendName | None = None,
+    timeout_ms: int | None = Query(None, ge=1, le=60_000),
+):
+    # WebSocket routes are not part of the OpenAPI schema; the protocol is documented in app/ws.py and the README
+    await websocket.accept()
+    await ScoringSession(websocket, embeddings, backend, timeout_ms or default_timeout_ms()).run()
+
+
+_JSONL_TYPES = ("application/x-ndjson", "application/jsonl", "application/x-jsonlines")
+
+
+def _decoded_stream(request: Request, limit: int) -> AsyncIterator[bytes]:
+    """The request body per its `Content-Encoding`, decoded as it arrives (/jobs skips the middleware's decoding)."""
+    encoding = request.headers.get("content-encoding", "identity").strip().lower()
+    if encoding in ("", "identity"):
+        return request.stream()
+    return decode_stream(request.stream(), encoding, limit)
 
-    return BatchAnalyzeResponse(
-        items=[
-            BatchAnalyzeResult(id=item.id, result=analyze_text(item.text, ml=embeddings))
-            for item in request.items
-        ]
-    )
+
+@app.post(
+    "/jobs",
+    tags=["Jobs"],
+    status_code=202,
+    response_model=JobStatus,
+    summary="Submit a scoring job",
+    description="""Queue a background job that scores a JSONL file: one `{"text": ..., "id": ...}` object per line,
+`id` defaulting to the line number.
+
+**Input**, by `Content-Type`:
+- `application/x-ndjson` — the JSONL file itself as the request body (gzip/zstd `Content-Encoding` supported)
+- `application/json` — `{"path": "archive.jsonl"}`, a file under the server's shared `JOBS_INPUT_DIR` volume
+
+Accepts the same `embeddings`, `engine` and `backend` query parameters as `/analyze/batch`; `engine`
+defaults to `vectorized`. Lines that are not valid JSON or whose text fails the 50–50,000 character check are
+reported as `{"id": ..., "error": ...}` result lines instead of failing the job.
+
+Poll `GET /jobs/{id}` for progress, then page through `GET /jobs/{id}/results`.
+
+**Example (curl):**
+```bash
+curl -s -X POST "https://engagbaitapi.onrender.com/jobs?embeddings=false" \\
+  -H "Content-Type: application/x-ndjson" --data-binary @archive.jsonl
+```
+""",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/x-ndjson": {"schema": {"type": "string", "format": "binary"}},
+                "application/json": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {"path": {"type": "string"}},
+                        "required": ["path"],
+                    }
+                },
+            },
+        }
+    },
+)
+async def create_job(
+    http_request: Request,
+    embeddings: bool | None = None,
+    engine: Engine = "vectorized",
+    backend: BackendName | None = None,
+):
+    options = {"ml": embeddings, "engine": engine, "backend": backend}
+    content_type = http_request.headers.get("content-type", "").split(";")[0].strip().lower()
+    try:
+        if content_type in _JSONL_TYPES:
+            return await get_jobs().create_from_stream(
+                _decoded_stream(http_request, get_jobs().max_upload_bytes), options
+            )
+        if content_type == "application/json":
+            raw = b"".join([chunk async for chunk in _decoded_stream(http_request, MAX_DECOMPRESSED_BYTES)])
+            try:
+                body = json.loads(raw)
+            except ValueError:
+                raise JobError("Body is not valid JSON") from None
+            path = body.get("path") if isinstance(body, dict) else None
+            if not isinstance(path, str) or not path:
+                raise JobError("Field required", "path", 422)
+            return await run_in_threadpool(get_jobs().create_from_path, path, options)
+    except UnsupportedEncoding as exc:
+        raise JobError(str(exc), status_code=415) from None
+    except PayloadTooLarge as exc:
+        raise JobError(str(exc), status_code=413) from None
+    except InvalidEncoding as exc:
+        raise JobError(str(exc)) from None
+    raise JobError("Content-Type must be application/x-ndjson or application/json", status_code=415)
+
+
+@app.get(
+    "/jobs/{job_id}",
+    tags=["Jobs"],
+    response_model=JobStatus,
+    summary="Job status and progress",
+    description="Return a job's status (`queued`, `running`, `done`, `failed`) and how many lines it has scored.",
+)
+async def job_status(job_id: str):
+    job = get_jobs().get(job_id)
+    if job is None:
+        raise JobError("Job not found", "job_id", 404)
+    return job
+
+
+@app.get(
+    "/jobs/{job_id}/results",
+    tags=["Jobs"],
+    response_model=JobResultsPage,
+    summary="Job results",
+    description="""Return scored lines in input order, available while the job runs.
+
+Each line is `{"id": ..., "result": {...}}` in the `/analyze/batch` item shape, or `{"id": ..., "error": ...}`.
+Page with `offset` and `limit`; follow `next_offset` until it is `null` (the job may still be adding lines
+while it is `running`). With `Accept: application/x-ndjson` every result stored so far is streamed
+as JSONL instead.""",
+)
+async def job_results(
+    job_id: str,
+    http_request: Request,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=10_000),
+):
+    jobs = get_jobs()
+    if jobs.get(job_id) is None:
+        raise JobError("Job not found", "job_id", 404)
+    if "application/x-ndjson" in (http_request.headers.get("accept") or ""):
+        return StreamingResponse(
+            (line + b"\n" for line in jobs.iter_results(job_id)),
+            media_type="application/x-ndjson",
+        )
+    page = await run_in_threadpool(jobs.results_page, job_id, offset, limit)
+    next_offset = offset + len(page) if len(page) == limit else None
+    # rows are stored serialized; splice them instead of re-encoding
+    body = b'{"items":[' + b",".join(page) + b'],"next_offset":' + dumps(next_offset) + b"}"
+    return Response(body, media_type="application/json")
+
+
+@app.post(
+    "/admin/lexicons/reload",
+    tags=["Admin"],
+    summary="Reload lexicons",
+    description="""Re-read the lexicon files and swap in a new lexicon bundle if they changed.
+
+Requests already running finish on the bundle they started with; new requests use the new one.
+Each response reports its bundle in `meta.lexicon_version`, and shared-cache entries from other versions are
+never reused. Returns `{"version": ..., "changed": true|false}`. This reloads the worker that serves the request;
+use `LEXICON_WATCH_SECONDS` to have every worker pick up file changes on its own.""",
+)
+async def reload_lexicon_bundle(x_admin_token: str | None = Header(None)):
+    require_admin(x_admin_token)
+    bundle, changed = await run_in_threadpool(reload_lexicons)
+    return {"version": bundle.version, "changed": changed}
+
+
+@app.post(
+    "/admin/centroids/feedback",
+    tags=["Admin"],
+    response_model=FeedbackResponse,
+    summary="Fold moderator labels into the centroids",
+    description="""Add up to 1000 labeled texts (`bait` or `neutral`) to the centroids of the `backend` query parameter
+(default `VECTOR_BACKEND`). Only texts that are new, or whose label changed, are embedded; the running means and counts
+are updated from those alone and committed as a new version. Texts already folded in under the same label are skipped,
+so resubmitting a file is safe.
+
+The first feedback for a backend also stores the seed centroids as version 1. This worker scores with the new
+version at once; other workers pick it up within `CENTROID_REFRESH_SECONDS` (default 5).""",
+)
+async def centroid_feedback(
+    request: FeedbackRequest,
+    x_admin_token: str | None = Header(None),
+    backend: BackendName | None = None,
+):
+    from app.ml.centroids import add_feedback
+
+    require_admin(x_admin_token)
+    items = [(item.text, item.label) for item in request.items]
+    return await run_in_threadpool(add_feedback, items, backend)
+
+
+@app.get(
+    "/admin/centroids",
+    tags=["Admin"],
+    summary="List centroid versions",
+    description="""The stored centroid versions of `backend`, newest first, and the version this worker scores with
+(`null` while it uses the seed means).""",
+)
+async def centroid_versions(
+    x_admin_token: str | None = Header(None),
+    backend: BackendName | None = None,
+    limit: int = Query(50, ge=1, le=1000),
+):
+    from app.ml.backends import get_backend
+    from app.ml.centroids import get_store
+    from app.ml.scorer import centroid_version
+
+    require_admin(x_admin_token)
+    name = get_backend(backend).name
+
+    def listing() -> tuple[int | None, list[dict]]:
+        store = get_store(create=False)
+        return (store.current_version(name), store.versions(name, limit)) if store is not None else (None, [])
+
+    current, versions = await run_in_threadpool(listing)
+    return {"backend": name, "current": current, "in_use": centroid_version(name), "versions": versions}
+
+
+@app.post(
+    "/admin/centroids/rollback",
+    tags=["Admin"],
+    response_model=CentroidVersion,
+    summary="Roll the centroids back",
+    description="""Make an earlier stored version current (default: the one before the current version) and discard
+the versions after it, including their record of which texts were folded in. Workers pick it up like a new version.""",
+)
+async def centroid_rollback(
+    x_admin_token: str | None = Header(None),
+    backend: BackendName | None = None,
+    version: int | None = Query(None, ge=1),
+):
+    from app.ml.centroids import rollback
+
+    require_admin(x_admin_token)
+    state = await run_in_threadpool(rollback, backend, version)
+    return state.summary()
+
+
+@app.get(
+    "/admin/profiles",
+    tags=["Admin"],
+    summary="List request profiles",
+    description="""List the most recent profiles captured with `X-Profile: 1` or `PROFILE_SAMPLE_RATE`, newest first,
+as `{"id", "size", "created_at"}` objects. Profiles are stored per host under `PROFILE_DIR`.""",
+)
+async def profiles(x_admin_token: str | None = Header(None), limit: int = Query(50, ge=1, le=1000)):
+    require_admin(x_admin_token)
+    return {"items": await run_in_threadpool(list_profiles, limit)}
+
+
+@app.get(
+    "/admin/profiles/{profile_id}",
+    tags=["Admin"],
+    summary="Download a request profile",
+    description="""Download a profile as a cProfile/`pstats` file (open with `python -m pstats` or snakeviz),
+or with `format=text` as the top functions by cumulative time.""",
+)
+async def profile(
+    profile_id: str,
+    x_admin_token: str | None = Header(None),
+    format: Literal["pstats", "text"] = "pstats",
+):
+    require_admin(x_admin_token)
+    path = profile_path(profile_id)
+    if path is None:
+        return JSONResponse(status_code=404, content={"detail": "Profile not found", "field": "profile_id"})
+    if format == "text":
+        return PlainTextResponse(await run_in_threadpool(render_text, path))
+    return FileResponse(path, media_type="application/octet-stream", filename=path.name)
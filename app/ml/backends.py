@@ -0,0 +1,114 @@
+"""
+Pluggable vector backends for centroid scoring.
+
+A backend turns text into a vector; the scorer compares it against bait and
+neutral centroids built from the seed set with the same backend. The server
+default is chosen with `VECTOR_BACKEND` (`openai` or `local`, default
+`openai`) and can be overridden per request.
+"""
+import os
+from typing import Literal
+
+BackendName = Literal["openai", "local"]
+
+
+class VectorBackend:
+    name: str
+    # value reported in meta.vector_backend when this backend produced the score
+    meta_name: str
+    # True when embedding is network I/O worth overlapping with the heuristics
+    remote: bool = False
+
+    def available(self) -> bool:
+        raise NotImplementedError
+
+    def embed(self, text: str) -> list[float] | None:
+        raise NotImplementedError
+
+    def embed_many(self, texts: list[str]) -> list[list[float] | None]:
+        return [self.embed(text) for text in texts]
+
+    def lookup_quantized(self, text: str):
+        """Return (quantized values, scale) if `text` is already in a quantized store."""
+        return None
+
+    def chunking(self, text: str) -> tuple[int, bool] | None:
+        """(chunks embedded, tail dropped) for `text`, or None if the backend embeds whole texts."""
+        return None
+
+
+class OpenAIBackend(VectorBackend):
+    """OpenAI text-embedding-3-small; reported as `centroid` for compatibility."""
+
+    name = "openai"
+    meta_name = "centroid"
+    remote = True
+
+    def available(self) -> bool:
+        return bool(os.environ.get("OPENAI_API_KEY", "").strip().startswith("sk-"))
+
+    def embed(self, text: str) -> list[float] | None:
+        from app.ml.embeddings import get_embedding
+
+        return get_embedding(text)
+
+    def embed_many(self, texts: list[str]) -> list[list[float] | None]:
+        from app.ml.embeddings import get_embeddings
+
+        return get_embeddings(texts)
+
+    def lookup_quantized(self, text: str):
+        from app.ml.embeddings import lookup_quantized
+
+        return lookup_quantized(text)
+
+    def chunking(self, text: str) -> tuple[int, bool] | None:
+        from app.ml.chunking import split
+
+        chunks = split(text)
+        return len(chunks.texts), chunks.truncated
+
+
+class LocalBackend(VectorBackend):
+    """Hashed n-gram vectors computed in-process (see app.ml.local)."""
+
+    name = "local"
+    meta_name = "local"
+
+    def available(self) -> bool:
+        return True
+
+    def embed(self, text: str) -> list[float] | None:
+        from app.ml.local import get_vectorizer
+
+        return get_vectorizer().transform(text)
+
+
+_BACKENDS: dict[str, VectorBackend] = {
+    "openai": OpenAIBackend(),
+    "local": LocalBackend(),
+}
+
+
+def register_backend(backend: VectorBackend) -> None:
+    """Add or replace a backend under `backend.name`, e.g. a recorded one for benchmarks."""
+    from app.ml.scorer import forget_centroids
+
+    _BACKENDS[backend.name] = backend
+    forget_centroids(backend.name)
+
+
+def check_default_backend() -> None:
+    """Fail at startup, not on every request, when `VECTOR_BACKEND` names no backend."""
+    key = os.environ.get("VECTOR_BACKEND", "openai").strip().lower()
+    if key not in _BACKENDS:
+        raise ValueError(f"VECTOR_BACKEND must be one of {', '.join(sorted(_BACKENDS))}, not {key!r}")
+
+
+def get_backend(name: str | None = None) -> VectorBackend:
+    """Return the named backend, or the server default from `VECTOR_BACKEND`."""
+    key = (name or os.environ.get("VECTOR_BACKEND", "openai")).strip().lower()
+    try:
+        return _BACKENDS[key]
+    except KeyError:
+        raise ValueError(f"Unknown vector backend: {key}") from None
@@ -0,0 +1,426 @@
+"""
+Versioned bait/neutral centroids, updated incrementally from labeled feedback.
+
+The centroids start as the means of the seed examples
+(`data/seed_examples.json`). `add_feedback()` embeds only texts it has not
+folded in before and updates the running means and counts,
+
+    mean' = (mean * n + sum(new vectors)) / (n + k)
+
+then commits the result as a new version in one SQLite transaction
+(`CENTROID_DB`, default `var/centroids.sqlite3`): the centroids, the pointer to
+the current version and which texts it folded in under which label. A text
+resubmitted with the same label is skipped; with the other label it moves from
+one mean to the other. The first feedback for a backend stores the seed
+centroids as version 1, so cold starts load the stored state instead of
+re-embedding the seeds.
+
+`rollback()` makes an earlier version current and discards the versions after
+it, including their record of folded-in texts. Version numbers are never
+reused, so a number always names the same centroids: after rolling back from 5
+to 3 the next commit is 6. The last `CENTROID_KEEP_VERSIONS` (default 100)
+versions are kept.
+
+Scoring processes check the current version at most every
+`CENTROID_REFRESH_SECONDS` (default 5) and swap in a new one without
+restarting (see `app.ml.scorer`).
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Any
+
+from app.ml.backends import VectorBackend, get_backend
+
+_DEFAULT_DB = Path(__file__).resolve().parent.parent.parent / "var" / "centroids.sqlite3"
+_MAX_PARAMS = 500
+# commits lost to a concurrent writer are retried on the new current version
+_COMMIT_ATTEMPTS = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS versions (
+    backend TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    source TEXT NOT NULL,
+    bait_count INTEGER NOT NULL,
+    neutral_count INTEGER NOT NULL,
+    bait BLOB NOT NULL,
+    neutral BLOB NOT NULL,
+    PRIMARY KEY (backend, version)
+);
+CREATE TABLE IF NOT EXISTS current (backend TEXT PRIMARY KEY, version INTEGER NOT NULL);
+-- the highest version number ever committed, which rollbacks don't lower
+CREATE TABLE IF NOT EXISTS counters (backend TEXT PRIMARY KEY, last INTEGER NOT NULL);
+-- one row per text per version that changed its label; a text's label is the latest row
+CREATE TABLE IF NOT EXISTS labels (
+    backend TEXT NOT NULL,
+    key BLOB NOT NULL,
+    version INTEGER NOT NULL,
+    label TEXT NOT NULL,
+    PRIMARY KEY (backend, key, version)
+) WITHOUT ROWID;
+"""
+
+LABELS = ("bait", "neutral")
+
+
+class CentroidError(ValueError):
+    def __init__(self, detail: str, field: str | None = None, status_code: int = 400):
+        super().__init__(detail)
+        self.field = field
+        self.status_code = status_code
+
+
+class _Conflict(Exception):
+    """Another writer committed a version since this one was read."""
+
+
+def centroid_db() -> Path:
+    value = os.environ.get("CENTROID_DB", "").strip()
+    return Path(value) if value else _DEFAULT_DB
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def _pack(vector: list[float]) -> bytes:
+    return array("d", vector).tobytes()
+
+
+def _unpack(data: bytes) -> list[float]:
+    values = array("d")
+    values.frombytes(data)
+    return values.tolist()
+
+
+class CentroidState:
+    """One committed version of a backend's centroids."""
+
+    __slots__ = ("backend", "version", "bait", "neutral", "bait_count", "neutral_count", "created_at", "source")
+
+    def __init__(
+        self,
+        backend: str,
+        version: int,
+        bait: list[float],
+        neutral: list[float],
+        bait_count: int,
+        neutral_count: int,
+        created_at: float,
+        source: str,
+    ):
+        self.backend = backend
+        self.version = version
+        self.bait = bait
+        self.neutral = neutral
+        self.bait_count = bait_count
+        self.neutral_count = neutral_count
+        self.created_at = created_at
+        self.source = source
+
+    @property
+    def centroids(self) -> tuple[list[float], list[float]]:
+        return self.bait, self.neutral
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "version": self.version,
+            "bait_count": self.bait_count,
+            "neutral_count": self.neutral_count,
+            "created_at": self.created_at,
+            "source": self.source,
+        }
+
+
+def _fold(
+    mean: list[float], count: int, add: list[list[float]], remove: list[list[float]], label: str
+) -> tuple[list[float], int]:
+    """Running mean after adding and removing vectors, in O(changed vectors)."""
+    if not add and not remove:
+        return mean, count
+    total = [m * count for m in mean]
+    for sign, vectors in ((1.0, add), (-1.0, remove)):
+        for vector in vectors:
+            if len(vector) != len(total):
+                raise CentroidError(
+                    f"Embeddings have {len(vector)} dimensions but the stored centroids have {len(total)}; "
+                    "use a new CENTROID_DB after changing the embedding model"
+                )
+            for i, v in enumerate(vector):
+                total[i] += sign * v
+    count += len(add) - len(remove)
+    if count <= 0:
+        raise CentroidError(f"Feedback would leave no {label} examples", "items")
+    return [t / count for t in total], count
+
+
+class CentroidStore:
+    def __init__(self, path: Path, keep_versions: int = 100):
+        self.path = Path(path)
+        self.keep_versions = keep_versions
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def current_version(self, backend: str) -> int | None:
+        with self._lock:
+            row = self._db.execute("SELECT version FROM current WHERE backend = ?", (backend,)).fetchone()
+        return row[0] if row else None
+
+    def load(self, backend: str, version: int | None = None) -> CentroidState | None:
+        """The given version (default: the current one), or None if there is none."""
+        with self._lock:
+            if version is None:
+                row = self._db.execute("SELECT version FROM current WHERE backend = ?", (backend,)).fetchone()
+                if row is None:
+                    return None
+                version = row[0]
+            row = self._db.execute(
+                "SELECT version, bait, neutral, bait_count, neutral_count, created_at, source"
+                " FROM versions WHERE backend = ? AND version = ?",
+                (backend, version),
+            ).fetchone()
+        if row is None:
+            return None
+        version, bait, neutral, bait_count, neutral_count, created_at, source = row
+        return CentroidState(
+            backend, version, _unpack(bait), _unpack(neutral), bait_count, neutral_count, created_at, source
+        )
+
+    def versions(self, backend: str, limit: int = 50) -> list[dict[str, Any]]:
+        """Summaries of the stored versions, newest first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT version, bait_count, neutral_count, created_at, source FROM versions"
+                " WHERE backend = ? ORDER BY version DESC LIMIT ?",
+                (backend, limit),
+            ).fetchall()
+        return [
+            {"version": v, "bait_count": b, "neutral_count": n, "created_at": c, "source": s}
+            for v, b, n, c, s in rows
+        ]
+
+    def labels(self, backend: str, keys: list[bytes]) -> dict[bytes, str]:
+        """The label each of `keys` is currently folded in under, for those that are."""
+        out: dict[bytes, str] = {}
+        with self._lock:
+            for start in range(0, len(keys), _MAX_PARAMS):
+                chunk = keys[start : start + _MAX_PARAMS]
+                # SQLite takes the bare `label` from the row holding MAX(version)
+                out.update(
+                    (key, label)
+                    for key, label, _version in self._db.execute(
+                        f"SELECT key, label, MAX(version) FROM labels WHERE backend = ? AND key IN ({','.join('?' * len(chunk))})"
+                        " GROUP BY key",
+                        (backend, *chunk),
+                    )
+                )
+        return out
+
+    def commit(
+        self,
+        backend: str,
+        base_version: int | None,
+        state: dict[str, tuple[list[float], int]],
+        labels: list[tuple[bytes, str]],
+        source: str,
+    ) -> CentroidState:
+        """
+        Store `state` ({label: (mean, count)}) as the next version, folded from
+        `base_version`. Raises `_Conflict` if that is no longer current.
+        """
+        now = time.time()
+        (bait, bait_count), (neutral, neutral_count) = state["bait"], state["neutral"]
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT version FROM current WHERE backend = ?", (backend,)).fetchone()
+                if (row[0] if row else None) != base_version:
+                    raise _Conflict()
+                last = self._db.execute(
+                    "SELECT MAX(n) FROM (SELECT last AS n FROM counters WHERE backend = ?"
+                    " UNION ALL SELECT MAX(version) FROM versions WHERE backend = ?)",
+                    (backend, backend),
+                ).fetchone()[0]
+                version = (last or 0) + 1
+                self._db.execute("INSERT OR REPLACE INTO counters VALUES (?, ?)", (backend, version))
+                self._db.execute(
+                    "INSERT INTO versions VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (backend, version, now, source, bait_count, neutral_count, _pack(bait), _pack(neutral)),
+                )
+                self._db.executemany(
+                    "INSERT INTO labels VALUES (?, ?, ?, ?)", [(backend, key, version, label) for key, label in labels]
+                )
+                self._db.execute("INSERT OR REPLACE INTO current VALUES (?, ?)", (backend, version))
+                self._db.execute(
+                    "DELETE FROM versions WHERE backend = ? AND version NOT IN"
+                    " (SELECT version FROM versions WHERE backend = ? ORDER BY version DESC LIMIT ?)",
+                    (backend, backend, self.keep_versions),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return CentroidState(backend, version, bait, neutral, bait_count, neutral_count, now, source)
+
+    def rollback(self, backend: str, version: int | None = None) -> CentroidState:
+        """Make `version` (default: the one before the current) current and discard the later ones."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT version FROM current WHERE backend = ?", (backend,)).fetchone()
+                if row is None:
+                    raise CentroidError(f"No stored centroids for backend {backend!r}", "backend", 404)
+                if version is None:
+                    # numbers are never reused, so the previous version need not be current - 1
+                    version = self._db.execute(
+                        "SELECT MAX(version) FROM versions WHERE backend = ? AND version < ?", (backend, row[0])
+                    ).fetchone()[0]
+                target = row[0] - 1 if version is None else version
+                exists = self._db.execute(
+                    "SELECT 1 FROM versions WHERE backend = ? AND version = ?", (backend, target)
+                ).fetchone()
+                if target >= row[0] or not exists:
+                    raise CentroidError(
+                        f"Version {target} is not an earlier stored version of {backend!r}", "version", 404
+                    )
+                self._db.execute("DELETE FROM versions WHERE backend = ? AND version > ?", (backend, target))
+                self._db.execute("DELETE FROM labels WHERE backend = ? AND version > ?", (backend, target))
+                self._db.execute("UPDATE current SET version = ? WHERE backend = ?", (target, backend))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return self.load(backend, target)
+
+
+_store: CentroidStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_store(create: bool = True) -> CentroidStore | None:
+    """This process's handle on `CENTROID_DB`; with `create=False`, None until the file exists."""
+    global _store
+    path = centroid_db()
+    # SQLite connections must not cross a fork: reopen in each worker process
+    if _store is None or _store._pid != os.getpid() or _store.path != path:
+        if not create and not path.exists():
+            return None
+        with _store_lock:
+            if _store is None or _store._pid != os.getpid() or _store.path != path:
+                _store = CentroidStore(path, int(os.environ.get("CENTROID_KEEP_VERSIONS", 100)))
+    return _store
+
+
+def stored_version(backend: str) -> int | None:
+    """The current stored version for `backend`, None if nothing is stored. Never creates the database."""
+    store = get_store(create=False)
+    return store.current_version(backend) if store is not None else None
+
+
+def load_current(backend: str) -> CentroidState | None:
+    store = get_store(create=False)
+    return store.load(backend) if store is not None else None
+
+
+def _seed_state(backend: VectorBackend) -> tuple[dict[str, tuple[list[float], int]], list[tuple[bytes, str]]]:
+    """Means and counts over the seed examples, embedding them once."""
+    from app.ml.scorer import _mean_embedding, seed_examples
+
+    examples = [(text, label) for text, label in seed_examples() if label in LABELS]
+    embeddings = backend.embed_many([text for text, _ in examples])
+    if not examples or any(emb is None for emb in embeddings):
+        raise CentroidError(f"Could not embed the seed examples with backend {backend.name!r}", "backend", 503)
+    state = {}
+    for label in LABELS:
+        vectors = [emb for (_, l), emb in zip(examples, embeddings) if l == label]
+        if not vectors:
+            raise CentroidError(f"The seed examples have no {label} texts", "backend", 503)
+        state[label] = (_mean_embedding(vectors), len(vectors))
+    return state, [(text_key(text), label) for text, label in examples]
+
+
+def add_feedback(items: list[tuple[str, str]], backend: str | None = None) -> dict[str, Any]:
+    """
+    Fold labeled `(text, "bait" | "neutral")` pairs into the centroids of
+    `backend` and commit a new version if anything changed. Only texts that
+    are new, or whose label changed, are embedded. Returns the new state's
+    summary with `added`, `moved`, `skipped` and `failed` counts.
+    """
+    from app.ml.scorer import use_centroids
+
+    vb = get_backend(backend)
+    if not vb.available():
+        raise CentroidError(f"Vector backend {vb.name!r} is not available", "backend", 503)
+    store = get_store()
+    wanted: dict[bytes, tuple[str, str]] = {}
+    for text, label in items:
+        if label not in LABELS:
+            raise CentroidError(f"Label must be one of {', '.join(LABELS)} (got {label!r})", "label")
+        wanted[text_key(text)] = (text, label)  # the last label given for a text wins
+    embedded: dict[bytes, list[float] | None] = {}
+
+    for _attempt in range(_COMMIT_ATTEMPTS):
+        current = store.load(vb.name)
+        if current is None:
+            state, seed_labels = _seed_state(vb)
+            try:
+                current = store.commit(vb.name, None, state, seed_labels, "seeds")
+            except _Conflict:
+                continue
+
+        known = store.labels(vb.name, list(wanted))
+        changed = [key for key, (_text, label) in wanted.items() if known.get(key) != label]
+        missing = [key for key in changed if key not in embedded]
+        if missing:
+            vectors = vb.embed_many([wanted[key][0] for key in missing])
+            embedded.update(zip(missing, vectors))
+        ready = [key for key in changed if embedded[key] is not None]
+
+        add = {label: [embedded[k] for k in ready if wanted[k][1] == label] for label in LABELS}
+        remove = {label: [embedded[k] for k in ready if known.get(k) == label] for label in LABELS}
+        counts = {
+            "added": sum(1 for k in ready if k not in known),
+            "moved": sum(1 for k in ready if k in known),
+            "skipped": len(wanted) - len(changed),
+            "failed": len(changed) - len(ready),
+        }
+        if not ready:
+            use_centroids(vb.name, current.centroids, current.version)
+            return {**current.summary(), **counts}
+        state = {
+            "bait": _fold(current.bait, current.bait_count, add["bait"], remove["bait"], "bait"),
+            "neutral": _fold(current.neutral, current.neutral_count, add["neutral"], remove["neutral"], "neutral"),
+        }
+        try:
+            committed = store.commit(
+                vb.name, current.version, state, [(k, wanted[k][1]) for k in ready], "feedback"
+            )
+        except _Conflict:
+            continue
+        use_centroids(vb.name, committed.centroids, committed.version)
+        return {**committed.summary(), **counts}
+    raise CentroidError("Centroids are being updated concurrently; retry", None, 409)
+
+
+def rollback(backend: str | None = None, version: int | None = None) -> CentroidState:
+    """Make an earlier stored version current (default: the previous one) in this and, on refresh, every process."""
+    from app.ml.scorer import use_centroids
+
+    name = get_backend(backend).name
+    store = get_store(create=False)
+    if store is None:
+        raise CentroidError(f"No stored centroids for backend {name!r}", "backend", 404)
+    state = store.rollback(name, version)
+    use_centroids(name, state.centroids, state.version)
+    return state
@@ -0,0 +1,137 @@
+"""
+Token-aware chunking of long texts for the OpenAI embeddings model.
+
+The model reads at most 8,191 tokens per input. Longer texts are split into
+pieces of `EMBEDDING_CHUNK_TOKENS` tokens (default 8000), embedded together in
+one multi-input request, and pooled back into one vector: the mean of the chunk
+vectors weighted by chunk length, renormalized. Past `EMBEDDING_MAX_CHUNKS`
+chunks (default 8, about 250,000 characters of English) the tail is dropped and
+the result is reported as truncated.
+
+Token counts come from `tiktoken` (`cl100k_base`) when it is installed and its
+encoding can be loaded. Otherwise a token is counted as one byte of UTF-8, which
+is an upper bound (every token covers at least one byte): texts are split into
+pieces of at most `EMBEDDING_CHUNK_TOKENS` bytes, preferring whitespace and
+never inside a character. For English that gives about four times as many
+chunks as tiktoken would, but no piece can exceed the model limit, whatever the
+script or punctuation.
+"""
+import os
+import threading
+from functools import lru_cache
+
+MODEL_MAX_TOKENS = 8191
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    """The tiktoken encoding, or None if tiktoken or its data is unavailable (checked once)."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _encoding_lock:
+            if not _encoding_loaded:
+                try:
+                    import tiktoken
+
+                    _encoding = tiktoken.get_encoding("cl100k_base")
+                except Exception:  # not installed, or the encoding file can't be fetched
+                    _encoding = None
+                _encoding_loaded = True
+    return _encoding
+
+
+def chunk_tokens() -> int:
+    return max(1, min(int(os.environ.get("EMBEDDING_CHUNK_TOKENS", 8000)), MODEL_MAX_TOKENS))
+
+
+def max_chunks() -> int:
+    return max(1, int(os.environ.get("EMBEDDING_MAX_CHUNKS", 8)))
+
+
+def estimate_tokens(text: str) -> int:
+    """Upper-bound token count without tokenizing: the UTF-8 length."""
+    return len(text.encode("utf-8"))
+
+
+def count_tokens(text: str) -> int | None:
+    """The exact token count from tiktoken, or None when it isn't available."""
+    encoding = _get_encoding()
+    return len(encoding.encode(text, disallowed_special=())) if encoding is not None else None
+
+
+def may_need_chunks(text: str) -> bool:
+    """False when `text` certainly fits in one chunk, without tokenizing it."""
+    size = chunk_tokens()
+    # the UTF-8 length is never below the character count, so skip encoding long texts
+    return len(text) > size or estimate_tokens(text) > size
+
+
+class Chunks:
+    """The pieces of one text, their token weights, and whether the tail was dropped."""
+
+    __slots__ = ("texts", "weights", "truncated")
+
+    def __init__(self, texts: tuple[str, ...], weights: tuple[int, ...], truncated: bool):
+        self.texts = texts
+        self.weights = weights
+        self.truncated = truncated
+
+
+def split(text: str) -> Chunks:
+    """Split `text` per the current `EMBEDDING_CHUNK_TOKENS` / `EMBEDDING_MAX_CHUNKS`."""
+    if not may_need_chunks(text):
+        return Chunks((text,), (max(1, estimate_tokens(text)),), False)
+    return _split(text, chunk_tokens(), max_chunks())
+
+
+@lru_cache(maxsize=256)
+def _split(text: str, size: int, limit: int) -> Chunks:
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        pieces = [tokens[start : start + size] for start in range(0, len(tokens), size)] or [tokens]
+        kept = pieces[:limit]
+        return Chunks(
+            tuple(encoding.decode(piece) for piece in kept),
+            tuple(len(piece) for piece in kept),
+            len(pieces) > limit,
+        )
+
+    data = text.encode("utf-8")
+    pieces: list[bytes] = []
+    start = 0
+    while start < len(data) and len(pieces) <= limit:
+        end = min(len(data), start + size)
+        if end < len(data):
+            # break at whitespace in the last tenth of the window when there is one
+            cut = data.rfind(b" ", end - size // 10, end)
+            if cut > start:
+                end = cut + 1
+            else:
+                while end > start + 1 and data[end] & 0xC0 == 0x80:
+                    end -= 1  # don't cut a multi-byte character
+        pieces.append(data[start:end])
+        start = end
+    kept = pieces[:limit]
+    return Chunks(
+        tuple(piece.decode("utf-8") for piece in kept),
+        tuple(len(piece) for piece in kept),
+        len(pieces) > limit,
+    )
+
+
+def pool(vectors: list[list[float]], weights: tuple[int, ...]) -> list[float]:
+    """Length-weighted mean of the chunk vectors, scaled back to unit length."""
+    if len(vectors) == 1:
+        return vectors[0]
+    total = float(sum(weights))
+    out = [0.0] * len(vectors[0])
+    for vector, weight in zip(vectors, weights):
+        w = weight / total
+        for i, v in enumerate(vector):
+            out[i] += w * v
+    norm = sum(x * x for x in out) ** 0.5
+    return [x / norm for x in out] if norm else out
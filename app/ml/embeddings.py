@@ -1,13 +1,24 @@
 """OpenAI embeddings using text-embedding-3-small."""
 
+import logging
+import math
 import os
-from typing import TYPE_CHECKING
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable
 
-from tenacity import retry, stop_after_attempt, wait_exponential
+from app import tracing
+from app.ml.chunking import chunk_tokens, count_tokens, estimate_tokens, max_chunks, may_need_chunks, pool, split
 
 if TYPE_CHECKING:
     from openai import OpenAI
 
+logger = logging.getLogger(__name__)
+
 
 def _get_client() -> "OpenAI | None":
     """Return OpenAI client if API key is set, else None."""
@@ -18,27 +29,466 @@ def _get_client() -> "OpenAI | None":
     return OpenAI(api_key=key)
 
 
-def _call_api(client: "OpenAI", text: str) -> list[float]:
-    r = client.embeddings.create(
-        model="text-embedding-3-small",
-        input=text[:8191],  # model limit
-    )
-    return r.data[0].embedding
+EMBEDDING_MODEL = "text-embedding-3-small"
+_NATIVE_DIMENSIONS = 1536
+
+
+def requested_dimensions() -> int | None:
+    """`EMBEDDING_DIMENSIONS` if set: text-embedding-3 models can return shortened vectors."""
+    value = os.environ.get("EMBEDDING_DIMENSIONS", "").strip()
+    return int(value) if value else None
+
+
+def embedding_dimensions() -> int:
+    return requested_dimensions() or _NATIVE_DIMENSIONS
+
+
+# inputs per embeddings request (API limit)
+_MAX_INPUTS = 2048
+# the API caps the tokens summed over one request's inputs at 300,000
+_MAX_REQUEST_TOKENS = 250_000
+_MAX_ATTEMPTS = 3
+# longest a caller waits on the micro-batcher for one vector, covering every
+# attempt and rate-limit wait; past it the text is scored without embeddings
+_RESULT_TIMEOUT = 300.0
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def _parse_duration(value: str | None) -> float | None:
+    """Seconds from a rate-limit header value such as `20ms`, `1s`, `6m0s` or `2`."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    return sum(float(n) * _DURATION_UNITS[unit] for n, unit in parts) if parts else None
+
+
+class TokenBucket:
+    """
+    Client-side view of the account's per-minute request and token limits.
+    Starts unlimited, then follows the `x-ratelimit-*` headers of each response:
+    remaining capacity refills at limit/60 per second, and a 429 holds every
+    caller until its retry-after has passed.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._limits: dict[str, float] = {}
+        self._available: dict[str, float] = {}
+        self._updated = clock()
+        self._blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        for kind, limit in self._limits.items():
+            self._available[kind] = min(limit, self._available[kind] + elapsed * limit / 60)
+
+    def delay(self, requests: int = 1, tokens: int = 0) -> float:
+        """Seconds to wait before sending; when 0 the capacity has been reserved."""
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            wait = max(0.0, self._blocked_until - now)
+            need = {"requests": requests, "tokens": tokens}
+            for kind, limit in self._limits.items():
+                short = min(need[kind], limit) - self._available[kind]
+                if short > 0:
+                    wait = max(wait, short * 60 / limit)
+            if wait == 0:
+                for kind in self._limits:
+                    self._available[kind] -= need[kind]
+            return wait
+
+    def acquire(self, requests: int = 1, tokens: int = 0) -> None:
+        while (wait := self.delay(requests, tokens)) > 0:
+            time.sleep(min(wait, 1.0))
+
+    def update(self, headers) -> None:
+        """Sync to the limits and remaining capacity the API reported."""
+        with self._lock:
+            self._refill(self._clock())
+            for kind in ("requests", "tokens"):
+                limit = headers.get(f"x-ratelimit-limit-{kind}")
+                remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+                if limit and remaining:
+                    self._limits[kind] = float(limit)
+                    self._available[kind] = float(remaining)
+
+    def back_off(self, seconds: float) -> None:
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, self._clock() + seconds)
+
+
+_rate_limits = TokenBucket()
+
+# Tokens per UTF-8 byte for pacing without tiktoken, about 1/4 for English to
+# start with, then learned from the `usage.prompt_tokens` the API reports. The
+# byte count itself (`estimate_tokens`) is an upper bound for sizing chunks and
+# requests, but charging it to the bucket would hold the client to about a
+# quarter of the account's token limit.
+_tokens_per_byte = 0.25
+_CALIBRATION_SMOOTHING = 0.2
+
+
+def _pacing_tokens(texts: list[str]) -> int:
+    """Tokens to charge the rate limiter for `texts`: exact with tiktoken, else calibrated."""
+    counts = [count_tokens(text) for text in texts]
+    if all(count is not None for count in counts):
+        return sum(counts) + 1
+    return math.ceil(sum(estimate_tokens(text) for text in texts) * _tokens_per_byte) + 1
+
+
+def _calibrate(texts: list[str], usage) -> None:
+    global _tokens_per_byte
+    used = getattr(usage, "prompt_tokens", None)
+    size = sum(estimate_tokens(text) for text in texts)
+    if isinstance(used, int) and used > 0 and size > 0:
+        _tokens_per_byte += _CALIBRATION_SMOOTHING * (used / size - _tokens_per_byte)
+
+
+def _retry_after(headers, attempt: int) -> float:
+    ms = headers.get("retry-after-ms")
+    if ms:
+        return float(ms) / 1000
+    for name in ("retry-after", "x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+        seconds = _parse_duration(headers.get(name))
+        if seconds:
+            return seconds
+    return float(2**attempt)
+
+
+def _is_input_error(exc: Exception) -> bool:
+    """True for a 4xx that blames the request's inputs (retrying the same inputs won't help)."""
+    try:
+        import openai
+    except ImportError:
+        return False
+    return isinstance(exc, (openai.BadRequestError, openai.UnprocessableEntityError))
+
+
+def _call_api(client: "OpenAI", texts: list[str]) -> list[list[float]]:
+    """
+    One multi-input embeddings request, paced by the shared token bucket. A 429
+    waits for the server's retry-after; connection and 5xx errors back off
+    exponentially. Raises after `_MAX_ATTEMPTS`.
+    """
+    import openai
+
+    kwargs = {}
+    dimensions = requested_dimensions()
+    if dimensions:
+        kwargs["dimensions"] = dimensions
+    inputs = texts  # already split to the model limit (see app.ml.chunking)
+    tokens = _pacing_tokens(inputs)
+    for attempt in range(_MAX_ATTEMPTS):
+        # one span per attempt, including the wait for the rate limiter
+        with tracing.span(
+            "embeddings.create",
+            **{"embeddings.inputs": len(inputs), "embeddings.tokens": tokens, "embeddings.attempt": attempt + 1},
+        ):
+            _rate_limits.acquire(tokens=tokens)
+            try:
+                raw = client.embeddings.with_raw_response.create(model=EMBEDDING_MODEL, input=inputs, **kwargs)
+            except openai.RateLimitError as exc:
+                tracing.set_attributes(**{"error.type": type(exc).__name__})
+                _rate_limits.update(exc.response.headers)
+                error: Exception = exc
+            except (openai.APIConnectionError, openai.InternalServerError) as exc:
+                tracing.set_attributes(**{"error.type": type(exc).__name__})
+                error = exc
+            else:
+                _rate_limits.update(raw.headers)
+                r = raw.parse()
+                _calibrate(inputs, getattr(r, "usage", None))
+                return [item.embedding for item in sorted(r.data, key=lambda item: item.index)]
+        if isinstance(error, openai.RateLimitError):
+            _rate_limits.back_off(_retry_after(error.response.headers, attempt))
+        elif attempt + 1 < _MAX_ATTEMPTS:
+            time.sleep(min(2**attempt, 10))
+    raise error
+
+
+class MicroBatcher:
+    """
+    Coalesces embedding requests from concurrent callers. The first queued text
+    opens a window; everything that arrives before it closes (up to `max_batch`
+    distinct texts and the per-request token budget) goes out as one API call, and each caller's future resolves
+    with its own vector. Batches are sent on a small pool so several can be in
+    flight while the next window fills.
+    """
+
+    def __init__(self, window: float, max_batch: int, concurrency: int = 4):
+        self.window = window
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[tuple[bytes, str, Future, object]]" = queue.Queue()
+        self._senders = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="embedding-batch")
+        threading.Thread(target=self._run, name="embedding-batcher", daemon=True).start()
+
+    def submit(self, key: bytes, text: str) -> Future:
+        future: Future = Future()
+        # the caller's span, so the shared API call can be traced back to each request
+        self._queue.put((key, text, future, tracing.current_link()))
+        return future
+
+    def _run(self) -> None:
+        carry = None
+        while True:
+            # futures taken off the queue and not yet handed to a sender
+            taken: list[Future] = []
+            try:
+                carry = self._collect(carry, taken)
+            except Exception as exc:
+                # keep serving: fail this batch's callers instead of leaving them waiting forever
+                logger.exception("Embedding micro-batcher failed; failing %d queued texts", len(taken))
+                for future in taken:
+                    if not future.done():
+                        future.set_exception(exc)
+                carry = None
+
+    def _collect(self, carry: tuple | None, taken: list[Future]) -> tuple | None:
+        """Fill one batch and hand it to a sender; returns the item that opens the next one."""
+        key, text, future, link = carry or self._queue.get()
+        taken.append(future)
+        carry = None
+        batch: dict[bytes, tuple[str, list[Future]]] = {key: (text, [future])}
+        links = [link]
+        tokens = estimate_tokens(text)
+        closes = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = closes - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                key, text, future, link = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            taken.append(future)
+            if key not in batch and tokens + estimate_tokens(text) > _MAX_REQUEST_TOKENS:
+                carry = (key, text, future, link)  # opens the next batch
+                break
+            if key not in batch:
+                tokens += estimate_tokens(text)
+            batch.setdefault(key, (text, []))[1].append(future)
+            links.append(link)
+        self._senders.submit(self._send, batch, links)
+        return carry
+
+    def _send(self, batch: dict[bytes, tuple[str, list[Future]]], links: list | None = None) -> None:
+        try:
+            client = _get_client()
+            if client is None:
+                raise RuntimeError("OpenAI is not configured")
+            with tracing.linked_span("embeddings.batch", links or [], **{"batch.items": len(batch)}):
+                embs = _call_api(client, [text for text, _futures in batch.values()])
+        except Exception as exc:
+            if len(batch) > 1 and _is_input_error(exc):
+                # one caller's bad input must not fail the others' texts: bisect down to it
+                items = list(batch.items())
+                half = len(items) // 2
+                self._send(dict(items[:half]), links)
+                self._send(dict(items[half:]), links)
+                return
+            for _text, futures in batch.values():
+                for future in futures:
+                    future.set_exception(exc)
+            return
+        for (_text, futures), emb in zip(batch.values(), embs):
+            for future in futures:
+                future.set_result(emb)
+
+
+_batcher: MicroBatcher | None = None
+_batcher_lock = threading.Lock()
+
+
+def _get_batcher() -> MicroBatcher | None:
+    """The shared micro-batcher, or None when `EMBEDDING_BATCH_WINDOW_MS` is 0."""
+    global _batcher
+    window_ms = float(os.environ.get("EMBEDDING_BATCH_WINDOW_MS", 10))
+    if window_ms <= 0:
+        return None
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = MicroBatcher(
+                    window_ms / 1000,
+                    min(int(os.environ.get("EMBEDDING_BATCH_MAX", 64)), _MAX_INPUTS),
+                )
+    return _batcher
+
+
+def embedding_key(text: str) -> bytes:
+    from app.ml.store import store_key
+
+    model = EMBEDDING_MODEL
+    if may_need_chunks(text):
+        # pooled vectors depend on the chunking settings; older truncated ones must not match
+        model = f"{model}/chunks{chunk_tokens()}x{max_chunks()}"
+    return store_key(text, model, requested_dimensions())
+
+
+def _chunk_key(chunk: str) -> bytes:
+    from app.ml.store import store_key
+
+    return store_key(chunk, f"{EMBEDDING_MODEL}/chunk", requested_dimensions())
+
+
+def _request_groups(items: list[tuple[bytes, str]]) -> list[list[tuple[bytes, str]]]:
+    """Split inputs into API requests under `_MAX_INPUTS` and `_MAX_REQUEST_TOKENS`."""
+    groups: list[list[tuple[bytes, str]]] = []
+    tokens = 0
+    for item in items:
+        cost = estimate_tokens(item[1])
+        if not groups or len(groups[-1]) >= _MAX_INPUTS or tokens + cost > _MAX_REQUEST_TOKENS:
+            groups.append([])
+            tokens = 0
+        groups[-1].append(item)
+        tokens += cost
+    return groups
+
+
+def _store_and_key(text: str):
+    from app.ml.store import get_store
+
+    store = get_store(embedding_dimensions())
+    if store is None:
+        return None, None
+    return store, embedding_key(text)
+
+
+# In-process LRU in front of the shared store; sized by EMBEDDING_CACHE_SIZE.
+_cache: "OrderedDict[bytes, list[float]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cache_size() -> int:
+    return int(os.environ.get("EMBEDDING_CACHE_SIZE", 4096))
+
+
+def cached_embedding(text: str) -> list[float] | None:
+    """Return the embedding for `text` from the in-process cache, if present."""
+    return _cache_get(embedding_key(text))
+
+
+def _cache_get(key: bytes) -> list[float] | None:
+    with _cache_lock:
+        emb = _cache.get(key)
+        if emb is not None:
+            _cache.move_to_end(key)
+        return emb
+
+
+def _remember(key: bytes, emb: list[float]) -> None:
+    with _cache_lock:
+        _cache[key] = emb
+        _cache.move_to_end(key)
+        while len(_cache) > _cache_size():
+            _cache.popitem(last=False)
+
+
+def lookup_quantized(text: str):
+    """
+    Return the (quantized values, scale) stored for `text`, or None. None too
+    while the in-process cache still holds its full-precision vector, so a
+    text is scored from that rather than from whichever copy answers first.
+    """
+    store, key = _store_and_key(text)
+    if store is None or _cache_get(key) is not None:
+        return None
+    return store.find(key)
 
 
 def get_embedding(text: str, client: "OpenAI | None" = None) -> list[float] | None:
     """
     Embed text using OpenAI text-embedding-3-small.
     Returns None if OpenAI is unavailable or on error. Retries on rate limit.
+    Results are cached in-process, and in the shared vector store when
+    `EMBEDDING_STORE_PATH` is set.
+    """
+    return get_embeddings([text], client)[0]
+
+
+def get_embeddings(texts: list[str], client: "OpenAI | None" = None) -> list[list[float] | None]:
+    """
+    Embed many texts, in input order. Cache and store hits are served locally.
+    Texts over the model's token limit are split into chunks that go out
+    alongside the rest and are pooled into one vector (see `app.ml.chunking`).
+    The misses go through the shared micro-batcher, which merges them with
+    concurrent callers' texts; with an explicit `client`, or the batcher
+    disabled, they go out directly (per `_MAX_INPUTS` and `_MAX_REQUEST_TOKENS`).
+    A failed request yields None for the texts it covered.
     """
     c = client if client is not None else _get_client()
     if c is None:
-        return None
-    decorated = retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=1, max=10),
-    )(_call_api)
-    try:
-        return decorated(c, text)
-    except Exception:
-        return None
+        return [None] * len(texts)
+    from app.ml.store import get_store
+
+    store = get_store(embedding_dimensions())
+    out: list[list[float] | None] = [None] * len(texts)
+    missing: dict[bytes, list[int]] = {}
+    with tracing.span("cache.lookup", **{"cache.tier": "embeddings", "batch.items": len(texts)}):
+        for i, text in enumerate(texts):
+            key = embedding_key(text)
+            cached = _cache_get(key)
+            if cached is None and store is not None:
+                cached = store.get(key)
+                if cached is not None:
+                    _remember(key, cached)
+            if cached is not None:
+                out[i] = cached
+            else:
+                missing.setdefault(key, []).append(i)
+        tracing.set_attributes(**{"cache.hits": len(texts) - sum(map(len, missing.values()))})
+    if not missing:
+        return out
+
+    # long texts go out as several chunk inputs and are pooled back below
+    plans = {key: split(texts[indexes[0]]) for key, indexes in missing.items()}
+    inputs: dict[bytes, str] = {}
+    for key, plan in plans.items():
+        if len(plan.texts) == 1:
+            inputs[key] = plan.texts[0]
+        else:
+            inputs.update((_chunk_key(chunk), chunk) for chunk in plan.texts)
+
+    vectors: dict[bytes, list[float]] = {}
+    batcher = _get_batcher() if client is None else None
+    if batcher is not None:
+        futures = {key: batcher.submit(key, text) for key, text in inputs.items()}
+        for key, future in futures.items():
+            try:
+                vectors[key] = future.result(timeout=_RESULT_TIMEOUT)
+            except Exception:
+                continue
+    else:
+        for group in _request_groups(list(inputs.items())):
+            try:
+                vectors.update(zip([key for key, _text in group], _call_api(c, [text for _key, text in group])))
+            except Exception:
+                continue
+
+    fetched: dict[bytes, list[float]] = {}
+    for key, plan in plans.items():
+        if len(plan.texts) == 1:
+            if key in vectors:
+                fetched[key] = vectors[key]
+            continue
+        parts = [vectors.get(_chunk_key(chunk)) for chunk in plan.texts]
+        if all(part is not None for part in parts):
+            fetched[key] = pool(parts, plan.weights)
+
+    for key, emb in fetched.items():
+        _remember(key, emb)
+        if store is not None:
+            store.put(key, emb)
+        for i in missing[key]:
+            out[i] = emb
+    return out
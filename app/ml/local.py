@@ -0,0 +1,107 @@
+"""
+Local CPU embeddings: hashed word and character n-grams with IDF weights.
+
+Features are word unigrams, word bigrams and character trigrams (with word
+boundary markers), hashed with CRC32 into a fixed number of signed buckets.
+Term frequencies are sublinear (1 + log tf), scaled by per-bucket IDF fitted on
+`data/seed_examples.json`, and L2-normalized. The fitted IDF is stored as a
+small JSON artifact (`data/local_vectorizer.json`, built by
+`scripts/build_local_backend.py`); without it the IDF is fitted in memory on
+first use.
+"""
+import json
+import math
+import re
+import threading
+from pathlib import Path
+from zlib import crc32
+
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
+ARTIFACT_PATH = DATA_DIR / "local_vectorizer.json"
+SEED_PATH = DATA_DIR / "seed_examples.json"
+
+DEFAULT_DIM = 512
+_WORD = re.compile(r"[a-z0-9']+")
+
+
+def _features(text: str) -> dict[str, int]:
+    words = _WORD.findall(text.lower())
+    counts: dict[str, int] = {}
+    for i, w in enumerate(words):
+        counts["w:" + w] = counts.get("w:" + w, 0) + 1
+        if i:
+            key = "b:" + words[i - 1] + " " + w
+            counts[key] = counts.get(key, 0) + 1
+        padded = f"<{w}>"
+        for j in range(len(padded) - 2):
+            key = "c:" + padded[j : j + 3]
+            counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def _hashed(text: str, dim: int) -> dict[int, float]:
+    """Sublinear term frequencies folded into signed hash buckets."""
+    buckets: dict[int, float] = {}
+    for feature, tf in _features(text).items():
+        h = crc32(feature.encode("utf-8"))
+        idx = h % dim
+        sign = 1.0 if (h >> 31) & 1 else -1.0
+        buckets[idx] = buckets.get(idx, 0.0) + sign * (1.0 + math.log(tf))
+    return buckets
+
+
+class HashingVectorizer:
+    def __init__(self, idf: list[float], dim: int = DEFAULT_DIM):
+        self.dim = dim
+        self.idf = idf
+
+    @classmethod
+    def fit(cls, texts: list[str], dim: int = DEFAULT_DIM) -> "HashingVectorizer":
+        """Fit smoothed per-bucket IDF over `texts`."""
+        df = [0] * dim
+        for text in texts:
+            for idx in _hashed(text, dim):
+                df[idx] += 1
+        n = len(texts)
+        return cls([math.log((1 + n) / (1 + d)) + 1.0 for d in df], dim)
+
+    def transform(self, text: str) -> list[float]:
+        vec = [0.0] * self.dim
+        for idx, value in _hashed(text, self.dim).items():
+            vec[idx] = value * self.idf[idx]
+        norm = math.sqrt(sum(v * v for v in vec))
+        if norm == 0:
+            return vec
+        return [v / norm for v in vec]
+
+    def to_dict(self) -> dict:
+        return {"dim": self.dim, "idf": [round(v, 6) for v in self.idf]}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "HashingVectorizer":
+        return cls(list(data["idf"]), int(data["dim"]))
+
+
+def load_seed_texts() -> list[str]:
+    if not SEED_PATH.exists():
+        return []
+    with SEED_PATH.open(encoding="utf-8") as f:
+        return [ex.get("text", "") for ex in json.load(f)]
+
+
+_vectorizer: HashingVectorizer | None = None
+_lock = threading.Lock()
+
+
+def get_vectorizer() -> HashingVectorizer:
+    """Return the vectorizer from the artifact, fitting on the seed set if it is missing."""
+    global _vectorizer
+    if _vectorizer is None:
+        with _lock:
+            if _vectorizer is None:
+                if ARTIFACT_PATH.exists():
+                    with ARTIFACT_PATH.open(encoding="utf-8") as f:
+                        _vectorizer = HashingVectorizer.from_dict(json.load(f))
+                else:
+                    _vectorizer = HashingVectorizer.fit(load_seed_texts())
+    return _vectorizer
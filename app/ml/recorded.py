@@ -0,0 +1,91 @@
+"""
+Recorded embeddings for offline benchmark runs.
+
+A fixture file holds embeddings captured once from a live backend, keyed by
+the same model/dimensions/text digest as the vector store (`store_key`), as
+float16 values. `RecordedBackend` serves them back, so centroid scoring runs
+with no network access and no API key; texts that were not recorded get no
+vector.
+
+File layout: a header (`EBRF`, version, dimensions, requested dimensions, count,
+model name), then per entry a 16-byte key and `dimensions` little-endian
+float16 values. Only the standard library is needed to read or write it.
+"""
+import struct
+from pathlib import Path
+from typing import Callable
+
+from app.ml.backends import VectorBackend
+from app.ml.store import store_key
+
+_MAGIC = b"EBRF"
+_VERSION = 1
+_HEADER = struct.Struct("<4sIIII64s")  # magic, version, dim, requested dim (0 = native), count, model
+_KEY_SIZE = 16
+
+
+def write_fixture(
+    path: Path,
+    texts: list[str],
+    embed_many: Callable[[list[str]], list[list[float] | None]],
+    model: str,
+    requested_dimensions: int | None = None,
+) -> int:
+    """Embed the distinct `texts` and write them to `path`. Returns the number recorded."""
+    unique = list(dict.fromkeys(texts))
+    vectors = embed_many(unique)
+    missing = [text[:60] for text, vector in zip(unique, vectors) if vector is None]
+    if missing:
+        raise RuntimeError(f"{len(missing)} texts could not be embedded, e.g. {missing[0]!r}")
+    dim = len(vectors[0])
+    pack = struct.Struct(f"<{dim}e").pack
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with tmp.open("wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, dim, requested_dimensions or 0, len(unique), model.encode()))
+        for text, vector in zip(unique, vectors):
+            f.write(store_key(text, model, requested_dimensions))
+            f.write(pack(*vector))
+    tmp.replace(path)
+    return len(unique)
+
+
+def read_fixture(path: Path) -> tuple[str, int | None, dict[bytes, list[float]]]:
+    """Return (model, requested dimensions, {key: vector}) from a fixture file."""
+    data = Path(path).read_bytes()
+    magic, version, dim, requested, count, model = _HEADER.unpack_from(data)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError(f"{path} is not an embeddings fixture (version {_VERSION})")
+    unpack = struct.Struct(f"<{dim}e").unpack_from
+    record = _KEY_SIZE + 2 * dim
+    vectors = {}
+    for i in range(count):
+        offset = _HEADER.size + i * record
+        vectors[data[offset : offset + _KEY_SIZE]] = list(unpack(data, offset + _KEY_SIZE))
+    return model.rstrip(b"\0").decode(), requested or None, vectors
+
+
+class RecordedBackend(VectorBackend):
+    """Replays a fixture file; reported like the backend that recorded it."""
+
+    name = "recorded"
+    remote = False
+
+    def __init__(self, path: Path, meta_name: str = "centroid"):
+        self.path = Path(path)
+        self.meta_name = meta_name
+        self.model, self.requested_dimensions, self._vectors = read_fixture(self.path)
+        self.misses = 0
+
+    def available(self) -> bool:
+        return True
+
+    def embed(self, text: str) -> list[float] | None:
+        vector = self._vectors.get(store_key(text, self.model, self.requested_dimensions))
+        if vector is None:
+            self.misses += 1
+        return vector
+
+    def __len__(self) -> int:
+        return len(self._vectors)
@@ -1,9 +1,15 @@
-"""ML scorer: engagement_bait_score from seed embeddings."""
+"""ML scorer: engagement_bait_score from seed embeddings, per vector backend."""
 
 import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 
-from app.ml.embeddings import get_embedding
+from app import tracing
+from app.ml.backends import VectorBackend, get_backend
 
 
 def _cosine_sim(a: list[float], b: list[float]) -> float:
@@ -29,72 +35,208 @@ def _mean_embedding(embeddings: list[list[float]]) -> list[float] | None:
     return [x / n for x in out]
 
 
-_bait_centroid: list[float] | None = None
-_neutral_centroid: list[float] | None = None
-_initialized = False
+# backend name -> (bait centroid, neutral centroid), or None if seeding failed
+_centroids: dict[str, tuple[list[float], list[float]] | None] = {}
+# backend name -> stored centroid version in use (None: built from the seed file)
+_centroid_versions: dict[str, int | None] = {}
+# backend name -> when the stored version was last checked (time.monotonic)
+_checked_at: dict[str, float] = {}
 
+_SEED_PATH = Path(__file__).resolve().parent.parent.parent / "data" / "seed_examples.json"
 
-def _ensure_centroids() -> bool:
-    """Load seed examples, embed them, compute centroids. Returns True if ready."""
-    global _bait_centroid, _neutral_centroid, _initialized
-    if _initialized:
-        return _bait_centroid is not None and _neutral_centroid is not None
 
-    path = Path(__file__).resolve().parent.parent.parent / "data" / "seed_examples.json"
-    if not path.exists():
-        _initialized = True
-        return False
+def refresh_seconds() -> float:
+    """How often a process looks for a new stored centroid version (`CENTROID_REFRESH_SECONDS`, default 5)."""
+    return float(os.environ.get("CENTROID_REFRESH_SECONDS", 5) or 0)
+
+
+def seed_examples() -> list[tuple[str, str]]:
+    """(text, lowercased label) for each curated seed example."""
+    if not _SEED_PATH.exists():
+        return []
+    with _SEED_PATH.open() as f:
+        return [(ex.get("text", ""), ex.get("label", "").lower()) for ex in json.load(f)]
+
 
-    with path.open() as f:
-        examples = json.load(f)
+def _ensure_centroids(backend: VectorBackend) -> tuple[list[float], list[float]] | None:
+    """
+    Centroids for `backend`: the current stored version (see
+    `app.ml.centroids`) if there is one, else the seed means. Cached per
+    backend and refreshed when another process commits a new version.
+    """
+    if backend.name in _centroids and not _stored_version_changed(backend.name):
+        return _centroids[backend.name]
+    with tracing.span("centroids.init", **{"vector.backend": backend.name}):
+        return _load_centroids(backend)
+
+
+def _stored_version_changed(name: str) -> bool:
+    now = time.monotonic()
+    if now - _checked_at.get(name, float("-inf")) < refresh_seconds():
+        return False
+    _checked_at[name] = now
+    from app.ml.centroids import stored_version
+
+    try:
+        version = stored_version(name)
+    except sqlite3.Error:
+        return False  # keep scoring with what we have
+    return version is not None and version != _centroid_versions.get(name)
+
+
+def _load_centroids(backend: VectorBackend) -> tuple[list[float], list[float]] | None:
+    from app.ml.centroids import load_current
+
+    _checked_at[backend.name] = time.monotonic()
+    try:
+        state = load_current(backend.name)
+    except sqlite3.Error:
+        state = None
+    if state is not None:
+        use_centroids(backend.name, state.centroids, state.version)
+        return state.centroids
+    return _build_centroids(backend)
+
+
+def _build_centroids(backend: VectorBackend) -> tuple[list[float], list[float]] | None:
+    examples = seed_examples()
+    if not examples:
+        _centroids[backend.name] = None
+        return None
 
     bait_embs: list[list[float]] = []
     neutral_embs: list[list[float]] = []
 
-    for ex in examples:
-        text = ex.get("text", "")
-        label = ex.get("label", "").lower()
-        emb = get_embedding(text)
+    embs = backend.embed_many([text for text, _label in examples])
+    for (_text, label), emb in zip(examples, embs):
         if emb is None:
-            _initialized = True
-            return False
+            _centroids[backend.name] = None
+            return None
         if label == "bait":
             bait_embs.append(emb)
         elif label == "neutral":
             neutral_embs.append(emb)
 
-    _bait_centroid = _mean_embedding(bait_embs)
-    _neutral_centroid = _mean_embedding(neutral_embs)
-    _initialized = True
-    return _bait_centroid is not None and _neutral_centroid is not None
+    bait = _mean_embedding(bait_embs)
+    neutral = _mean_embedding(neutral_embs)
+    use_centroids(backend.name, (bait, neutral) if bait is not None and neutral is not None else None, None)
+    return _centroids[backend.name]
+
+
+def use_centroids(
+    backend_name: str, centroids: tuple[list[float], list[float]] | None, version: int | None
+) -> None:
+    """Swap in `centroids` (stored `version`, None for the seed means) for new scores."""
+    _centroid_arrays.pop(backend_name, None)
+    _centroid_versions[backend_name] = version
+    _centroids[backend_name] = centroids
+
+
+def centroid_version(backend_name: str) -> int | None:
+    """The stored centroid version this process scores `backend_name` with (None: seed means)."""
+    return _centroid_versions.get(backend_name)
+
 
+def forget_centroids(backend_name: str) -> None:
+    """Drop cached centroids so the next score reloads them."""
+    _centroids.pop(backend_name, None)
+    _centroid_arrays.pop(backend_name, None)
+    _centroid_versions.pop(backend_name, None)
+    _checked_at.pop(backend_name, None)
 
-def _score_from_centroids(emb: list[float]) -> float:
+
+def _score_from_centroids(emb: list[float], centroids: tuple[list[float], list[float]]) -> float:
     """Score from bait vs neutral centroid similarity."""
-    if _bait_centroid is None or _neutral_centroid is None:
-        return 0.0
-    sim_bait = _cosine_sim(emb, _bait_centroid)
-    sim_neutral = _cosine_sim(emb, _neutral_centroid)
+    bait, neutral = centroids
+    sim_bait = _cosine_sim(emb, bait)
+    sim_neutral = _cosine_sim(emb, neutral)
     diff = sim_bait - sim_neutral
     score = (diff + 1) / 2
     return max(0.0, min(1.0, score))
 
 
-def compute_engagement_bait_result(text: str) -> tuple[float | None, str]:
+# backend name -> (centroids, the same as float32 arrays), for scoring quantized vectors
+_centroid_arrays: dict[str, tuple] = {}
+
+
+def _score_quantized(values, backend_name: str, centroids: tuple[list[float], list[float]]) -> float:
+    """Same as `_score_from_centroids`, computed on a quantized stored vector."""
+    import numpy as np
+
+    from app.ml.store import cosine_quantized
+
+    cached = _centroid_arrays.get(backend_name)
+    if cached is None or cached[0] is not centroids:  # built for a version since replaced
+        cached = (centroids, tuple(np.asarray(c, dtype=np.float32) for c in centroids))
+        _centroid_arrays[backend_name] = cached
+    arrays = cached[1]
+    diff = cosine_quantized(values, arrays[0]) - cosine_quantized(values, arrays[1])
+    return max(0.0, min(1.0, (diff + 1) / 2))
+
+
+def compute_engagement_bait_result(text: str, backend: str | None = None) -> tuple[float | None, str]:
     """
     Compute engagement_bait_score (0-1) and report which backend produced it.
-    Returns None if OpenAI is unavailable. Uses centroid similarity over the
-    curated bait and neutral seed sets.
+    Returns (None, "none") if the backend is unavailable or fails. Uses centroid
+    similarity over the curated bait and neutral seed sets.
     """
-    emb = get_embedding(text)
-    if emb is None:
-        return None, "none"
+    return compute_engagement_bait_results([text], backend)[0]
+
+
+def compute_engagement_bait_results(texts: list[str], backend: str | None = None) -> list[tuple[float | None, str]]:
+    """`compute_engagement_bait_result` for many texts, embedding the misses in one batch."""
+    vb = get_backend(backend)
+    failed = (None, "none")
+    if not vb.available():
+        return [failed] * len(texts)
+
+    results: list[tuple[float | None, str]] = [failed] * len(texts)
+    stored = [vb.lookup_quantized(text) for text in texts]
+    pending = [i for i, found in enumerate(stored) if found is None]
+    embs = vb.embed_many([texts[i] for i in pending]) if pending else []
+    if len(pending) == len(texts) and all(emb is None for emb in embs):
+        return results
+
+    centroids = _ensure_centroids(vb)
+    if centroids is None:
+        return results
+    for i, found in enumerate(stored):
+        if found is not None:
+            results[i] = (_score_quantized(found[0], vb.name, centroids), vb.meta_name)
+    for i, emb in zip(pending, embs):
+        if emb is not None:
+            results[i] = (_score_from_centroids(emb, centroids), vb.meta_name)
+    return results
+
+
+def compute_engagement_bait_score(text: str, backend: str | None = None) -> float | None:
+    score, _backend = compute_engagement_bait_result(text, backend)
+    return score
 
-    if not _ensure_centroids():
-        return None, "none"
-    return _score_from_centroids(emb), "centroid"
 
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
 
-def compute_engagement_bait_score(text: str) -> float | None:
-    score, _backend = compute_engagement_bait_result(text)
-    return score
+
+def default_timeout_ms() -> int | None:
+    """Server-wide embedding deadline from `EMBEDDING_TIMEOUT_MS` (unset or 0 = none)."""
+    value = int(os.environ.get("EMBEDDING_TIMEOUT_MS", 0) or 0)
+    return value if value > 0 else None
+
+
+def submit_engagement_bait_results(texts: list[str], backend: str | None = None) -> Future:
+    """
+    Run `compute_engagement_bait_results` on a shared worker pool
+    (`EMBEDDING_WORKERS`, default 8) so callers can do other work while the
+    embeddings are in flight. Callers that give up waiting leave the future
+    running, so late embeddings still land in the caches.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=int(os.environ.get("EMBEDDING_WORKERS", 8)),
+                    thread_name_prefix="embeddings",
+                )
+    return _executor.submit(tracing.bind(compute_engagement_bait_results), texts, backend)
@@ -0,0 +1,213 @@
+"""
+Memory-mapped, quantized embedding store shared across worker processes.
+
+Vectors are kept in a fixed-capacity open-addressing hash table inside one
+file, keyed by a 16-byte digest of the model, dimensions and text. Every worker
+maps the same file, so the OS page cache holds a single copy. Records are
+stored as float16, or as int8 with a per-vector scale (`max|v| / 127`); cosine
+scoring runs on the quantized values directly since the scale cancels out.
+
+Writers serialize on an `fcntl` lock file (a process-local lock on platforms
+without `fcntl`). Each slot carries a sequence number that a writer makes odd
+while it rewrites the slot and even again when done; lock-free readers retry
+when the number was odd or changed under their copy, so they never return a
+vector torn between two writes. When a probe run is full the home slot is
+overwritten. A file with a different layout is rebuilt in a temporary file and
+swapped in with `os.replace`. Requires numpy (optional).
+
+Configured with `EMBEDDING_STORE_PATH` (unset = `vectors.bin` in
+`SHARED_CACHE_DIR` if that is set, else disabled),
+`EMBEDDING_STORE_DTYPE` (`float16` or `int8`, default `int8`) and
+`EMBEDDING_STORE_CAPACITY` (default 100000 vectors).
+"""
+import hashlib
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+_MAGIC = b"EBVS"
+_VERSION = 2
+_HEADER = struct.Struct("<4sIIII")  # magic, version, dim, dtype code, capacity
+_HEADER_SIZE = 64
+_KEY_SIZE = 16
+_MAX_PROBE = 16
+# a reader that keeps racing writers on one slot gives up and reports a miss
+_READ_RETRIES = 8
+
+DTYPES = {"float16": 1, "int8": 2}
+
+
+def store_key(text: str, model: str, dimensions: int | None) -> bytes:
+    return hashlib.blake2b(
+        f"{model}\0{dimensions or ''}\0{text}".encode("utf-8"), digest_size=_KEY_SIZE
+    ).digest()
+
+
+def quantize(vector, dtype: str) -> tuple["np.ndarray", float]:
+    """Return (quantized values, scale) such that values * scale ~= vector."""
+    v = np.asarray(vector, dtype=np.float32)
+    if dtype == "float16":
+        return v.astype(np.float16), 1.0
+    peak = float(np.abs(v).max()) if v.size else 0.0
+    scale = peak / 127.0 if peak > 0 else 1.0
+    return np.clip(np.rint(v / scale), -127, 127).astype(np.int8), scale
+
+
+def dequantize(values: "np.ndarray", scale: float) -> list[float]:
+    return (values.astype(np.float32) * scale).tolist()
+
+
+def cosine_quantized(values: "np.ndarray", centroid: "np.ndarray") -> float:
+    """Cosine similarity between a quantized vector and a float centroid (scale-free)."""
+    q = values.astype(np.float32)
+    denom = float(np.linalg.norm(q) * np.linalg.norm(centroid))
+    return float(q @ centroid) / denom if denom else 0.0
+
+
+class VectorStore:
+    def __init__(self, path: Path, dim: int, dtype: str = "int8", capacity: int = 100_000):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported store dtype: {dtype}")
+        self.path = Path(path)
+        self.dim = dim
+        self.dtype = dtype
+        self.capacity = capacity
+        self._np_dtype = np.float16 if dtype == "float16" else np.int8
+        self._thread_lock = threading.Lock()
+        self._open()
+
+    def _layout(self) -> tuple[int, int, int, int, int]:
+        keys_at = _HEADER_SIZE
+        seqs_at = keys_at + self.capacity * _KEY_SIZE
+        scales_at = seqs_at + self.capacity * 4
+        vectors_at = scales_at + self.capacity * 4
+        size = vectors_at + self.capacity * self.dim * np.dtype(self._np_dtype).itemsize
+        return keys_at, seqs_at, scales_at, vectors_at, size
+
+    def _open(self) -> None:
+        keys_at, seqs_at, scales_at, vectors_at, size = self._layout()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._locked():
+            if not self._header_matches():
+                # a cache: anything with a different layout is simply rebuilt, in a
+                # new file so workers still mapping the old one never see it change
+                tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+                with tmp.open("wb") as f:
+                    f.write(_HEADER.pack(_MAGIC, _VERSION, self.dim, DTYPES[self.dtype], self.capacity).ljust(_HEADER_SIZE, b"\0"))
+                    f.truncate(size)
+                os.replace(tmp, self.path)
+        self._keys = np.memmap(self.path, dtype=np.uint8, mode="r+", offset=keys_at, shape=(self.capacity, _KEY_SIZE))
+        self._seqs = np.memmap(self.path, dtype=np.uint32, mode="r+", offset=seqs_at, shape=(self.capacity,))
+        self._scales = np.memmap(self.path, dtype=np.float32, mode="r+", offset=scales_at, shape=(self.capacity,))
+        self._vectors = np.memmap(self.path, dtype=self._np_dtype, mode="r+", offset=vectors_at, shape=(self.capacity, self.dim))
+
+    def _header_matches(self) -> bool:
+        if not self.path.exists() or self.path.stat().st_size != self._layout()[4]:
+            return False
+        with self.path.open("rb") as f:
+            magic, version, dim, code, capacity = _HEADER.unpack(f.read(_HEADER.size))
+        return (magic, version, dim, code, capacity) == (_MAGIC, _VERSION, self.dim, DTYPES[self.dtype], self.capacity)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(f"{self.path}.lock", "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _probe(self, key: bytes) -> Iterator[int]:
+        home = int.from_bytes(key[:8], "little") % self.capacity
+        for i in range(min(_MAX_PROBE, self.capacity)):
+            yield (home + i) % self.capacity
+
+    def find(self, key: bytes) -> tuple["np.ndarray", float] | None:
+        """Return the stored (quantized values, scale) for `key`, or None."""
+        target = np.frombuffer(key, dtype=np.uint8)
+        for slot in self._probe(key):
+            for _ in range(_READ_RETRIES):
+                seq = int(self._seqs[slot])
+                if seq % 2:
+                    continue  # a writer is rewriting this slot
+                stored = np.array(self._keys[slot])
+                values = np.array(self._vectors[slot])
+                scale = float(self._scales[slot])
+                if int(self._seqs[slot]) == seq:
+                    break
+            else:
+                return None
+            if not stored.any():
+                return None
+            if np.array_equal(stored, target):
+                return values, scale
+        return None
+
+    def get(self, key: bytes) -> list[float] | None:
+        found = self.find(key)
+        return dequantize(*found) if found is not None else None
+
+    def put(self, key: bytes, vector: list[float]) -> None:
+        if len(vector) != self.dim:
+            return
+        values, scale = quantize(vector, self.dtype)
+        target = np.frombuffer(key, dtype=np.uint8)
+        with self._locked():
+            slots = list(self._probe(key))
+            chosen = slots[0]
+            for slot in slots:
+                stored = self._keys[slot]
+                if not stored.any() or np.array_equal(stored, target):
+                    chosen = slot
+                    break
+            self._seqs[chosen] += 1  # odd: readers retry until the rewrite is done
+            self._keys[chosen] = target
+            self._vectors[chosen] = values
+            self._scales[chosen] = scale
+            self._seqs[chosen] += 1
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._keys.any(axis=1)))
+
+
+_store: VectorStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_store(dim: int) -> VectorStore | None:
+    """Return the configured shared store for vectors of `dim`, or None if disabled."""
+    global _store
+    from app.cache import shared_cache_dir
+
+    path = os.environ.get("EMBEDDING_STORE_PATH", "").strip()
+    if not path and shared_cache_dir() is not None:
+        path = str(shared_cache_dir() / "vectors.bin")
+    if not path or np is None:
+        return None
+    if _store is None or _store.dim != dim:
+        with _store_lock:
+            if _store is None or _store.dim != dim:
+                _store = VectorStore(
+                    Path(path),
+                    dim,
+                    os.environ.get("EMBEDDING_STORE_DTYPE", "int8").strip().lower(),
+                    int(os.environ.get("EMBEDDING_STORE_CAPACITY", 100_000)),
+                )
+    return _store
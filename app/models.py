@@ -1,6 +1,6 @@
 from typing import Literal
 
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, field_validator, model_serializer
 
 MIN_TEXT_LEN = 50
 MAX_TEXT_LEN = 50_000
@@ -40,7 +40,45 @@ class AnalyzeMeta(BaseModel):
     embeddings_requested: bool
     embeddings_used: bool
     openai_available: bool
-    vector_backend: Literal["none", "centroid"]
+    vector_backend: Literal["none", "centroid", "local"]
+    lexicon_version: str = Field(description="Version of the lexicon bundle the metrics were computed with")
+    deadline_exceeded: bool | None = Field(
+        default=None,
+        description="True when the embedding missed the request deadline; omitted when no deadline applied",
+    )
+    degraded: bool | None = Field(
+        default=None,
+        description="True when embeddings were skipped to shed load; omitted otherwise",
+    )
+    near_duplicate_similarity: float | None = Field(
+        default=None,
+        description="Estimated Jaccard similarity to the recently analyzed text whose results were reused",
+    )
+    near_duplicate_reuse: Literal["score", "metrics", "all"] | None = Field(
+        default=None,
+        description="Which parts of the result were reused from a near duplicate; omitted when nothing was",
+    )
+    embedding_chunks: int | None = Field(
+        default=None,
+        description="Number of model-sized chunks the text was embedded in; omitted when no embedding was computed",
+    )
+    embedding_truncation: Literal["none", "head"] | None = Field(
+        default=None,
+        description="`head` when only the first EMBEDDING_MAX_CHUNKS chunks were embedded, else `none`",
+    )
+    profile_id: str | None = Field(
+        default=None,
+        description="Id of the profile captured for this request (see /admin/profiles); omitted when not profiled",
+    )
+
+    @model_serializer(mode="wrap")
+    def _omit_unset_optional(self, handler):
+        # optional fields are only present when set, matching AnalysisMeta.to_dict()
+        data = handler(self)
+        return {k: v for k, v in data.items() if v is not None or k in _REQUIRED_META}
+
+
+_REQUIRED_META = ("embeddings_requested", "embeddings_used", "openai_available", "vector_backend", "lexicon_version")
 
 
 class AnalyzeResponse(BaseModel):
@@ -91,3 +129,64 @@ class BatchAnalyzeResult(BaseModel):
 
 class BatchAnalyzeResponse(BaseModel):
     items: list[BatchAnalyzeResult]
+
+
+class JobStatus(BaseModel):
+    id: str
+    status: Literal["queued", "running", "done", "failed"]
+    processed: int = Field(..., description="Input lines scored so far")
+    total: int | None = Field(default=None, description="Input lines in the job; null until counted")
+    errors: int = Field(..., description="Lines that could not be scored (see their result lines)")
+    error: str | None = Field(default=None, description="Why the job failed, if it did")
+    created_at: float
+    finished_at: float | None = None
+    expires_at: float | None = Field(default=None, description="When a finished job and its results are deleted")
+    results: str = Field(..., description="Path of the results endpoint")
+
+
+class JobResultsPage(BaseModel):
+    items: list[dict] = Field(..., description="Result lines: `{id, result}` or `{id, error}`, in input order")
+    next_offset: int | None = Field(default=None, description="Offset of the next page; null at the end")
+
+
+class FeedbackItem(BaseModel):
+    text: str = Field(
+        ...,
+        description=f"Labeled text ({MIN_TEXT_LEN}-{MAX_TEXT_LEN} characters)",
+        json_schema_extra={"minLength": MIN_TEXT_LEN, "maxLength": MAX_TEXT_LEN},
+    )
+    label: Literal["bait", "neutral"]
+
+    @field_validator("text")
+    @classmethod
+    def validate_text(cls, v: str) -> str:
+        return validate_text_length_value(v)
+
+
+class FeedbackRequest(BaseModel):
+    items: list[FeedbackItem]
+
+    @field_validator("items")
+    @classmethod
+    def validate_items(cls, v: list[FeedbackItem]) -> list[FeedbackItem]:
+        if not v:
+            raise ValueError("Feedback must include at least 1 item")
+        if len(v) > 1000:
+            raise ValueError("Feedback must include at most 1000 items")
+        return v
+
+
+class CentroidVersion(BaseModel):
+    backend: str
+    version: int
+    bait_count: int = Field(..., description="Texts averaged into the bait centroid")
+    neutral_count: int = Field(..., description="Texts averaged into the neutral centroid")
+    created_at: float
+    source: Literal["seeds", "feedback"] = Field(..., description="`seeds` for the seed means, else `feedback`")
+
+
+class FeedbackResponse(CentroidVersion):
+    added: int = Field(..., description="Texts folded in for the first time")
+    moved: int = Field(..., description="Texts moved to the other centroid because their label changed")
+    skipped: int = Field(..., description="Texts already folded in under the same label")
+    failed: int = Field(..., description="Texts that could not be embedded; resubmit them later")
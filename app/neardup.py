@@ -0,0 +1,202 @@
+"""
+Near-duplicate index for reusing scores across lightly edited reposts.
+
+Texts are normalized (lowercased, whitespace collapsed) and shingled into
+character 5-grams. A 64-permutation MinHash signature (multiply-shift hashes,
+low 16 bits of each minimum kept) estimates Jaccard similarity between shingle
+sets. Banded LSH (16 bands of 4 rows) finds candidates, which are verified
+against the signature before a match is accepted at `NEARDUP_THRESHOLD`.
+
+Memory is fixed at construction: entries live in a ring of `capacity` slots
+(signature, metrics row, engagement bait score, backend, lexicon version,
+centroid version), and each band is a
+direct-mapped table of slot ids, so the newest entry wins a bucket and stale
+pointers fail verification. That is roughly 530 bytes per entry, or about
+53 MB at the default 100,000 entries. Metrics are only reused from entries
+computed with the same lexicon version, and scores only from entries scored
+with the same stored centroid version (see `app.ml.centroids`). Requires numpy
+(optional).
+
+Configured with `NEARDUP_THRESHOLD` (Jaccard, e.g. 0.85; unset = disabled),
+`NEARDUP_REUSE` (`score` to reuse only the engagement bait score, or `all` to
+reuse the heuristic metrics too; default `score`) and `NEARDUP_MAX_ENTRIES`
+(default 100000).
+"""
+import hashlib
+import math
+import os
+import re
+import threading
+from typing import Literal
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+from app.analyzers.result import COLUMNS, MetricResult, pack_metrics, unpack_metrics
+
+NUM_PERM = 64
+BANDS = 16
+SHINGLE = 5
+_SEED = 0x5EED
+_WHITESPACE = re.compile(r"\s+")
+# backend name -> code stored per entry; 0 = no score
+_BACKEND_CODES = {"openai": 1, "local": 2}
+
+Reuse = Literal["score", "all"]
+
+
+def _version_code(lexicon_version: str) -> int:
+    return int.from_bytes(hashlib.blake2b(lexicon_version.encode(), digest_size=8).digest(), "little") | 1
+
+
+def _centroid_code(centroid_version: int | None) -> int:
+    # 0 = the seed means, which have no stored version
+    return centroid_version + 1 if centroid_version is not None else 0
+
+
+class NearMatch:
+    __slots__ = ("similarity", "metrics", "score", "backend", "centroid_version")
+
+    def __init__(
+        self,
+        similarity: float,
+        metrics: tuple[MetricResult, ...],
+        score: float | None,
+        backend: str | None,
+        centroid_version: int | None = None,
+    ):
+        self.similarity = similarity
+        self.metrics = metrics
+        self.score = score
+        self.backend = backend
+        self.centroid_version = centroid_version
+
+
+class NearDuplicateIndex:
+    def __init__(self, capacity: int = 100_000, threshold: float = 0.85):
+        self.capacity = capacity
+        self.threshold = threshold
+        rng = np.random.default_rng(_SEED)  # same permutations in every worker
+        high = np.iinfo(np.uint64).max
+        self._a = rng.integers(0, high, NUM_PERM, dtype=np.uint64, endpoint=True) | np.uint64(1)
+        self._b = rng.integers(0, high, NUM_PERM, dtype=np.uint64, endpoint=True)
+        self._powers = np.array([31**k for k in range(SHINGLE)], dtype=np.uint64)
+        self._table_size = 1 << max(4, (2 * capacity - 1).bit_length())
+        self._tables = np.full((BANDS, self._table_size), -1, dtype=np.int32)
+        self._sigs = np.zeros((capacity, NUM_PERM), dtype=np.uint16)
+        self._rows = np.zeros((capacity, len(COLUMNS) - 1), dtype=np.float64)
+        self._scores = np.full(capacity, np.nan, dtype=np.float64)
+        self._backends = np.zeros(capacity, dtype=np.uint8)
+        self._versions = np.zeros(capacity, dtype=np.uint64)
+        self._centroid_versions = np.zeros(capacity, dtype=np.uint32)
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def signature(self, text: str) -> "np.ndarray":
+        data = np.frombuffer(_WHITESPACE.sub(" ", text.lower()).strip().encode("utf-8"), dtype=np.uint8)
+        if len(data) < SHINGLE:
+            data = np.pad(data, (0, SHINGLE - len(data)))
+        n = len(data) - SHINGLE + 1
+        # polynomial hash of each 5-byte window, kept under 32 bits
+        shingles = np.zeros(n, dtype=np.uint64)
+        for k in range(SHINGLE):
+            shingles += data[k : k + n].astype(np.uint64) * self._powers[k]
+        shingles = np.unique(shingles & 0xFFFFFFFF)
+        # multiply-shift hashing: one random odd multiplier per permutation,
+        # wrapping mod 2**64, keeping the high 32 bits
+        hashed = (self._a[:, None] * shingles[None, :] + self._b[:, None]) >> np.uint64(32)
+        return (hashed.min(axis=1) & np.uint64(0xFFFF)).astype(np.uint16)
+
+    def _buckets(self, sig: "np.ndarray") -> "np.ndarray":
+        bands = sig.reshape(BANDS, -1).astype(np.uint64)
+        key = np.zeros(BANDS, dtype=np.uint64)
+        for row in range(bands.shape[1]):
+            key = (key << np.uint64(16)) | bands[:, row]
+        # mix so that nearby band values spread over the table
+        key = (key * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(20)
+        return (key % np.uint64(self._table_size)).astype(np.int64)
+
+    def lookup(
+        self,
+        sig: "np.ndarray",
+        backend: str | None = None,
+        lexicon_version: str | None = None,
+        centroid_version: int | None = None,
+    ) -> NearMatch | None:
+        """
+        Nearest indexed text at or above the threshold; with `backend`, only
+        entries it scored with `centroid_version` (None: the seed means), and
+        with `lexicon_version`, only entries computed with it.
+        """
+        with self._lock:
+            slots = self._tables[np.arange(BANDS), self._buckets(sig)]
+            slots = np.unique(slots[slots >= 0])
+            if backend is not None:
+                slots = slots[self._backends[slots] == _BACKEND_CODES.get(backend, 255)]
+                slots = slots[self._centroid_versions[slots] == _centroid_code(centroid_version)]
+            if lexicon_version is not None:
+                slots = slots[self._versions[slots] == _version_code(lexicon_version)]
+            if not len(slots):
+                return None
+            similarity = (self._sigs[slots] == sig).mean(axis=1)
+            best = int(np.argmax(similarity))
+            if similarity[best] < self.threshold:
+                return None
+            slot = int(slots[best])
+            score = float(self._scores[slot])
+            code = int(self._backends[slot])
+            centroid = int(self._centroid_versions[slot])
+            return NearMatch(
+                float(similarity[best]),
+                unpack_metrics(self._rows[slot].tolist()),
+                None if math.isnan(score) else score,
+                next((name for name, c in _BACKEND_CODES.items() if c == code), None),
+                centroid - 1 if centroid else None,
+            )
+
+    def insert(
+        self,
+        sig: "np.ndarray",
+        metrics: tuple[MetricResult, ...],
+        score: float | None,
+        backend: str | None,
+        lexicon_version: str | None = None,
+        centroid_version: int | None = None,
+    ) -> None:
+        with self._lock:
+            slot = self._next % self.capacity
+            self._next += 1
+            self._sigs[slot] = sig
+            self._rows[slot] = pack_metrics(metrics)
+            has_score = score is not None and backend in _BACKEND_CODES
+            self._scores[slot] = score if has_score else np.nan
+            self._backends[slot] = _BACKEND_CODES[backend] if has_score else 0
+            self._versions[slot] = _version_code(lexicon_version) if lexicon_version else 0
+            self._centroid_versions[slot] = _centroid_code(centroid_version) if has_score else 0
+            self._tables[np.arange(BANDS), self._buckets(sig)] = slot
+
+    def __len__(self) -> int:
+        return min(self._next, self.capacity)
+
+
+_index: NearDuplicateIndex | None = None
+_index_lock = threading.Lock()
+
+
+def reuse_mode() -> Reuse:
+    return "all" if os.environ.get("NEARDUP_REUSE", "score").strip().lower() == "all" else "score"
+
+
+def get_index() -> NearDuplicateIndex | None:
+    """The process-wide index, or None when `NEARDUP_THRESHOLD` is unset or numpy is missing."""
+    global _index
+    value = os.environ.get("NEARDUP_THRESHOLD", "").strip()
+    if not value or np is None:
+        return None
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = NearDuplicateIndex(int(os.environ.get("NEARDUP_MAX_ENTRIES", 100_000)), float(value))
+    return _index
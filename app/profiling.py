@@ -0,0 +1,95 @@
+"""
+On-demand cProfile capture for individual analysis requests.
+
+A request is profiled when an admin caller sends `X-Profile: 1` together with
+`X-Admin-Token`, or at random with probability `PROFILE_SAMPLE_RATE` (default
+0, off). The analysis call runs under `cProfile` on its worker thread and the
+stats are written in the standard `pstats` format to `PROFILE_DIR` (default
+`var/profiles`) as `<profile_id>.prof`; open them with `python -m pstats` or
+snakeviz. The response carries the id in `meta.profile_id`. A call that raises
+is saved too, and the id is set on the exception as `profile_id`, so a request
+stopped by the CPU budget still leaves its profile. Only the newest
+`PROFILE_MAX_FILES` (default 100) profiles are kept.
+
+Embedding calls that run on the embedding pool show up as time spent waiting
+on their future, not as the work itself.
+"""
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable
+
+_ID = re.compile(r"^\d{8}T\d{6}-[0-9a-f]{8}$")
+
+
+def profile_dir() -> Path:
+    return Path(os.environ.get("PROFILE_DIR", "var/profiles"))
+
+
+def sampled() -> bool:
+    rate = float(os.environ.get("PROFILE_SAMPLE_RATE", 0) or 0)
+    return rate > 0 and random.random() < rate
+
+
+def run_profiled(enabled: bool, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> tuple[Any, str | None]:
+    """Call `fn`; when `enabled`, under cProfile. Returns (result, profile_id or None)."""
+    if not enabled:
+        return fn(*args, **kwargs), None
+    profiler = cProfile.Profile()
+    try:
+        result = profiler.runcall(fn, *args, **kwargs)
+    except Exception as exc:
+        exc.profile_id = save(profiler)
+        raise
+    return result, save(profiler)
+
+
+def save(profiler: cProfile.Profile) -> str:
+    root = profile_dir()
+    root.mkdir(parents=True, exist_ok=True)
+    profile_id = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{uuid.uuid4().hex[:8]}"
+    tmp = root / f".{profile_id}.tmp"
+    profiler.create_stats()
+    pstats.Stats(profiler).dump_stats(tmp)
+    os.replace(tmp, root / f"{profile_id}.prof")
+    _prune(root, max(1, int(os.environ.get("PROFILE_MAX_FILES", 100))))
+    return profile_id
+
+
+def _prune(root: Path, keep: int) -> None:
+    # ids start with a UTC timestamp, so name order is age order
+    for path in sorted(root.glob("*.prof"))[:-keep]:
+        path.unlink(missing_ok=True)
+
+
+def list_profiles(limit: int = 50) -> list[dict[str, Any]]:
+    """Newest first: {id, size, created_at} per stored profile."""
+    out = []
+    for path in sorted(profile_dir().glob("*.prof"), reverse=True)[:limit]:
+        try:
+            st = path.stat()
+        except OSError:
+            continue  # pruned by another worker meanwhile
+        out.append({"id": path.stem, "size": st.st_size, "created_at": st.st_mtime})
+    return out
+
+
+def profile_path(profile_id: str) -> Path | None:
+    """Path of a stored profile, or None for an unknown or malformed id."""
+    if not _ID.match(profile_id):
+        return None
+    path = profile_dir() / f"{profile_id}.prof"
+    return path if path.exists() else None
+
+
+def render_text(path: Path, limit: int = 40) -> str:
+    """The top `limit` functions by cumulative time, as `pstats` prints them."""
+    out = io.StringIO()
+    pstats.Stats(str(path), stream=out).sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
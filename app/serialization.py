@@ -0,0 +1,104 @@
+"""Response encoding for the HTTP layer.
+
+Endpoints return pre-built payloads (see `AnalysisResult.to_payload`) through
+`FastJSONResponse`, which bypasses FastAPI's response-model re-validation. The
+`response_model` declared on each route is kept so the OpenAPI schema is
+unchanged.
+
+Clients may opt into MessagePack with `Accept: application/msgpack` (requires
+the optional `msgpack` package), and batch endpoints can emit a columnar
+layout that lists each key once.
+"""
+import json
+import math
+from typing import Any, Iterable, Literal
+
+from fastapi.responses import Response
+
+from app.analyzers.result import COLUMNS, AnalysisResult
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is listed in requirements.txt
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+Layout = Literal["items", "columnar"]
+
+
+def dumps(payload: Any) -> bytes:
+    """Encode a JSON-compatible payload to UTF-8 bytes, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(
+        payload, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def loads(data: bytes | str) -> Any:
+    """Decode JSON, using orjson when available. Raises `ValueError` on invalid input."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(Response):
+    """JSON response that encodes its content directly with `dumps`."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class MsgPackResponse(Response):
+    media_type = "application/msgpack"
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, use_bin_type=True)
+
+
+def wants_msgpack(accept: str | None) -> bool:
+    """True if the `Accept` header prefers MessagePack and msgpack is installed."""
+    if msgpack is None or not accept:
+        return False
+    return any(
+        part.split(";")[0].strip().lower() in MSGPACK_MEDIA_TYPES
+        for part in accept.split(",")
+    )
+
+
+def encoded_response(payload: Any, accept: str | None = None) -> Response:
+    """Encode `payload` as MessagePack or JSON depending on the `Accept` header."""
+    response = MsgPackResponse(payload) if wants_msgpack(accept) else FastJSONResponse(payload)
+    response.headers["Vary"] = "Accept"
+    return response
+
+
+def columnar_payload(ids: list[str], results: Iterable[AnalysisResult]) -> dict[str, Any]:
+    """
+    Batch payload with each key listed once: `columns` names the score columns
+    (see `app.analyzers.result.COLUMNS`) and `data` holds one parallel array per
+    column. Meta fields are laid out the same way under `meta`.
+    """
+    rows = []
+    metas = []
+    for result in results:
+        rows.append(result.to_row())
+        metas.append(result.meta.to_dict())
+    data = [[row[i] for row in rows] for i in range(len(COLUMNS))]
+    data[-1] = [None if math.isnan(v) else v for v in data[-1]]
+    meta_keys = dict.fromkeys(key for meta in metas for key in meta)
+    return {
+        "layout": "columnar",
+        "ids": ids,
+        "columns": list(COLUMNS),
+        "data": data,
+        "meta": {key: [meta.get(key) for meta in metas] for key in meta_keys},
+    }
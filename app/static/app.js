@@ -18,6 +18,7 @@ const metricLabels = {
 
 const textInput = document.querySelector("#text-input");
 const embeddingsToggle = document.querySelector("#embeddings-toggle");
+const liveToggle = document.querySelector("#live-toggle");
 const analyzeButton = document.querySelector("#analyze-button");
 const errorMessage = document.querySelector("#error-message");
 const resultsGrid = document.querySelector("#results-grid");
@@ -28,6 +29,7 @@ for (const button of document.querySelectorAll(".sample-button")) {
   button.addEventListener("click", () => {
     textInput.value = samples[button.dataset.sample];
     errorMessage.hidden = true;
+    scheduleLive();
   });
 }
 
@@ -62,6 +64,93 @@ analyzeButton.addEventListener("click", async () => {
   }
 });
 
+// Live scoring: one WebSocket to /ws/analyze, each edit sent with an increasing id.
+// Replies can arrive out of order, so only a reply newer than the one on screen is rendered.
+const LIVE_DEBOUNCE_MS = 250;
+const MIN_TEXT_LENGTH = 50;
+let liveSocket = null;
+let liveTimer = null;
+let liveSent = 0;
+let liveShown = 0;
+
+function liveUrl() {
+  const scheme = location.protocol === "https:" ? "wss" : "ws";
+  return `${scheme}://${location.host}/ws/analyze?embeddings=${embeddingsToggle.checked}`;
+}
+
+function openLiveSocket() {
+  closeLiveSocket();
+  const socket = new WebSocket(liveUrl());
+  socket.addEventListener("open", sendLive);
+  socket.addEventListener("message", (event) => {
+    const reply = JSON.parse(event.data);
+    if (reply.id === null || reply.id <= liveShown) {
+      return;
+    }
+    liveShown = reply.id;
+    if (reply.error) {
+      errorMessage.textContent = reply.error.detail;
+      errorMessage.hidden = false;
+      return;
+    }
+    errorMessage.hidden = true;
+    rawJson.textContent = JSON.stringify(reply.result, null, 2);
+    renderResults(reply.result);
+  });
+  socket.addEventListener("close", () => {
+    if (liveSocket === socket) {
+      liveSocket = null;
+      liveToggle.checked = false;
+      analyzeButton.disabled = false;
+    }
+  });
+  liveSocket = socket;
+}
+
+function closeLiveSocket() {
+  clearTimeout(liveTimer);
+  if (liveSocket) {
+    const socket = liveSocket;
+    liveSocket = null;
+    socket.close();
+  }
+}
+
+function sendLive() {
+  const text = textInput.value;
+  if (!liveSocket || liveSocket.readyState !== WebSocket.OPEN || text.length < MIN_TEXT_LENGTH) {
+    return;
+  }
+  liveSent += 1;
+  liveSocket.send(JSON.stringify({ id: liveSent, text }));
+}
+
+function scheduleLive() {
+  if (!liveSocket) {
+    return;
+  }
+  clearTimeout(liveTimer);
+  liveTimer = setTimeout(sendLive, LIVE_DEBOUNCE_MS);
+}
+
+liveToggle.addEventListener("change", () => {
+  analyzeButton.disabled = liveToggle.checked;
+  if (liveToggle.checked) {
+    openLiveSocket();
+  } else {
+    closeLiveSocket();
+  }
+});
+
+embeddingsToggle.addEventListener("change", () => {
+  // the embeddings setting is per connection
+  if (liveSocket) {
+    openLiveSocket();
+  }
+});
+
+textInput.addEventListener("input", scheduleLive);
+
 function renderResults(data) {
   const cards = [];
   const metrics = [
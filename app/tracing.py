@@ -0,0 +1,174 @@
+"""
+Optional OpenTelemetry tracing.
+
+Off unless `TRACING_EXPORTER` names one or more exporters (comma-separated):
+- `console` — finished spans printed to stdout as JSON
+- `file` — one JSON span per line appended to `TRACING_FILE` (default `var/traces.jsonl`)
+- `otlp` — OTLP/HTTP to the collector at `OTEL_EXPORTER_OTLP_ENDPOINT`
+  (or `OTEL_EXPORTER_OTLP_TRACES_ENDPOINT`); setting either also turns `otlp` on
+
+Needs `opentelemetry-sdk`, plus `opentelemetry-exporter-otlp-proto-http` for
+OTLP. Spans are tagged with `service.name` from `OTEL_SERVICE_NAME` (default
+`engagement-bait-api`).
+
+With tracing off, `span()` returns one shared no-op context manager (well
+under a microsecond per span), `bind()` returns its function unchanged, the
+per-analyzer spans are skipped entirely and the HTTP middleware is not
+installed.
+"""
+import contextvars
+import os
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, Callable
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import SERVICE_NAME, Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SpanExporter
+except ImportError:  # optional dependency
+    trace = None
+
+_NOOP = nullcontext()
+_DEFAULT_FILE = Path(__file__).resolve().parent.parent / "var" / "traces.jsonl"
+
+_provider: "TracerProvider | None" = None
+_tracer = None
+
+
+def _exporter_names() -> list[str]:
+    names = [n.strip().lower() for n in os.environ.get("TRACING_EXPORTER", "").split(",") if n.strip()]
+    otlp_endpoint = os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT") or os.environ.get("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT")
+    if otlp_endpoint and "otlp" not in names:
+        names.append("otlp")
+    return names
+
+
+def _file_exporter() -> "SpanExporter":
+    path = Path(os.environ.get("TRACING_FILE", "") or _DEFAULT_FILE)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    out = path.open("a", encoding="utf-8", buffering=1)
+    return ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+
+
+def _otlp_exporter() -> "SpanExporter":
+    try:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    except ImportError:
+        raise RuntimeError(
+            "OTLP tracing needs the opentelemetry-exporter-otlp-proto-http package"
+        ) from None
+    return OTLPSpanExporter()  # endpoint and headers come from the OTEL_EXPORTER_OTLP_* variables
+
+
+def configure() -> bool:
+    """Set up tracing from the environment once; returns whether it is on."""
+    if _tracer is not None:
+        return True
+    names = _exporter_names()
+    if not names:
+        return False
+    if trace is None:
+        raise RuntimeError("TRACING_EXPORTER is set but opentelemetry-sdk is not installed")
+    factories = {"console": ConsoleSpanExporter, "file": _file_exporter, "otlp": _otlp_exporter}
+    unknown = [name for name in names if name not in factories]
+    if unknown:
+        raise RuntimeError(f"Unknown TRACING_EXPORTER {unknown[0]!r}; use console, file or otlp")
+    install(*(factories[name]() for name in names))
+    return True
+
+
+def install(*exporters: "SpanExporter", processor: Callable[["SpanExporter"], Any] | None = None) -> None:
+    """Turn tracing on with `exporters` (batched by default; tests pass a synchronous `processor`)."""
+    global _provider, _tracer
+    provider = TracerProvider(
+        resource=Resource.create({SERVICE_NAME: os.environ.get("OTEL_SERVICE_NAME", "engagement-bait-api")})
+    )
+    for exporter in exporters:
+        provider.add_span_processor((processor or BatchSpanProcessor)(exporter))
+    _provider = provider
+    _tracer = provider.get_tracer("app")
+
+
+def shutdown() -> None:
+    """Flush pending spans and turn tracing off."""
+    global _provider, _tracer
+    provider, _provider, _tracer = _provider, None, None
+    if provider is not None:
+        provider.shutdown()
+
+
+def enabled() -> bool:
+    return _tracer is not None
+
+
+def span(name: str, **attributes: Any):
+    """A context manager for a child span of the current one, or a no-op when tracing is off."""
+    if _tracer is None:
+        return _NOOP
+    return _tracer.start_as_current_span(name, attributes=attributes)
+
+
+def set_attributes(**attributes: Any) -> None:
+    """Add attributes to the current span, e.g. values only known once the work is done."""
+    if _tracer is not None:
+        trace.get_current_span().set_attributes(attributes)
+
+
+def bind(fn: Callable) -> Callable:
+    """`fn` carrying the current span into another thread; `fn` itself when tracing is off."""
+    if _tracer is None:
+        return fn
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.run(fn, *args, **kwargs)
+
+
+def current_link() -> Any:
+    """A link to the current span, for work that is shared between requests (None when off)."""
+    if _tracer is None:
+        return None
+    context = trace.get_current_span().get_span_context()
+    return trace.Link(context) if context.is_valid else None
+
+
+def linked_span(name: str, links: list, **attributes: Any):
+    """A new root span linked to the requests it serves, e.g. one batched API call."""
+    if _tracer is None:
+        return _NOOP
+    return _tracer.start_as_current_span(name, links=[link for link in links if link is not None], attributes=attributes)
+
+
+class TracingMiddleware:
+    """One server span per HTTP request, named after the matched route once routing is done."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _tracer is None:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        with _tracer.start_as_current_span(
+            method,  # unmatched paths keep the bare method, so span names stay low-cardinality
+            kind=trace.SpanKind.SERVER,
+            attributes={"http.request.method": method, "url.path": scope["path"]},
+        ) as current:
+
+            async def traced_send(message):
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    current.set_attribute("http.response.status_code", status)
+                    if status >= 500:
+                        current.set_status(trace.StatusCode.ERROR)
+                await send(message)
+
+            try:
+                await self.app(scope, receive, traced_send)
+            finally:
+                route = scope.get("route")
+                if route is not None and getattr(route, "path", None):
+                    current.update_name(f"{method} {route.path}")
+                    current.set_attribute("http.route", route.path)
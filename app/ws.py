@@ -0,0 +1,162 @@
+"""
+Pipelined scoring over a WebSocket (`/ws/analyze`).
+
+Each message is a JSON object `{"id": ..., "text": ...}`, where `id` is the
+client's correlation id (a string or integer, echoed back as-is). Messages are
+analyzed like `POST /analyze` bodies: same admission control, result cache,
+near-duplicate index and embedding micro-batcher, so texts from one socket and
+from concurrent HTTP requests share embedding calls. Each reply is sent as soon
+as its text is done, so replies may arrive out of order:
+
+    {"id": ..., "result": {...}}                    # the /analyze response body
+    {"id": ..., "error": {"detail": ..., "field": ...}}
+
+A message that can't be scored gets an error reply (with `id: null` if the id
+itself is missing or invalid) and the connection stays open. Under overload the
+error also carries `retry_after`, in seconds.
+
+At most `WS_MAX_IN_FLIGHT` messages per connection (default 8) are analyzed at
+once. While that many are running the server does not read from the socket, so
+a client that sends faster than it is served is held back by TCP flow control
+instead of queueing unbounded work on the server.
+"""
+import asyncio
+import logging
+import os
+from typing import Any
+
+from fastapi import WebSocket, WebSocketDisconnect
+from starlette.concurrency import run_in_threadpool
+
+from app import tracing
+from app.admission import Overloaded, get_admission, request_weight
+from app.budget import BudgetExceeded, cpu_budget_ms
+from app.models import validate_text_length_value
+from app.serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+
+def max_in_flight() -> int:
+    return max(1, int(os.environ.get("WS_MAX_IN_FLIGHT", 8)))
+
+
+class MessageError(ValueError):
+    def __init__(self, detail: str, field: str | None = None, item_id: str | int | None = None):
+        super().__init__(detail)
+        self.field = field
+        self.item_id = item_id
+
+
+def _parse(data: str | bytes) -> tuple[str | int, str]:
+    """Return (id, text) from one message, or raise `MessageError`."""
+    try:
+        message = loads(data)
+    except ValueError:
+        raise MessageError("Message is not valid JSON") from None
+    if not isinstance(message, dict):
+        raise MessageError("Message must be a JSON object")
+    item_id = message.get("id")
+    if item_id is None:
+        raise MessageError("Field required", "id")
+    if isinstance(item_id, bool) or not isinstance(item_id, (str, int)):
+        raise MessageError("Input should be a string or an integer", "id")
+    text = message.get("text")
+    if text is None:
+        raise MessageError("Field required", "text", item_id)
+    if not isinstance(text, str):
+        raise MessageError("Input should be a valid string", "text", item_id)
+    try:
+        return item_id, validate_text_length_value(text)
+    except ValueError as exc:
+        raise MessageError(str(exc), "text", item_id) from None
+
+
+def _error(item_id: Any, detail: str, field: str | None = None, **extra: Any) -> dict[str, Any]:
+    return {"id": item_id, "error": {"detail": detail, "field": field, **extra}}
+
+
+class ScoringSession:
+    """One `/ws/analyze` connection: reads messages, scores them concurrently, sends replies."""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        ml: bool | None = None,
+        backend: str | None = None,
+        timeout_ms: int | None = None,
+        limit: int | None = None,
+    ):
+        self.websocket = websocket
+        self.ml = ml
+        self.backend = backend
+        self.timeout_ms = timeout_ms
+        self.limit = limit or max_in_flight()
+        self._send_lock = asyncio.Lock()
+
+    async def run(self) -> None:
+        """Serve until the client disconnects. The socket must already be accepted."""
+        slots = asyncio.Semaphore(self.limit)
+        tasks: set[asyncio.Task] = set()
+        try:
+            while True:
+                # backpressure: don't read the next message until a slot is free
+                await slots.acquire()
+                message = await self.websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                data = message.get("text")
+                if data is None:
+                    data = message.get("bytes") or b""
+                task = asyncio.create_task(self._handle(data, slots))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            # analyses already on a worker thread still finish and fill the caches,
+            # and hold their admission weight until they do (see `Ticket`)
+            for task in tasks:
+                task.cancel()
+
+    async def _handle(self, data: str | bytes, slots: asyncio.Semaphore) -> None:
+        try:
+            # the HTTP middleware doesn't see individual messages, so each gets its own root span
+            with tracing.span("ws.message", **{"message.bytes": len(data)}):
+                reply = await self._score(data)
+            async with self._send_lock:
+                await self.websocket.send_text(dumps(reply).decode())
+        except (WebSocketDisconnect, RuntimeError, OSError):
+            pass  # the client went away; nobody is left to reply to
+        finally:
+            slots.release()
+
+    async def _score(self, data: str | bytes) -> dict[str, Any]:
+        from app.analyzers import analyze_text
+
+        try:
+            item_id, text = _parse(data)
+        except MessageError as exc:
+            return _error(exc.item_id, str(exc), exc.field)
+        try:
+            ticket = get_admission().admit(request_weight([text]))
+        except Overloaded as exc:
+            return _error(item_id, str(exc), retry_after=exc.retry_after)
+        with ticket:
+            try:
+                result = await run_in_threadpool(
+                    ticket.run,
+                    analyze_text,
+                    text,
+                    ml=self.ml,
+                    backend=self.backend,
+                    timeout_ms=self.timeout_ms,
+                    degraded=ticket.degraded,
+                    cpu_budget_ms=cpu_budget_ms(),
+                )
+            except BudgetExceeded as exc:
+                return _error(item_id, str(exc), "text")
+            except Exception:
+                logger.exception("Scoring websocket item %r failed", item_id)
+                return _error(item_id, "Internal Server Error")
+        return {"id": item_id, "result": result.to_payload()}
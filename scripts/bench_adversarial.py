@@ -0,0 +1,147 @@
+"""
+Time each heuristic analyzer on pathological inputs and report the worst case per KB.
+
+`adversarial_texts()` builds, for every analyzer, texts at the length limit
+aimed at its slow paths: thousands of repeated or negated lexicon phrases,
+near-miss phrase prefixes, one giant token, pages of `!!!!` or `1,000,000%`,
+long runs of digits, commas and whitespace, and token streams that defeat the
+early exits. Each analyzer is timed alone on its own cases, then the full
+heuristic pass on every case, in CPU milliseconds (the clock the per-request
+`ANALYSIS_CPU_BUDGET_MS` budget uses).
+
+Usage:
+    python -m scripts.bench_adversarial [--size 50000] [--repeat 3] [--json var/adversarial.json]
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.analyzers import _analyzer_calls, _heuristics
+from app.budget import cpu_budget_ms
+from app.lexicons.bundle import LexiconBundle, get_lexicons
+from app.models import MAX_TEXT_LEN
+
+
+def _fill(unit: str, size: int) -> str:
+    """`unit` repeated and cut to exactly `size` characters."""
+    return (unit * (size // len(unit) + 1))[:size]
+
+
+def _phrases(terms: frozenset[str], multiword: bool = True) -> list[str]:
+    return sorted(t for t in terms if (" " in t) == multiword) or sorted(terms)
+
+
+def adversarial_texts(size: int = MAX_TEXT_LEN, lexicons: LexiconBundle | None = None) -> dict[str, dict[str, str]]:
+    """Analyzer name -> {case name: text of `size` characters} aimed at that analyzer's slow paths."""
+    lex = lexicons or get_lexicons()
+    urgency = _phrases(lex.urgency_time) + _phrases(lex.urgency_scarcity) + _phrases(lex.urgency_fomo)
+    curiosity = _phrases(lex.curiosity_gap)
+    emotion = sorted(lex.emotion)
+    hedges = _phrases(lex.tradeoff) + _phrases(lex.conditional)
+    shared = {
+        "one_token": "a" * size,
+        "exclamations": "!" * size,
+        "whitespace": "x" + " " * (size - 2) + "x",
+    }
+    return {
+        "urgency_pressure": {
+            **shared,
+            "repeated_phrases": _fill(" ".join(urgency) + " ", size),
+            "negated_phrases": _fill(" ".join(f"not {p}" for p in urgency) + " ", size),
+            "phrase_prefixes": _fill(" ".join(p[:-1] for p in urgency) + " ", size),
+            "one_phrase": _fill(urgency[0] + " ", size),
+        },
+        "evidence_density": {
+            **shared,
+            "digits": "1" * size,
+            "thousands_chain": "1" + _fill(",000", size - 1),
+            "percent_pages": _fill("1,000,000% ", size),
+            "decimal_run": "1." + "5" * (size - 2),
+            "digit_words": _fill("1 ", size),
+            "open_brackets": "[" + " " * (size - 1),
+            "open_parens": _fill("(source ", size),
+            "one_url": "http://" + "a" * (size - 7),
+        },
+        "arousal_intensity": {
+            **shared,
+            "caps": _fill("WOW ", size),
+            "modified_emotion": _fill(" ".join(f"not extremely {w}" for w in emotion[:200]) + " ", size),
+            "curiosity_phrases": _fill(" ".join(curiosity) + " ", size),
+            "question_marks": _fill("?! ", size),
+        },
+        "counterargument_absence": {
+            **shared,
+            "repeated_hedges": _fill(" ".join(hedges) + " ", size),
+            "hedge_prefixes": _fill(" ".join(h[:-1] for h in hedges) + " ", size),
+        },
+        "claim_volume_vs_depth": {
+            **shared,
+            "digits": "1" * size,
+            "tiny_sentences": _fill("a. ", size),
+            "claims": _fill("this proves everyone knows. ", size),
+            "listicle_numbers": _fill("top 10 ", size),
+        },
+        "lexical_diversity": {
+            **shared,
+            "unique_tokens": _fill(" ".join(f"w{i}" for i in range(size // 3)), size),
+            "one_letter_tokens": _fill("a ", size),
+            "repeated_token": _fill("same ", size),
+        },
+    }
+
+
+def _cpu_ms(fn, *args, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.thread_time()
+        fn(*args)
+        best = min(best, time.thread_time() - start)
+    return best * 1000
+
+
+def run(size: int, repeat: int) -> dict:
+    lexicons = get_lexicons()
+    cases = adversarial_texts(size, lexicons)
+    analyzers = {name: (fn, args) for name, fn, args in _analyzer_calls("", lexicons)}
+    report: dict = {"size": size, "analyzers": {}, "heuristics": {}}
+    for name, texts in cases.items():
+        fn, args = analyzers[name]
+        timings = {case: _cpu_ms(fn, text, *args[1:], repeat=repeat) for case, text in texts.items()}
+        report["analyzers"][name] = timings
+    for texts in cases.values():
+        for case, text in texts.items():
+            report["heuristics"].setdefault(case, _cpu_ms(_heuristics, text, lexicons, repeat=repeat))
+    return report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=MAX_TEXT_LEN, help="characters per text")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case; the fastest is kept")
+    parser.add_argument("--json", type=Path, help="also write the timings here")
+    args = parser.parse_args()
+
+    report = run(args.size, args.repeat)
+    kb = args.size / 1000
+    print(f"{'analyzer':<26} {'worst case':<20} {'ms':>8} {'ms/KB':>8}")
+    for name, timings in report["analyzers"].items():
+        case, ms = max(timings.items(), key=lambda item: item[1])
+        print(f"{name:<26} {case:<20} {ms:>8.1f} {ms / kb:>8.2f}")
+    case, ms = max(report["heuristics"].items(), key=lambda item: item[1])
+    print(f"{'all heuristics':<26} {case:<20} {ms:>8.1f} {ms / kb:>8.2f}")
+    budget = cpu_budget_ms()
+    if budget is not None:
+        print(f"\nANALYSIS_CPU_BUDGET_MS={budget}: worst case uses {ms / budget:.0%} of one text's budget")
+    if args.json:
+        args.json.parent.mkdir(parents=True, exist_ok=True)
+        args.json.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,101 @@
+"""
+Compare response serialization paths for /analyze and /analyze/batch.
+
+The legacy path builds Pydantic models and lets FastAPI re-validate them
+against `response_model` before encoding. The fast path returns the payload
+built by `AnalysisResult.to_payload()` through `FastJSONResponse`. Analysis results
+are computed once up front so only serialization and HTTP overhead is timed.
+
+Usage:
+    python -m scripts.bench_serialization [--rounds 200] [--batch-size 1000]
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.analyzers import analyze_text
+from app.analyzers.result import AnalysisResult
+from app.models import AnalyzeResponse, BatchAnalyzeResponse, BatchAnalyzeResult
+from app.serialization import FastJSONResponse
+
+
+def _load_texts() -> list[str]:
+    path = Path(__file__).resolve().parent.parent / "data" / "seed_examples.json"
+    with path.open(encoding="utf-8") as f:
+        return [ex["text"] for ex in json.load(f)]
+
+
+def _build_app(single: AnalysisResult, batch: list[tuple[str, AnalysisResult]]) -> FastAPI:
+    bench = FastAPI()
+
+    @bench.get("/legacy/single", response_model=AnalyzeResponse)
+    def legacy_single():
+        return single.to_response()
+
+    @bench.get("/legacy/batch", response_model=BatchAnalyzeResponse)
+    def legacy_batch():
+        return BatchAnalyzeResponse(
+            items=[BatchAnalyzeResult(id=i, result=r.to_response()) for i, r in batch]
+        )
+
+    @bench.get("/fast/single", response_model=AnalyzeResponse)
+    def fast_single():
+        return FastJSONResponse(single.to_payload())
+
+    @bench.get("/fast/batch", response_model=BatchAnalyzeResponse)
+    def fast_batch():
+        return FastJSONResponse(
+            {"items": [{"id": i, "result": r.to_payload()} for i, r in batch]}
+        )
+
+    return bench
+
+
+def _time(client: TestClient, path: str, rounds: int) -> tuple[float, int]:
+    body = client.get(path).content  # warm-up
+    start = time.perf_counter()
+    for _ in range(rounds):
+        client.get(path)
+    return (time.perf_counter() - start) / rounds * 1000, len(body)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    texts = _load_texts()
+    results = [analyze_text(t, ml=False) for t in texts]
+    batch = [
+        (f"item-{i}", results[i % len(results)]) for i in range(args.batch_size)
+    ]
+    client = TestClient(_build_app(results[0], batch))
+
+    batch_rounds = max(1, args.rounds // 20)
+    print("Serialization benchmark (ms per response)")
+    print("-" * 72)
+    for label, rounds in (("single", args.rounds), ("batch", batch_rounds)):
+        legacy_ms, legacy_size = _time(client, f"/legacy/{label}", rounds)
+        fast_ms, fast_size = _time(client, f"/fast/{label}", rounds)
+        assert json.loads(client.get(f"/legacy/{label}").content) == json.loads(
+            client.get(f"/fast/{label}").content
+        )
+        print(
+            f"{label:<7} legacy={legacy_ms:8.3f}ms ({legacy_size} B) | "
+            f"fast={fast_ms:8.3f}ms ({fast_size} B) | "
+            f"speedup={legacy_ms / fast_ms:5.2f}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,34 @@
+"""
+Fit the local vector backend on the seed set and write its artifact.
+
+Usage:
+    python -m scripts.build_local_backend [--dim 512]
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.ml.local import ARTIFACT_PATH, DEFAULT_DIM, HashingVectorizer, load_seed_texts
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dim", type=int, default=DEFAULT_DIM)
+    args = parser.parse_args()
+
+    texts = load_seed_texts()
+    if not texts:
+        print("No seed examples found.")
+        return 1
+    vectorizer = HashingVectorizer.fit(texts, args.dim)
+    ARTIFACT_PATH.write_text(json.dumps(vectorizer.to_dict(), separators=(",", ":")), encoding="utf-8")
+    print(f"Wrote {ARTIFACT_PATH} (dim={args.dim}, {len(texts)} seed texts)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,93 @@
+"""
+Fold moderator labels into the embedding centroids, list versions, or roll back.
+
+Each input line is a JSON object with `text` and `label` (`bait` or
+`neutral`). Labels are committed in batches of `--batch-size`, one centroid
+version per batch; only texts that are new or relabeled are embedded, so
+re-running a file costs nothing. Running workers pick up each new version
+within `CENTROID_REFRESH_SECONDS`.
+
+Usage:
+    python -m scripts.centroid_feedback add labels.jsonl [--backend local] [--batch-size 1000]
+    python -m scripts.centroid_feedback list [--backend local]
+    python -m scripts.centroid_feedback rollback [--version N] [--backend local]
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Iterator
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.ml.backends import get_backend
+from app.ml.centroids import LABELS, CentroidError, add_feedback, get_store, rollback
+from app.models import validate_text_length_value
+
+
+def _read_batches(path: Path, batch_size: int) -> Iterator[list[tuple[str, str]]]:
+    batch: list[tuple[str, str]] = []
+    with path.open(encoding="utf-8") as f:
+        for lineno, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                text = validate_text_length_value(record["text"])
+                label = str(record["label"]).lower()
+                if label not in LABELS:
+                    raise ValueError(f"label must be one of {', '.join(LABELS)}")
+            except (ValueError, KeyError, TypeError) as exc:
+                print(f"line {lineno}: skipped ({exc})", file=sys.stderr)
+                continue
+            batch.append((text, label))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="fold a JSONL file of labeled texts into the centroids")
+    add.add_argument("input", type=Path)
+    add.add_argument("--batch-size", type=int, default=1000)
+    listing = commands.add_parser("list", help="show the stored versions")
+    listing.add_argument("--limit", type=int, default=20)
+    back = commands.add_parser("rollback", help="make an earlier version current")
+    back.add_argument("--version", type=int, default=None, help="default: the one before the current version")
+    for command in (add, listing, back):
+        command.add_argument("--backend", choices=("openai", "local"), default=None)
+    args = parser.parse_args()
+
+    try:
+        if args.command == "add":
+            for batch in _read_batches(args.input, args.batch_size):
+                r = add_feedback(batch, args.backend)
+                print(
+                    f"version {r['version']}: {r['added']} added, {r['moved']} moved, {r['skipped']} skipped, "
+                    f"{r['failed']} failed ({r['bait_count']} bait / {r['neutral_count']} neutral)"
+                )
+        elif args.command == "rollback":
+            state = rollback(args.backend, args.version)
+            print(f"version {state.version} is current ({state.bait_count} bait / {state.neutral_count} neutral)")
+        else:
+            name = get_backend(args.backend).name
+            store = get_store(create=False)
+            current = store.current_version(name) if store is not None else None
+            for v in store.versions(name, args.limit) if store is not None else []:
+                mark = "*" if v["version"] == current else " "
+                print(f"{mark} {v['version']:>5}  {v['source']:<8} {v['bait_count']:>7} bait {v['neutral_count']:>7} neutral")
+            if current is None:
+                print(f"No stored centroids for {name}; scoring uses the seed means")
+    except CentroidError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,297 @@
+"""
+Load-test /analyze and /analyze/batch offline against a mock OpenAI server.
+
+Starts the mock embeddings server (`scripts/mock_openai.py`) and the app under
+Uvicorn with `OPENAI_BASE_URL` pointing at the mock, then drives both endpoints
+from `--concurrency` concurrent clients with a weighted `--mix` for
+`--duration` seconds (or `--requests` requests). Reports throughput,
+p50/p95/p99 latency, status codes and how often responses were degraded or
+missed their embedding deadline, per endpoint and overall.
+
+Texts come from the bundled seed and benchmark examples. `--unique` makes that
+fraction of texts unique per request, to measure cold-cache behaviour.
+
+Usage:
+    python -m scripts.load_test [--concurrency 32] [--duration 30] [--mix analyze=3,batch=1]
+    python -m scripts.load_test --mock-latency-ms 200 --mock-rate-limit-rate 0.05 --app-workers 4
+    python -m scripts.load_test --url http://localhost:8000   # an already running app, no mock
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scripts.mock_openai import add_arguments as add_mock_arguments
+
+_ROOT = Path(__file__).resolve().parent.parent
+
+
+def _load_texts() -> list[str]:
+    texts = []
+    for name in ("seed_examples.json", "ml_benchmark_examples.json"):
+        with (_ROOT / "data" / name).open(encoding="utf-8") as f:
+            texts += [ex["text"] for ex in json.load(f)]
+    return [t for t in texts if 50 <= len(t) <= 49_000]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _parse_mix(value: str) -> dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ("analyze", "batch"):
+            raise argparse.ArgumentTypeError(f"unknown endpoint in mix: {name!r}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def _wait_ready(url: str, proc: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"process for {url} exited with {proc.returncode}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise SystemExit(f"{url} did not become ready in {timeout:.0f}s")
+
+
+def _start_servers(args: argparse.Namespace) -> tuple[str, str | None, list[subprocess.Popen]]:
+    procs: list[subprocess.Popen] = []
+    env = dict(os.environ)
+    mock_url = None
+    if not args.no_mock and not args.url:
+        port = _free_port()
+        mock_flags = [
+            "--latency-ms", args.mock_latency_ms, "--latency-sigma", args.mock_latency_sigma,
+            "--per-input-ms", args.mock_per_input_ms, "--error-rate", args.mock_error_rate,
+            "--rate-limit-rate", args.mock_rate_limit_rate, "--retry-after", args.mock_retry_after,
+            "--rpm", args.mock_rpm,
+        ] + (["--seed", args.mock_seed] if args.mock_seed is not None else [])
+        procs.append(subprocess.Popen(
+            [sys.executable, "-m", "scripts.mock_openai", "--port", str(port), *map(str, mock_flags)], cwd=_ROOT,
+        ))
+        mock_url = f"http://127.0.0.1:{port}"
+        _wait_ready(f"{mock_url}/stats", procs[-1])
+        env.update({
+            "OPENAI_API_KEY": "sk-mock-load-test",
+            "OPENAI_BASE_URL": f"{mock_url}/v1",
+            "VECTOR_BACKEND": "openai",
+        })
+    if args.url:
+        return args.url.rstrip("/"), mock_url, procs
+
+    port = _free_port()
+    procs.append(subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(args.app_workers), "--log-level", "warning",
+        ],
+        cwd=_ROOT,
+        env=env,
+    ))
+    app_url = f"http://127.0.0.1:{port}"
+    _wait_ready(f"{app_url}/health", procs[-1])
+    return app_url, mock_url, procs
+
+
+class _Recorder:
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.statuses: dict[str, Counter] = defaultdict(Counter)
+        self.flags: dict[str, Counter] = defaultdict(Counter)
+        self.texts: Counter = Counter()
+
+    def record(self, endpoint: str, seconds: float, status: int, metas: list[dict], n_texts: int) -> None:
+        self.latencies[endpoint].append(seconds)
+        self.statuses[endpoint][status] += 1
+        if status == 200:
+            self.texts[endpoint] += n_texts
+        for meta in metas:
+            self.flags[endpoint]["items"] += 1
+            for key in ("embeddings_used", "degraded", "deadline_exceeded"):
+                if meta.get(key):
+                    self.flags[endpoint][key] += 1
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return float("nan")
+    # nearest-rank
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+async def _drive(args: argparse.Namespace, base_url: str, texts: list[str]) -> tuple[_Recorder, float]:
+    recorder = _Recorder()
+    rng = random.Random(args.seed)
+    endpoints = list(args.mix)
+    weights = [args.mix[name] for name in endpoints]
+    params = {}
+    if args.embeddings != "auto":
+        params["embeddings"] = args.embeddings == "on"
+    if args.timeout_ms:
+        params["timeout_ms"] = args.timeout_ms
+    batch_params = {**params, **({"engine": args.engine} if args.engine else {})}
+
+    def pick_text() -> str:
+        text = rng.choice(texts)
+        return f"{text} [{uuid.uuid4().hex}]" if rng.random() < args.unique else text
+
+    issued = 0
+    stop_at = time.monotonic() + args.duration
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.request_timeout, limits=limits) as client:
+
+        async def worker() -> None:
+            nonlocal issued
+            while time.monotonic() < stop_at and (not args.requests or issued < args.requests):
+                issued += 1
+                endpoint = rng.choices(endpoints, weights)[0]
+                if endpoint == "analyze":
+                    n = 1
+                    request = client.post("/analyze", params=params, json={"text": pick_text()})
+                else:
+                    n = args.batch_size
+                    items = [{"id": str(i), "text": pick_text()} for i in range(n)]
+                    request = client.post("/analyze/batch", params=batch_params, json={"items": items})
+                start = time.perf_counter()
+                try:
+                    response = await request
+                    status = response.status_code
+                except httpx.HTTPError:
+                    status = 0  # connection error or client timeout
+                    response = None
+                elapsed = time.perf_counter() - start
+                metas = []
+                if response is not None and status == 200:
+                    body = response.json()
+                    metas = [body["meta"]] if endpoint == "analyze" else [i["result"]["meta"] for i in body["items"]]
+                recorder.record(endpoint, elapsed, status, metas, n)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        return recorder, time.perf_counter() - started
+
+
+def _report(recorder: _Recorder, wall: float) -> dict:
+    report = {"wall_seconds": round(wall, 2), "endpoints": {}}
+    all_latencies: list[float] = []
+    total_statuses: Counter = Counter()
+    for endpoint, latencies in recorder.latencies.items():
+        values = sorted(latencies)
+        all_latencies += values
+        statuses = recorder.statuses[endpoint]
+        total_statuses += statuses
+        flags = recorder.flags[endpoint]
+        items = flags["items"] or 1
+        report["endpoints"][endpoint] = {
+            "requests": len(values),
+            "throughput_rps": round(len(values) / wall, 1),
+            "texts_per_second": round(recorder.texts[endpoint] / wall, 1),
+            "p50_ms": round(_percentile(values, 50) * 1000, 1),
+            "p95_ms": round(_percentile(values, 95) * 1000, 1),
+            "p99_ms": round(_percentile(values, 99) * 1000, 1),
+            "max_ms": round(values[-1] * 1000, 1) if values else None,
+            "error_rate": round(1 - statuses[200] / len(values), 4) if values else 0.0,
+            "statuses": {str(k): v for k, v in sorted(statuses.items())},
+            "embeddings_used_rate": round(flags["embeddings_used"] / items, 4),
+            "degraded_rate": round(flags["degraded"] / items, 4),
+            "deadline_exceeded_rate": round(flags["deadline_exceeded"] / items, 4),
+        }
+    values = sorted(all_latencies)
+    report["overall"] = {
+        "requests": len(values),
+        "throughput_rps": round(len(values) / wall, 1),
+        "p50_ms": round(_percentile(values, 50) * 1000, 1),
+        "p95_ms": round(_percentile(values, 95) * 1000, 1),
+        "p99_ms": round(_percentile(values, 99) * 1000, 1),
+        "error_rate": round(1 - total_statuses[200] / len(values), 4) if values else 0.0,
+    }
+    return report
+
+
+def _print_report(report: dict) -> None:
+    print(f"{'endpoint':<10} {'reqs':>7} {'req/s':>8} {'texts/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'errors':>7} {'emb':>6} {'degr':>6} {'late':>6}")
+    for endpoint, r in report["endpoints"].items():
+        print(
+            f"{endpoint:<10} {r['requests']:>7} {r['throughput_rps']:>8} {r['texts_per_second']:>8} "
+            f"{r['p50_ms']:>8} {r['p95_ms']:>8} {r['p99_ms']:>8} {r['error_rate']:>7.2%} "
+            f"{r['embeddings_used_rate']:>6.0%} {r['degraded_rate']:>6.0%} {r['deadline_exceeded_rate']:>6.0%}"
+        )
+        print(f"{'':<10} statuses: {r['statuses']}")
+    o = report["overall"]
+    print(
+        f"{'overall':<10} {o['requests']:>7} {o['throughput_rps']:>8} {'':>8} "
+        f"{o['p50_ms']:>8} {o['p95_ms']:>8} {o['p99_ms']:>8} {o['error_rate']:>7.2%}"
+    )
+    if "mock" in report:
+        print(f"mock OpenAI: {report['mock']}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="target an already running app instead of starting one")
+    parser.add_argument("--no-mock", action="store_true", help="use the real OpenAI API from the environment")
+    parser.add_argument("--app-workers", type=int, default=1, help="Uvicorn workers for the started app")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds to run")
+    parser.add_argument("--requests", type=int, default=0, help="stop after this many requests (0 = no limit)")
+    parser.add_argument("--mix", type=_parse_mix, default=_parse_mix("analyze=3,batch=1"))
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--embeddings", choices=("on", "off", "auto"), default="on")
+    parser.add_argument("--timeout-ms", type=int, default=0, help="per-request embedding deadline (0 = none)")
+    parser.add_argument("--engine", choices=("python", "vectorized"), default=None, help="batch engine")
+    parser.add_argument("--unique", type=float, default=0.0, help="fraction of texts made unique (cache misses)")
+    parser.add_argument("--request-timeout", type=float, default=60.0, help="client timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, help="also write the report to this file")
+    add_mock_arguments(parser, prefix="mock-")
+    args = parser.parse_args()
+
+    texts = _load_texts()
+    base_url, mock_url, procs = _start_servers(args)
+    try:
+        print(f"Load test: {base_url} concurrency={args.concurrency} mix={args.mix} duration={args.duration}s")
+        recorder, wall = asyncio.run(_drive(args, base_url, texts))
+        report = _report(recorder, wall)
+        if mock_url:
+            report["mock"] = httpx.get(f"{mock_url}/stats").json()
+    finally:
+        for proc in reversed(procs):
+            proc.terminate()
+        for proc in procs:
+            proc.wait(timeout=10)
+
+    _print_report(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,174 @@
+"""
+Local stand-in for the OpenAI embeddings endpoint, for offline load tests.
+
+Serves `POST /v1/embeddings` with deterministic unit vectors derived from a
+hash of each input (same text, same vector, every run), in either `float` or
+`base64` encoding. Latency, server errors and rate limiting are configurable:
+
+- `--latency-ms` / `--latency-sigma`: median latency and lognormal spread
+  (sigma 0 = fixed), plus `--per-input-ms` per input in the request
+- `--error-rate`: fraction of requests answered with a 500
+- `--rate-limit-rate`: fraction of requests answered with a 429 and
+  `retry-after: --retry-after`
+- `--rpm`: requests per minute before 429s; every response carries
+  `x-ratelimit-*-requests` headers for that budget
+
+`GET /stats` reports request, input and error counts. Point the app at it with
+`OPENAI_BASE_URL=http://127.0.0.1:<port>/v1` and any `sk-` key.
+
+Usage:
+    python -m scripts.mock_openai [--port 8100] [--latency-ms 80 --latency-sigma 0.4] [--rate-limit-rate 0.02]
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import math
+import random
+import struct
+import time
+from typing import Any
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+_NATIVE_DIMENSIONS = 1536
+
+
+def mock_vector(text: str, dimensions: int = _NATIVE_DIMENSIONS) -> list[float]:
+    """Deterministic unit vector for `text`."""
+    seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+    if np is not None:
+        v = np.random.default_rng(seed).standard_normal(dimensions)
+        return (v / np.linalg.norm(v)).tolist()
+    rng = random.Random(seed)
+    v = [rng.gauss(0.0, 1.0) for _ in range(dimensions)]
+    norm = math.sqrt(sum(x * x for x in v)) or 1.0
+    return [x / norm for x in v]
+
+
+def _encode(vector: list[float], encoding_format: str) -> Any:
+    if encoding_format == "base64":
+        return base64.b64encode(struct.pack(f"<{len(vector)}f", *vector)).decode("ascii")
+    return vector
+
+
+def create_app(
+    latency_ms: float = 0.0,
+    latency_sigma: float = 0.0,
+    per_input_ms: float = 0.0,
+    error_rate: float = 0.0,
+    rate_limit_rate: float = 0.0,
+    retry_after: float = 1.0,
+    rpm: int = 0,
+    seed: int | None = None,
+) -> FastAPI:
+    app = FastAPI(title="Mock OpenAI embeddings")
+    rng = random.Random(seed)
+    stats = {"requests": 0, "inputs": 0, "errors": 0, "rate_limited": 0}
+    window = {"start": time.monotonic(), "used": 0}
+
+    def _limit_headers() -> dict[str, str]:
+        if not rpm:
+            return {}
+        reset = max(0.0, 60.0 - (time.monotonic() - window["start"]))
+        return {
+            "x-ratelimit-limit-requests": str(rpm),
+            "x-ratelimit-remaining-requests": str(max(0, rpm - window["used"])),
+            "x-ratelimit-reset-requests": f"{reset:.3f}s",
+        }
+
+    def _error(status: int, message: str, kind: str, headers: dict[str, str]) -> JSONResponse:
+        return JSONResponse(
+            status_code=status, content={"error": {"message": message, "type": kind, "code": None}}, headers=headers
+        )
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body.get("input")
+        inputs = [inputs] if isinstance(inputs, str) else list(inputs or [])
+        stats["requests"] += 1
+
+        now = time.monotonic()
+        if now - window["start"] >= 60.0:
+            window["start"], window["used"] = now, 0
+        window["used"] += 1
+        headers = _limit_headers()
+        if (rpm and window["used"] > rpm) or rng.random() < rate_limit_rate:
+            stats["rate_limited"] += 1
+            wait = max(0.0, 60.0 - (now - window["start"])) if rpm and window["used"] > rpm else retry_after
+            return _error(429, "Rate limit reached (mock)", "requests", {**headers, "retry-after": f"{wait:.3f}"})
+
+        delay = latency_ms * (math.exp(rng.gauss(0.0, latency_sigma)) if latency_sigma > 0 else 1.0)
+        await asyncio.sleep((delay + per_input_ms * len(inputs)) / 1000)
+        if rng.random() < error_rate:
+            stats["errors"] += 1
+            return _error(500, "Internal error (mock)", "server_error", headers)
+
+        stats["inputs"] += len(inputs)
+        dimensions = int(body.get("dimensions") or _NATIVE_DIMENSIONS)
+        encoding_format = body.get("encoding_format") or "float"
+        tokens = sum(len(text) for text in inputs) // 4 + 1
+        return JSONResponse(
+            {
+                "object": "list",
+                "data": [
+                    {"object": "embedding", "index": i, "embedding": _encode(mock_vector(text, dimensions), encoding_format)}
+                    for i, text in enumerate(inputs)
+                ],
+                "model": body.get("model", "text-embedding-3-small"),
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            },
+            headers=headers,
+        )
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser, prefix: str = "") -> None:
+    """Mock behaviour flags, shared with the load-test harness (which prefixes them with `mock-`)."""
+    parser.add_argument(f"--{prefix}latency-ms", type=float, default=50.0, help="median latency per request")
+    parser.add_argument(f"--{prefix}latency-sigma", type=float, default=0.3, help="lognormal sigma (0 = fixed)")
+    parser.add_argument(f"--{prefix}per-input-ms", type=float, default=0.2, help="extra latency per input")
+    parser.add_argument(f"--{prefix}error-rate", type=float, default=0.0, help="fraction of 500 responses")
+    parser.add_argument(f"--{prefix}rate-limit-rate", type=float, default=0.0, help="fraction of random 429s")
+    parser.add_argument(f"--{prefix}retry-after", type=float, default=1.0, help="retry-after on random 429s")
+    parser.add_argument(f"--{prefix}rpm", type=int, default=0, help="requests per minute budget (0 = unlimited)")
+    parser.add_argument(f"--{prefix}seed", type=int, default=None, help="seed for latency/error sampling")
+
+
+def main() -> int:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    add_arguments(parser)
+    args = parser.parse_args()
+    app = create_app(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        per_input_ms=args.per_input_ms,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        rpm=args.rpm,
+        seed=args.seed,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,107 @@
+"""
+Accuracy-vs-size report for reduced-dimension and quantized embeddings.
+
+Embeds the seed set and data/ml_benchmark_examples.json once at full size,
+then for each (dimensions, dtype) variant rebuilds the centroids from the
+stored seed vectors and rescores the benchmark directly on the quantized
+vectors. Shortened vectors are produced the way text-embedding-3 does it for
+the `dimensions` parameter: truncate, then L2-normalize. Drift is reported
+against the full-size float32 scores.
+
+Usage:
+    python -m scripts.quantization_report [--backend openai|local] [--dims 1536,512,256]
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+load_dotenv()
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from app.ml.backends import get_backend
+from app.ml.store import cosine_quantized, dequantize, quantize
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+
+def _load(name: str) -> list[dict]:
+    with (DATA_DIR / name).open(encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _shorten(vectors: np.ndarray, dims: int) -> np.ndarray:
+    cut = vectors[:, :dims]
+    norms = np.linalg.norm(cut, axis=1, keepdims=True)
+    return cut / np.where(norms == 0, 1, norms)
+
+
+def _store(vectors: np.ndarray, dtype: str) -> list[tuple[np.ndarray, float]]:
+    if dtype == "float32":
+        return [(v.astype(np.float32), 1.0) for v in vectors]
+    return [quantize(v, dtype) for v in vectors]
+
+
+def _scores(seed_vecs, labels, bench_vecs) -> list[float]:
+    seeds = [np.asarray(dequantize(*s), dtype=np.float32) for s in seed_vecs]
+    bait = np.mean([v for v, lab in zip(seeds, labels) if lab == "bait"], axis=0)
+    neutral = np.mean([v for v, lab in zip(seeds, labels) if lab == "neutral"], axis=0)
+    out = []
+    for values, _scale in bench_vecs:
+        diff = cosine_quantized(values, bait) - cosine_quantized(values, neutral)
+        out.append(max(0.0, min(1.0, (diff + 1) / 2)))
+    return out
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    default_backend = "openai" if os.environ.get("OPENAI_API_KEY", "").startswith("sk-") else "local"
+    parser.add_argument("--backend", choices=("openai", "local"), default=default_backend)
+    parser.add_argument("--dims", default="1536,512,256", help="comma-separated (openai only)")
+    args = parser.parse_args()
+
+    backend = get_backend(args.backend)
+    if args.backend == "openai":
+        os.environ.pop("EMBEDDING_DIMENSIONS", None)  # embed at full size, shorten locally
+    seeds = [ex for ex in _load("seed_examples.json") if ex.get("label") in ("bait", "neutral")]
+    bench = _load("ml_benchmark_examples.json")
+
+    embedded = backend.embed_many([ex["text"] for ex in seeds + bench])
+    if any(v is None for v in embedded):
+        print(f"Backend {args.backend} could not embed the examples.")
+        return 1
+    full = np.asarray(embedded, dtype=np.float32)
+    full_seed, full_bench = full[: len(seeds)], full[len(seeds):]
+    labels = [ex["label"] for ex in seeds]
+    dims_list = [int(d) for d in args.dims.split(",")] if args.backend == "openai" else [full.shape[1]]
+
+    baseline = _scores(_store(full_seed, "float32"), labels, _store(full_bench, "float32"))
+    print(f"Quantization report ({args.backend}, {len(bench)} benchmark examples)")
+    print("-" * 84)
+    print(f"{'dims':>5} {'dtype':>8} {'bytes/vec':>10} {'vs list':>8} {'max |d|':>9} {'mean |d|':>9} {'separated':>10}")
+    for dims in dims_list:
+        seed_d, bench_d = _shorten(full_seed, dims), _shorten(full_bench, dims)
+        for dtype in ("float32", "float16", "int8"):
+            scores = _scores(_store(seed_d, dtype), labels, _store(bench_d, dtype))
+            drift = [abs(a - b) for a, b in zip(scores, baseline)]
+            itemsize = {"float32": 4, "float16": 2, "int8": 1}[dtype]
+            size = dims * itemsize + (4 if dtype == "int8" else 0)
+            list_size = sys.getsizeof([0.0] * dims) + dims * 24  # list of Python floats
+            bait = [s for s, ex in zip(scores, bench) if ex["label"] == "bait"]
+            neutral = [s for s, ex in zip(scores, bench) if ex["label"] == "neutral"]
+            separated = min(bait) > max(neutral) if bait and neutral else "n/a"
+            print(
+                f"{dims:>5} {dtype:>8} {size:>10} {list_size / size:>7.0f}x "
+                f"{max(drift):>9.4f} {sum(drift) / len(drift):>9.4f} {str(separated):>10}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
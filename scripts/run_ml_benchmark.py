@@ -1,13 +1,27 @@
 """
-Run the held-out ML benchmark against the live OpenAI scoring path.
+Run the held-out ML benchmark against the OpenAI scoring path, live or replayed.
+
+Modes:
+- live (default): embed through the OpenAI API; needs `OPENAI_API_KEY`
+- `--record`: embed the seed and benchmark texts once and save them to the
+  fixture file (`--fixture`, default `data/embeddings_fixture.bin`)
+- `--replay`: score entirely from the fixture, with no network and no key
+
+Replay prints per-example scores, the separation between bait and neutral
+examples, and how long the heuristic and vector paths take per text.
+`--min-separation` makes it exit non-zero below a threshold, for CI.
 
 Usage:
     python -m scripts.run_ml_benchmark
+    python -m scripts.run_ml_benchmark --record
+    python -m scripts.run_ml_benchmark --replay [--rounds 50] [--min-separation 0.05]
 """
 
+import argparse
 import json
 import os
 import sys
+import time
 from pathlib import Path
 
 # Load environment variables from .env file
@@ -17,7 +31,10 @@ load_dotenv()
 # Add project root to path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
-from app.analyzers import analyze_text
+from app.analyzers import analyze_batch, analyze_text
+
+_DATA = Path(__file__).resolve().parent.parent / "data"
+_DEFAULT_FIXTURE = _DATA / "embeddings_fixture.bin"
 
 
 def _require_openai_key() -> str:
@@ -25,14 +42,15 @@ def _require_openai_key() -> str:
     if not key.startswith("sk-"):
         print(
             "OPENAI_API_KEY is not set or invalid. "
-            "Live benchmark evaluation requires a valid OpenAI key."
+            "Live benchmark evaluation and --record require a valid OpenAI key; "
+            "use --replay to score from recorded embeddings."
         )
         raise SystemExit(1)
     return key
 
 
 def _load_benchmark() -> list[dict[str, str]]:
-    path = Path(__file__).resolve().parent.parent / "data" / "ml_benchmark_examples.json"
+    path = _DATA / "ml_benchmark_examples.json"
     if not path.exists():
         print(f"Benchmark file not found: {path}")
         raise SystemExit(1)
@@ -40,6 +58,11 @@ def _load_benchmark() -> list[dict[str, str]]:
         return json.load(f)
 
 
+def _load_seed_texts() -> list[str]:
+    with (_DATA / "seed_examples.json").open(encoding="utf-8") as f:
+        return [ex.get("text", "") for ex in json.load(f)]
+
+
 def _score_summary(result) -> str:
     return (
         f"urgency={result.urgency_pressure.score:.2f} | "
@@ -50,9 +73,8 @@ def _score_summary(result) -> str:
     )
 
 
-def main() -> int:
+def _live(benchmark: list[dict[str, str]]) -> int:
     _require_openai_key()
-    benchmark = _load_benchmark()
 
     print("Engagement Bait API Embeddings Benchmark")
     print(f"Examples: {len(benchmark)}")
@@ -80,5 +102,96 @@ def main() -> int:
     return 0
 
 
+def _record(benchmark: list[dict[str, str]], fixture: Path) -> int:
+    from app.ml.backends import get_backend
+    from app.ml.embeddings import EMBEDDING_MODEL, requested_dimensions
+    from app.ml.recorded import write_fixture
+
+    _require_openai_key()
+    texts = _load_seed_texts() + [item["text"] for item in benchmark]
+    count = write_fixture(fixture, texts, get_backend("openai").embed_many, EMBEDDING_MODEL, requested_dimensions())
+    print(f"Recorded {count} embeddings to {fixture} ({fixture.stat().st_size / 1024:.0f} KiB)")
+    return 0
+
+
+def _mean(values: list[float]) -> float:
+    return sum(values) / len(values) if values else float("nan")
+
+
+def _per_text_us(fn, n_texts: int, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / (rounds * n_texts) * 1e6
+
+
+def _replay(benchmark: list[dict[str, str]], fixture: Path, rounds: int, min_separation: float | None) -> int:
+    from app.ml.backends import register_backend
+    from app.ml.recorded import RecordedBackend
+    from app.ml.scorer import compute_engagement_bait_results
+
+    if not fixture.exists():
+        print(f"Fixture not found: {fixture}. Record one with --record first.")
+        return 1
+    backend = RecordedBackend(fixture)
+    register_backend(backend)
+    texts = [item["text"] for item in benchmark]
+
+    start = time.perf_counter()
+    scored = compute_engagement_bait_results(texts, backend.name)  # builds the centroids once
+    centroid_ms = (time.perf_counter() - start) * 1000
+    if backend.misses:
+        print(f"{backend.misses} texts are missing from {fixture}; re-record it after changing the data files.")
+        return 1
+    heuristics = analyze_batch(texts, ml=False)
+
+    print("Engagement Bait API Embeddings Benchmark (replay)")
+    print(f"Examples: {len(benchmark)} | fixture: {fixture.name} ({len(backend)} vectors, {backend.model})")
+    print("-" * 72)
+    by_label: dict[str, list[float]] = {}
+    for item, (score, _name), result in zip(benchmark, scored, heuristics):
+        by_label.setdefault(item["label"], []).append(score)
+        print(f"{item['id']} [{item['label']}] embeddings={score:.3f} expected={item['expected_ml_behavior']}")
+        print(f"  {_score_summary(result)}")
+    print("-" * 72)
+
+    bait, neutral = by_label.get("bait", []), by_label.get("neutral", [])
+    separation = _mean(bait) - _mean(neutral)
+    pairs = [(b, n) for b in bait for n in neutral]
+    ordered = sum(1.0 if b > n else 0.5 if b == n else 0.0 for b, n in pairs) / len(pairs) if pairs else float("nan")
+    for label, scores in sorted(by_label.items()):
+        print(f"mean score [{label}]: {_mean(scores):.3f} (n={len(scores)})")
+    print(f"separation (bait - neutral): {separation:+.3f}")
+    print(f"bait ranked above neutral: {ordered:.0%} of {len(pairs)} pairs")
+
+    heuristic_us = _per_text_us(lambda: analyze_batch(texts, ml=False), len(texts), rounds)
+    vector_us = _per_text_us(lambda: compute_engagement_bait_results(texts, backend.name), len(texts), rounds)
+    print(f"centroid build: {centroid_ms:.1f} ms")
+    print(f"heuristic path: {heuristic_us:.0f} us/text | vector path: {vector_us:.0f} us/text ({rounds} rounds)")
+
+    if min_separation is not None and not separation >= min_separation:
+        print(f"FAIL: separation {separation:+.3f} is below --min-separation {min_separation:+.3f}")
+        return 1
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--record", action="store_true", help="save embeddings for the seed and benchmark texts")
+    mode.add_argument("--replay", action="store_true", help="score from the fixture, offline")
+    parser.add_argument("--fixture", type=Path, default=_DEFAULT_FIXTURE)
+    parser.add_argument("--rounds", type=int, default=20, help="timing rounds in replay mode")
+    parser.add_argument("--min-separation", type=float, default=None, help="replay: exit 1 below this separation")
+    args = parser.parse_args()
+
+    benchmark = _load_benchmark()
+    if args.record:
+        return _record(benchmark, args.fixture)
+    if args.replay:
+        return _replay(benchmark, args.fixture, args.rounds, args.min_separation)
+    return _live(benchmark)
+
+
 if __name__ == "__main__":
     raise SystemExit(main())
@@ -0,0 +1,96 @@
+"""
+Score a JSONL file of texts offline, without the HTTP layer.
+
+Each input line is a JSON object with `text` and an optional `id` (defaults to
+the line number). Each output line is `{"id": ..., "result": {...}}` in the
+same shape as the `/analyze/batch` items.
+
+Parquet and Arrow IPC inputs (`.parquet`, `.arrow`, `.feather`) are scored
+column-wise into a Parquet output with one flat column per metric and breakdown
+value, on a pool of `--workers` processes (see `app/arrow_io.py`; needs
+`pyarrow`).
+
+Usage:
+    python -m scripts.score_offline input.jsonl output.jsonl [--engine vectorized]
+    python -m scripts.score_offline input.parquet output.parquet --text-column body --id-column post_id
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Iterator
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import arrow_io
+from app.analyzers import analyze_batch
+from app.serialization import dumps
+
+
+def _read_batches(path: Path, batch_size: int) -> Iterator[list[tuple[str, str]]]:
+    batch: list[tuple[str, str]] = []
+    with path.open(encoding="utf-8") as f:
+        for lineno, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            batch.append((str(record.get("id", lineno)), record["text"]))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def _score_jsonl(input_path: Path, output_path: Path, batch_size: int, ml: bool, engine: str) -> int:
+    count = 0
+    with output_path.open("wb") as out:
+        for batch in _read_batches(input_path, batch_size):
+            results = analyze_batch([text for _, text in batch], ml=ml, engine=engine)
+            for (item_id, _), result in zip(batch, results):
+                out.write(dumps({"id": item_id, "result": result.to_payload()}))
+                out.write(b"\n")
+            count += len(batch)
+    return count
+
+
+_COLUMNAR_SUFFIXES = (".parquet", ".pq", ".arrow", ".feather", ".ipc", ".arrows")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input", type=Path)
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--engine", choices=("python", "vectorized"), default="vectorized")
+    parser.add_argument("--batch-size", type=int, default=None, help="rows per batch (default: 1000, 10000 for Parquet)")
+    parser.add_argument("--embeddings", action="store_true", help="also compute engagement_bait_score")
+    parser.add_argument("--text-column", default="text", help="Parquet/Arrow: column holding the texts")
+    parser.add_argument("--id-column", default=None, help="Parquet/Arrow: column copied to the output as the row id")
+    parser.add_argument("--workers", type=int, default=None, help="Parquet/Arrow: scoring processes (default: one per CPU, 0 = inline)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.input.suffix.lower() in _COLUMNAR_SUFFIXES:
+        if not arrow_io.available():
+            parser.error("Parquet/Arrow input needs the pyarrow package")
+        count = arrow_io.score_file(
+            args.input,
+            args.output,
+            text_column=args.text_column,
+            id_column=args.id_column,
+            ml=args.embeddings,
+            engine=args.engine,
+            batch_size=args.batch_size or 10_000,
+            workers=args.workers,
+        )
+    else:
+        count = _score_jsonl(args.input, args.output, args.batch_size or 1000, args.embeddings, args.engine)
+    elapsed = time.perf_counter() - start
+    print(f"Scored {count} texts in {elapsed:.2f}s ({count / max(elapsed, 1e-9):.1f} texts/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,3 +1,8 @@
+import time
+from pathlib import Path
+
+import pytest
+
 from app.analyzers.urgency import analyze_urgency
 from app.analyzers.evidence import analyze_evidence
 from app.analyzers.arousal import analyze_arousal
@@ -69,3 +74,231 @@ def test_claim_volume():
     neutral = "The weather is nice. The meeting was productive. We will discuss later."
     r2 = analyze_claim_volume(neutral)
     assert r.score >= r2.score
+
+
+def test_analysis_result_row_roundtrip():
+    from app.analyzers import analyze_text
+    from app.analyzers.result import COLUMNS, AnalysisResult
+
+    t = "Act now! Limited time! Everyone knows the truth and they are lying to you. Don't miss out on this shocking reveal!"
+    r = analyze_text(t, ml=False)
+    row = r.to_row()
+    assert len(row) == len(COLUMNS)
+    assert row[COLUMNS.index("urgency_pressure.score")] == r.urgency_pressure.score
+    restored = AnalysisResult.from_row(row, r.meta)
+    assert restored.to_payload() == r.to_payload()
+    assert restored.engagement_bait_score is None
+
+
+def test_analysis_result_payload_matches_response_model():
+    from app.analyzers import analyze_text
+
+    t = "A review of 38 climate adaptation studies found modest benefits for coastal planning, although authors noted significant variation."
+    r = analyze_text(t, ml=False)
+    assert r.to_payload() == r.to_response().model_dump()
+
+
+def test_vectorized_engine_matches_per_text():
+    from app.analyzers import analyze_batch
+
+    pytest.importorskip("numpy")
+    texts = [
+        "You won't believe this! The BEST and MOST incredible thing! EVIL! Terrifying! Outrageous! We must fight!",
+        "I am not angry, just very furious and extremely disgusted. Slightly worried, kind of afraid, never evil.",
+        "This approach may help in some cases, although the tradeoffs depend on cost. However, on the other hand, if it works...",
+        "not very angry. barely furious! NOT evil, absolutely the worst; however however however.",
+        "Act now, limited time only! Don't act now. Only 3 left, not selling out fast — everyone is joining. " * 6,
+        "",
+    ]
+    expected = [r.to_payload() for r in analyze_batch(texts, ml=False)]
+    assert [r.to_payload() for r in analyze_batch(texts, ml=False, engine="vectorized")] == expected
+    # a second pass reuses the already interned vocabulary
+    assert [r.to_payload() for r in analyze_batch(texts[::-1], ml=False, engine="vectorized")] == expected[::-1]
+
+
+def test_phrase_negation_matches_window_scan():
+    from app.analyzers.base import PhraseNegation, is_phrase_negated
+
+    text = "you don't need to act now. nothing here is urgent, notably act now and hurry"
+    negation = PhraseNegation(text)
+    for i in range(len(text) + 1):
+        assert negation(i) == is_phrase_negated(text, i)
+    # words are scanned lazily, so out-of-order queries must agree too
+    negation = PhraseNegation(text)
+    for i in [40, 3, len(text), 0, 27, 12]:
+        assert negation(i) == is_phrase_negated(text, i)
+
+
+def test_saturated_counters_stop_early_with_identical_scores():
+    from app.analyzers import analyze_batch, urgency, vectorized
+    from app.analyzers.base import PhraseNegation, count_to_score, saturation
+    from app.lexicons import get_lexicons
+
+    bait = "Act now, last chance! Hurry, only 3 left. Don't miss out. SHOCKING evil lies, the worst ever. "
+    text = bait * 500 + "A calm ending without any pressure at all, noted the report."
+    t = text.lower()
+    phrases = get_lexicons().urgency_time
+    full = urgency._count_phrases(t, phrases, PhraseNegation(t))
+    capped = urgency._count_phrases(t, phrases, PhraseNegation(t), saturation(urgency._TIME_THRESHOLDS))
+    assert capped == saturation(urgency._TIME_THRESHOLDS) < full
+    assert count_to_score(capped, urgency._TIME_THRESHOLDS) == count_to_score(full, urgency._TIME_THRESHOLDS)
+
+    texts = [text, bait * 3, text.replace("SHOCKING", "not shocking")]
+    expected = [r.to_payload() for r in analyze_batch(texts, ml=False)]
+    if vectorized.available():
+        # the vectorized engine always counts every token
+        assert [r.to_payload() for r in analyze_batch(texts, ml=False, engine="vectorized")] == expected
+
+
+def test_shared_result_cache_is_shared_across_processes(tmp_path, monkeypatch):
+    import subprocess
+    import sys
+
+    from app import cache
+    from app.analyzers import analyze_batch
+
+    monkeypatch.setenv("SHARED_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(cache, "_cache", None)
+    texts = [
+        "Act now. This is your last chance. Everyone knows they are lying and you must share this immediately.",
+        "A review of three transit funding proposals found ridership increased 12 to 18 percent in pilot cities.",
+    ]
+    fresh = [r.to_payload() for r in analyze_batch(texts, ml=False)]
+    shared = cache.get_result_cache()
+    assert shared.stats() == {"hits": 0, "misses": 2}
+    assert [r.to_payload() for r in analyze_batch(texts, ml=False, engine="vectorized")] == fresh
+    assert shared.stats() == {"hits": 2, "misses": 2}
+
+    # another worker process reads the rows this one wrote
+    probe = (
+        "import sys; from app.cache import get_result_cache, result_key; "
+        "from app.lexicons import get_lexicons; v = get_lexicons().version; "
+        "print(len(get_result_cache().get_many([result_key(t, v) for t in sys.argv[1:]])))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", probe, *texts], capture_output=True, text=True, check=True,
+        cwd=Path(__file__).resolve().parent.parent,
+    )
+    assert out.stdout.strip() == "2"
+
+
+def test_shared_result_cache_evicts_least_recently_used(tmp_path):
+    from app.analyzers import analyze_text
+    from app.cache import ResultCache
+
+    metrics = analyze_text("Plain words about nothing in particular, repeated for length. " * 2, ml=False).metrics
+    store = ResultCache(tmp_path / "results.sqlite3", max_entries=100)
+    store.put_many([(i.to_bytes(16, "little"), metrics) for i in range(900)])
+    time.sleep(0.01)
+    store.put_many([(i.to_bytes(16, "little"), metrics) for i in range(900, 1000)])
+    assert len(store) <= 100
+    assert store.get_many([(999).to_bytes(16, "little")])
+    assert not store.get_many([(0).to_bytes(16, "little")])
+
+
+def test_unopenable_result_cache_falls_back_to_no_cache(tmp_path, monkeypatch):
+    from app import cache
+    from app.analyzers import analyze_batch
+
+    (tmp_path / "results.sqlite3").mkdir()  # not a database SQLite can open
+    monkeypatch.setenv("SHARED_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(cache, "_cache", None)
+    monkeypatch.setattr(cache, "_cache_failed", None)
+    assert cache.get_result_cache() is None
+    text = "Plain words about nothing in particular, repeated for length. " * 2
+    assert analyze_batch([text], ml=False)[0].to_payload()["lexical_diversity"]
+
+
+def test_lexicon_reload_swaps_bundle_atomically(tmp_path, monkeypatch):
+    import shutil
+
+    from app.analyzers import analyze_batch, vectorized
+    from app.cache import result_key
+    from app.lexicons import bundle
+
+    lexicons = tmp_path / "lexicons"
+    shutil.copytree(bundle._LEXICON_DIR, lexicons)
+    monkeypatch.setenv("LEXICON_DIR", str(lexicons))
+    monkeypatch.setattr(bundle, "_current", None)
+    monkeypatch.setattr(vectorized, "_vocab", None)
+    text = "The zorbulous plan is here and nobody saw it coming. Read the full details below before deciding."
+
+    old = bundle.get_lexicons()
+    assert bundle.reload_lexicons() == (old, False)
+    before = analyze_batch([text], ml=False)[0]
+    assert before.meta.lexicon_version == old.version
+
+    with open(lexicons / "arousal.txt", "a", encoding="utf-8") as f:
+        f.write("\nzorbulous:3\n")
+    new, changed = bundle.reload_lexicons()
+    assert changed and new.version != old.version
+    assert bundle.get_lexicons() is new
+    with pytest.raises(AttributeError):
+        new.version = "x"
+
+    after = analyze_batch([text], ml=False)
+    assert after[0].meta.lexicon_version == new.version
+    assert after[0].arousal_intensity.score > before.arousal_intensity.score
+    pytest.importorskip("numpy")
+    assert [r.to_payload() for r in analyze_batch([text], ml=False, engine="vectorized")] == [after[0].to_payload()]
+    # a request holding the old bundle still scores with it
+    expected = before.arousal_intensity.breakdown
+    assert analyze_arousal(text, old).breakdown == expected
+    assert vectorized.lexicon_metrics([text], old)[0][0].breakdown == expected
+    assert result_key(text, old.version) != result_key(text, new.version)
+
+
+def test_number_patterns_match_like_the_plain_regexes():
+    import itertools
+    import random
+    import re
+
+    from app.analyzers import claim_volume, evidence
+
+    grouped = evidence._GROUPED_START
+    plain = {
+        r"\d(?<!\d\d)\d*\s*%\s*(?:of|from)": r"\d+\s*%\s*(?:of|from)",
+        r"\d(?<!\d\d)\d*(?:\.\d*)?\s*%": r"\d+\.?\d*\s*%",
+        grouped + r"\d{0,2}(?:,\d{3})*(?:\.\d+)?\s*(?:people|users|studies|percent)": (
+            r"\d{1,3}(?:,\d{3})*(?:\.\d+)?\s*(?:people|users|studies|percent)"
+        ),
+        grouped + r"\d{0,2}(?:,\d{3})*(?:\.\d+)?\s+(?:participants|patients|respondents|trials?)": (
+            r"\d{1,3}(?:,\d{3})*(?:\.\d+)?\s+(?:participants|patients|respondents|trials?)"
+        ),
+        r"\d(?<!\d\d)\d*\s*(?:million|billion|thousand)": r"\d+\s*(?:million|billion|thousand)",
+        r"\d(?<!\d\d)\d*\s+(?:reasons|ways|things|tips|secrets|facts|signs)": (
+            r"\d+\s+(?:reasons|ways|things|tips|secrets|facts|signs)"
+        ),
+    }
+    patterns = [
+        p
+        for p in evidence._CITATION_PATTERNS + evidence._STATS_PATTERNS + claim_volume._LISTICLE_PATTERNS
+        if p.pattern in plain
+    ]
+    assert len(patterns) == len(plain)  # every rewritten pattern is checked
+
+    pieces = ["1", "0", ",", ",000", ".", " ", "%", " of", "people", " patients", "million", " reasons", "x"]
+    # every text of up to four pieces, then long random ones with chains past any cap
+    texts = ["".join(combo) for n in range(1, 5) for combo in itertools.product(pieces, repeat=n)]
+    rng = random.Random(7)
+    texts += ["".join(rng.choice(pieces + [",000" * 12, "1" * 9]) for _ in range(rng.randint(5, 30))) for _ in range(3000)]
+    for pattern in patterns:
+        reference = re.compile(plain[pattern.pattern], pattern.flags)
+        for text in texts:
+            assert [m.span() for m in pattern.finditer(text)] == [m.span() for m in reference.finditer(text)], (
+                pattern.pattern,
+                text,
+            )
+
+
+def test_adversarial_inputs_stay_fast():
+    from app.analyzers import _heuristics
+    from app.lexicons.bundle import get_lexicons
+    from scripts.bench_adversarial import adversarial_texts
+
+    lexicons = get_lexicons()
+    for cases in adversarial_texts(20_000, lexicons).values():
+        for case, text in cases.items():
+            start = time.thread_time()
+            _heuristics(text, lexicons)
+            assert time.thread_time() - start < 1.0, case
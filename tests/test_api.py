@@ -1,5 +1,7 @@
+import pytest
 from fastapi.testclient import TestClient
 
+from app.lexicons import get_lexicons
 from app.main import app
 from app.main import _openai_enabled
 
@@ -66,6 +68,7 @@ def test_analyze_embeddings_false_meta():
         "embeddings_used": False,
         "openai_available": _openai_enabled(),
         "vector_backend": "none",
+        "lexicon_version": get_lexicons().version,
     }
 
 
@@ -138,3 +141,411 @@ def test_analyze_batch_invalid_item_text():
 def test_analyze_validation_short():
     r = client.post("/analyze", json={"text": "Too short"})
     assert r.status_code == 422
+
+
+def test_analyze_fast_path_matches_model_dump():
+    from app.analyzers import analyze_text
+
+    text = "You must act now! This is the last chance. Everyone knows they are evil and we must fight back. The truth is simple: they are always wrong and we will never give up. Do not miss out!"
+    r = client.post("/analyze?embeddings=false", json={"text": text})
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/json"
+    assert r.json() == analyze_text(text, ml=False).to_response().model_dump()
+
+
+def test_openapi_keeps_response_models():
+    schema = client.get("/openapi.json").json()
+    single = schema["paths"]["/analyze"]["post"]["responses"]["200"]
+    batch = schema["paths"]["/analyze/batch"]["post"]["responses"]["200"]
+    assert single["content"]["application/json"]["schema"] == {"$ref": "#/components/schemas/AnalyzeResponse"}
+    assert batch["content"]["application/json"]["schema"] == {"$ref": "#/components/schemas/BatchAnalyzeResponse"}
+
+
+_BATCH_BODY = {
+    "items": [
+        {
+            "id": "first",
+            "text": "You must act now! This is the last chance. Everyone knows they are evil and we must fight back. The truth is simple: they are always wrong and we will never give up. Do not miss out!",
+        },
+        {
+            "id": "second",
+            "text": "A new policy brief reviewed three implementation options for transit funding. According to the report, ridership increased by 14 percent in pilot cities, but the authors note cost tradeoffs, timeline risks, and the need for further evaluation before statewide rollout.",
+        },
+    ]
+}
+
+
+def test_analyze_batch_gzip_request_and_response():
+    import gzip
+    import json
+
+    body = gzip.compress(json.dumps(_BATCH_BODY).encode())
+    r = client.post(
+        "/analyze/batch?embeddings=false",
+        content=body,
+        headers={"Content-Type": "application/json", "Content-Encoding": "gzip", "Accept-Encoding": "gzip"},
+    )
+    assert r.status_code == 200
+    assert r.headers["content-encoding"] == "gzip"
+    assert [item["id"] for item in r.json()["items"]] == ["first", "second"]
+
+
+def test_analyze_batch_zstd_request():
+    import json
+
+    zstandard = pytest.importorskip("zstandard")
+    body = zstandard.ZstdCompressor().compress(json.dumps(_BATCH_BODY).encode())
+    r = client.post(
+        "/analyze/batch?embeddings=false",
+        content=body,
+        headers={"Content-Type": "application/json", "Content-Encoding": "zstd"},
+    )
+    assert r.status_code == 200
+    assert len(r.json()["items"]) == 2
+
+
+def test_analyze_batch_gzip_members_and_truncation():
+    import gzip
+    import json
+
+    raw = json.dumps(_BATCH_BODY).encode()
+    body = gzip.compress(raw[:100]) + gzip.compress(raw[100:])
+    headers = {"Content-Type": "application/json", "Content-Encoding": "gzip"}
+    r = client.post("/analyze/batch?embeddings=false", content=body, headers=headers)
+    assert r.status_code == 200
+    assert len(r.json()["items"]) == 2
+    r = client.post("/analyze/batch?embeddings=false", content=body[:-4], headers=headers)
+    assert r.status_code == 400
+    assert "ends mid-stream" in r.json()["detail"]
+
+
+def test_analyze_unsupported_content_encoding():
+    r = client.post(
+        "/analyze",
+        content=b"not really compressed",
+        headers={"Content-Type": "application/json", "Content-Encoding": "br"},
+    )
+    assert r.status_code == 415
+
+
+def test_analyze_batch_columnar_layout():
+    items = client.post("/analyze/batch?embeddings=false", json=_BATCH_BODY).json()["items"]
+    r = client.post("/analyze/batch?embeddings=false&layout=columnar", json=_BATCH_BODY)
+    assert r.status_code == 200
+    data = r.json()
+    assert data["ids"] == ["first", "second"]
+    column = data["data"][data["columns"].index("arousal_intensity.caps_ratio")]
+    assert column == [item["result"]["arousal_intensity"]["breakdown"]["caps_ratio"] for item in items]
+    assert data["data"][data["columns"].index("engagement_bait_score")] == [None, None]
+    assert data["meta"]["vector_backend"] == ["none", "none"]
+
+
+def test_analyze_batch_msgpack():
+    msgpack = pytest.importorskip("msgpack")
+    r = client.post(
+        "/analyze/batch?embeddings=false",
+        json=_BATCH_BODY,
+        headers={"Accept": "application/msgpack"},
+    )
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/msgpack"
+    data = msgpack.unpackb(r.content)
+    assert [item["id"] for item in data["items"]] == ["first", "second"]
+
+
+def test_analyze_batch_vectorized_engine():
+    pytest.importorskip("numpy")
+    python_items = client.post("/analyze/batch?embeddings=false", json=_BATCH_BODY).json()
+    r = client.post("/analyze/batch?embeddings=false&engine=vectorized", json=_BATCH_BODY)
+    assert r.status_code == 200
+    assert r.json() == python_items
+
+
+def test_analyze_local_backend_meta():
+    text = "You must act now! This is the last chance. Everyone knows they are evil and we must fight back. The truth is simple: they are always wrong and we will never give up. Do not miss out!"
+    r = client.post("/analyze?backend=local", json={"text": text})
+    assert r.status_code == 200
+    data = r.json()
+    assert isinstance(data["engagement_bait_score"], float)
+    assert data["meta"]["embeddings_requested"] is True
+    assert data["meta"]["embeddings_used"] is True
+    assert data["meta"]["vector_backend"] == "local"
+
+
+def test_analyze_timeout_ms_validation():
+    text = "A review of three transit funding proposals found ridership increased 12 to 18 percent in pilot cities."
+    assert client.post("/analyze?timeout_ms=0", json={"text": text}).status_code == 422
+    r = client.post("/analyze?embeddings=false&timeout_ms=50", json={"text": text})
+    assert r.status_code == 200
+    assert "deadline_exceeded" not in r.json()["meta"]
+
+
+def test_invalid_default_backend_fails_at_startup(monkeypatch):
+    monkeypatch.setenv("VECTOR_BACKEND", "bogus")
+    with pytest.raises(ValueError, match="VECTOR_BACKEND must be one of local, openai"):
+        with TestClient(app):
+            pass
+
+
+def test_admission_sheds_then_rejects(monkeypatch):
+    from app import admission
+
+    controller = admission.AdmissionController(soft_limit=2, hard_limit=4, retry_after=3)
+    monkeypatch.setattr(admission, "_controller", controller)
+    text = "You must act now! This is the last chance. Everyone knows they are evil and we must fight back."
+
+    with controller.admit(1.5):
+        r = client.post("/analyze?backend=local", json={"text": text})
+        assert r.status_code == 200
+        meta = r.json()["meta"]
+        assert meta["degraded"] is True
+        assert meta["embeddings_used"] is False
+        assert meta["vector_backend"] == "none"
+
+    with controller.admit(3.5):
+        r = client.post("/analyze/batch?embeddings=false", json=_BATCH_BODY)
+        assert r.status_code == 503
+        assert r.headers["retry-after"] == "3"
+        assert r.json() == {"detail": "Server is overloaded, retry later", "field": None}
+
+    # idle again: full service, no degradation flag
+    r = client.post("/analyze?backend=local", json={"text": text})
+    assert r.json()["meta"]["vector_backend"] == "local"
+    assert "degraded" not in r.json()["meta"]
+    assert controller.snapshot()["in_flight"] == 0
+
+
+def test_admission_recovers_after_a_spike():
+    from app import admission
+
+    now = [0.0]
+    controller = admission.AdmissionController(hard_wait_ms=2000, clock=lambda: now[0])
+    weights = [admission.request_weight(["x" * n]) for n in (123, 4567, 891, 50_000, 77)]
+    tickets = [controller.admit(w) for w in weights]
+    for _ in range(20):
+        controller._record_wait(3.0)  # admitted requests queued for seconds
+    with pytest.raises(admission.Overloaded):
+        controller.admit(1)
+    for ticket in reversed(tickets):
+        ticket.__exit__(None, None, None)
+    # the drain leaves exactly nothing in flight, so the next request resets the stale wait
+    assert controller._in_flight == 0
+    with controller.admit(1.3):
+        # and even with work in flight, a stale wait decays instead of rejecting forever
+        for _ in range(20):
+            controller._record_wait(3.0)
+        with pytest.raises(admission.Overloaded):
+            controller.admit(1)
+        now[0] += 10
+        with controller.admit(1):
+            pass
+    assert controller.snapshot()["in_flight"] == 0
+
+
+def test_admission_counts_cancelled_work_until_its_thread_finishes():
+    import asyncio
+    import threading
+
+    from starlette.concurrency import run_in_threadpool
+
+    from app import admission
+
+    controller = admission.AdmissionController()
+    started, finish = threading.Event(), threading.Event()
+
+    def work():
+        started.set()
+        finish.wait(5)
+
+    async def handle():
+        with controller.admit(2) as ticket:
+            await run_in_threadpool(ticket.run, work)
+
+    async def main():
+        task = asyncio.create_task(handle())
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        task.cancel()  # the client went away; the thread keeps going
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert controller.snapshot()["in_flight"] == 2
+        finish.set()
+        for _ in range(100):
+            if controller.snapshot()["in_flight"] == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert controller.snapshot()["in_flight"] == 0
+
+    asyncio.run(main())
+    # a ticket closed before its thread started never runs
+    with controller.admit(1) as ticket:
+        pass
+    with pytest.raises(RuntimeError):
+        ticket.run(work)
+    assert controller.snapshot()["in_flight"] == 0
+
+
+def test_admin_lexicon_reload_requires_token(monkeypatch):
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    assert client.post("/admin/lexicons/reload").status_code == 404
+
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    r = client.post("/admin/lexicons/reload", headers={"X-Admin-Token": "wrong"})
+    assert r.status_code == 401
+    assert r.json()["field"] == "x-admin-token"
+    r = client.post("/admin/lexicons/reload", headers={"X-Admin-Token": "s3cret"})
+    assert r.status_code == 200
+    assert r.json() == {"version": get_lexicons().version, "changed": False}
+    assert client.get("/health").json()["lexicon_version"] == r.json()["version"]
+
+
+def test_admin_profiling_captures_and_serves_profile(monkeypatch, tmp_path):
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+    text = "Act now. This is your last chance. Everyone knows they are lying and you must share this immediately."
+
+    assert client.post("/analyze?embeddings=false", json={"text": text}, headers={"X-Profile": "1"}).status_code == 401
+    assert "profile_id" not in client.post("/analyze?embeddings=false", json={"text": text}).json()["meta"]
+
+    admin = {"X-Admin-Token": "s3cret"}
+    r = client.post("/analyze?embeddings=false", json={"text": text}, headers={**admin, "X-Profile": "1"})
+    profile_id = r.json()["meta"]["profile_id"]
+    assert [p["id"] for p in client.get("/admin/profiles", headers=admin).json()["items"]] == [profile_id]
+    assert b"analyze_text" in client.get(f"/admin/profiles/{profile_id}", headers=admin).content
+    assert "analyze_text" in client.get(f"/admin/profiles/{profile_id}?format=text", headers=admin).text
+    assert client.get("/admin/profiles/..%2Fsecrets", headers=admin).status_code == 404
+
+    monkeypatch.setenv("PROFILE_SAMPLE_RATE", "1")
+    r = client.post("/analyze/batch?embeddings=false", json={"items": [{"id": "a", "text": text}]})
+    assert r.json()["items"][0]["result"]["meta"]["profile_id"] != profile_id
+
+
+def test_ws_analyze_pipelines_and_correlates(monkeypatch):
+    import threading
+    import time
+
+    import app.analyzers
+
+    monkeypatch.setenv("WS_MAX_IN_FLIGHT", "2")
+    real, running, peak = app.analyzers.analyze_text, [0], [0]
+    lock = threading.Lock()
+
+    def slow_analyze_text(text, **kwargs):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return real(text, **kwargs)
+
+    monkeypatch.setattr(app.analyzers, "analyze_text", slow_analyze_text)
+    text = "Act now. This is your last chance. Everyone knows they are lying and you must share this immediately."
+    with client.websocket_connect("/ws/analyze?embeddings=false") as ws:
+        for i in range(5):
+            ws.send_json({"id": i, "text": text})
+        ws.send_json({"id": "short", "text": "too short"})
+        ws.send_text("not json")
+        replies = [ws.receive_json() for _ in range(7)]
+
+    by_id = {reply["id"]: reply for reply in replies}
+    assert set(by_id) == {0, 1, 2, 3, 4, "short", None}
+    expected = client.post("/analyze?embeddings=false", json={"text": text}).json()
+    assert all(by_id[i]["result"] == expected for i in range(5))
+    assert by_id["short"]["error"] == {"detail": "Text must be at least 50 characters (got 9)", "field": "text"}
+    assert by_id[None]["error"]["detail"] == "Message is not valid JSON"
+    assert peak[0] == 2  # pipelined, but never past WS_MAX_IN_FLIGHT
+
+
+def test_ws_analyze_logs_unexpected_errors(monkeypatch, caplog):
+    import app.analyzers
+
+    def broken(text, **kwargs):
+        raise RuntimeError("analyzer blew up")
+
+    monkeypatch.setattr(app.analyzers, "analyze_text", broken)
+    text = "Act now. This is your last chance. Everyone knows they are lying and you must share this immediately."
+    with caplog.at_level("ERROR", logger="app.ws"), client.websocket_connect("/ws/analyze?embeddings=false") as ws:
+        ws.send_json({"id": "x", "text": text})
+        reply = ws.receive_json()
+    assert reply["error"]["detail"] == "Internal Server Error"
+    assert "analyzer blew up" in caplog.text
+
+
+def test_tracing_spans_cover_request_and_analyzers(monkeypatch):
+    pytest.importorskip("opentelemetry.sdk")
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    from app import tracing
+    from app.ml.scorer import forget_centroids
+
+    text = "Act now. This is your last chance. Everyone knows they are lying and you must share this immediately."
+    assert tracing.span("disabled") is tracing.span("also disabled")  # one shared no-op when off
+
+    exporter = InMemorySpanExporter()
+    tracing.install(exporter, processor=SimpleSpanProcessor)
+    try:
+        forget_centroids("local")
+        traced = TestClient(tracing.TracingMiddleware(app))
+        assert traced.post("/analyze?backend=local&timeout_ms=5000", json={"text": text}).status_code == 200
+    finally:
+        tracing.shutdown()
+
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    request = spans["POST /analyze"]
+    assert request.attributes["http.response.status_code"] == 200
+    assert spans["analyze"].attributes["text.length"] == len(text)
+    assert spans["analyze"].attributes["vector.backend"] == "local"
+    for name in ("preprocess", "heuristics", "embeddings", "centroids.init", "analyzer.urgency_pressure", "analyzer.lexical_diversity"):
+        assert spans[name].context.trace_id == request.context.trace_id
+    # the embedding ran on the worker pool and still joined the request's trace
+    assert spans["centroids.init"].parent is not None
+    assert not tracing.enabled()
+
+
+def test_analyze_stops_at_the_cpu_budget(monkeypatch, tmp_path):
+    monkeypatch.setenv("ANALYSIS_CPU_BUDGET_MS", "1")
+    text = " ".join(f"act now {i} while supplies last, the truth is out" for i in range(1000))
+    r = client.post("/analyze?embeddings=false", json={"text": text})
+    assert r.status_code == 422
+    assert r.json() == {
+        "detail": "Analysis exceeded its CPU budget of 1 ms; the text is too expensive to analyze",
+        "field": "text",
+    }
+
+    # a profiled request that runs out of budget still leaves its profile
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+    admin = {"X-Admin-Token": "s3cret"}
+    r = client.post("/analyze?embeddings=false", json={"text": text}, headers={**admin, "X-Profile": "1"})
+    assert r.status_code == 422
+    assert "analyze_text" in client.get(f"/admin/profiles/{r.json()['profile_id']}?format=text", headers=admin).text
+
+    monkeypatch.setenv("ANALYSIS_CPU_BUDGET_MS", "0")
+    assert client.post("/analyze?embeddings=false", json={"text": text}).status_code == 200
+
+
+def test_centroid_feedback_endpoint(tmp_path, monkeypatch):
+    from app.ml import centroids, scorer
+
+    monkeypatch.setenv("ADMIN_TOKEN", "s3cret")
+    monkeypatch.setenv("CENTROID_DB", str(tmp_path / "centroids.sqlite3"))
+    monkeypatch.setattr(centroids, "_store", None)
+    for name in ("_centroids", "_centroid_versions", "_checked_at", "_centroid_arrays"):
+        monkeypatch.setattr(scorer, name, {})
+    headers = {"X-Admin-Token": "s3cret"}
+    items = [{"text": "Act now or regret it forever: they don't want you to know this one secret!!", "label": "bait"}]
+
+    assert client.post("/admin/centroids/feedback?backend=local", json={"items": items}).status_code == 401
+    r = client.post("/admin/centroids/feedback?backend=local", json={"items": items}, headers=headers)
+    assert r.status_code == 200
+    assert r.json()["version"] == 2 and r.json()["added"] == 1
+
+    listing = client.get("/admin/centroids?backend=local", headers=headers).json()
+    assert (listing["current"], listing["in_use"]) == (2, 2)
+    assert [v["source"] for v in listing["versions"]] == ["feedback", "seeds"]
+
+    r = client.post("/admin/centroids/rollback?backend=local", headers=headers)
+    assert r.json()["version"] == 1
+    r = client.post("/admin/centroids/rollback?backend=local", headers=headers)
+    assert r.status_code == 404 and r.json()["field"] == "version"
@@ -0,0 +1,162 @@
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import jobs
+from app.analyzers import analyze_batch
+from app.main import app
+
+client = TestClient(app)
+
+_TEXTS = [
+    "Act now. This is your last chance. Everyone knows they are lying and you must share this immediately.",
+    "A review of three transit funding proposals found ridership increased 12 to 18 percent in pilot cities.",
+    "You won't believe what happened next! The shocking truth they don't want you to know is finally out.",
+]
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    (tmp_path / "inputs").mkdir()
+    m = jobs.JobManager(tmp_path / "jobs", tmp_path / "inputs", workers=1, batch_size=2)
+    monkeypatch.setattr(jobs, "_manager", m)
+    yield m
+    m.stop(timeout=5)
+
+
+def _wait_done(job_id: str) -> dict:
+    for _ in range(200):
+        status = client.get(f"/jobs/{job_id}").json()
+        if status["status"] in ("done", "failed"):
+            return status
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish: {status}")
+
+
+def test_job_upload_scores_with_batch_path(manager):
+    lines = [json.dumps({"id": f"t{i}", "text": text}) for i, text in enumerate(_TEXTS)]
+    lines.insert(1, json.dumps({"id": "short", "text": "too short"}))
+    body = "\n".join(lines) + "\n"
+    r = client.post("/jobs?embeddings=false", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert r.status_code == 202
+    job_id = r.json()["id"]
+
+    status = _wait_done(job_id)
+    assert status["status"] == "done"
+    assert (status["processed"], status["total"], status["errors"]) == (4, 4, 1)
+    assert status["expires_at"] > status["finished_at"]
+
+    expected = [result.to_payload() for result in analyze_batch(_TEXTS, ml=False, engine="vectorized")]
+    first = client.get(f"/jobs/{job_id}/results?limit=3").json()
+    assert first["next_offset"] == 3
+    rest = client.get(f"/jobs/{job_id}/results?offset=3&limit=3").json()
+    assert rest["next_offset"] is None
+    items = first["items"] + rest["items"]
+    assert [item["id"] for item in items] == ["t0", "short", "t1", "t2"]
+    assert items[1]["error"].startswith("Text must be at least 50 characters")
+    assert [items[0]["result"], items[2]["result"], items[3]["result"]] == expected
+
+    streamed = client.get(f"/jobs/{job_id}/results", headers={"Accept": "application/x-ndjson"})
+    assert [json.loads(line) for line in streamed.text.splitlines()] == items
+
+
+def test_job_upload_is_decoded_as_it_streams(manager, monkeypatch):
+    import gzip
+
+    from app import compression
+
+    # the job upload limit applies to the decoded body, not MAX_DECOMPRESSED_BYTES
+    monkeypatch.setattr(compression, "MAX_DECOMPRESSED_BYTES", 100)
+    body = "".join(json.dumps({"id": f"t{i}", "text": text}) + "\n" for i, text in enumerate(_TEXTS))
+    headers = {"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"}
+    r = client.post("/jobs?embeddings=false", content=gzip.compress(body.encode()), headers=headers)
+    assert r.status_code == 202
+    assert _wait_done(r.json()["id"])["processed"] == 3
+
+    monkeypatch.setattr(manager, "max_upload_bytes", 1000)
+    uploads = set((manager.root / "uploads").iterdir())
+    r = client.post("/jobs", content=gzip.compress(b"\n" * 5000), headers=headers)
+    assert r.status_code == 413
+    assert set((manager.root / "uploads").iterdir()) == uploads
+
+
+def test_job_from_shared_path(manager, tmp_path):
+    (tmp_path / "inputs" / "archive.jsonl").write_text(json.dumps({"text": _TEXTS[0]}) + "\n", encoding="utf-8")
+    r = client.post("/jobs?embeddings=false", json={"path": "archive.jsonl"})
+    assert r.status_code == 202
+    assert _wait_done(r.json()["id"])["processed"] == 1
+
+    r = client.post("/jobs", json={"path": "../jobs/jobs.sqlite3"})
+    assert r.status_code == 400
+    assert r.json() == {"detail": "Path must be inside JOBS_INPUT_DIR", "field": "path"}
+    assert client.post("/jobs", json={"path": "missing.jsonl"}).status_code == 404
+    assert client.get("/jobs/nope").status_code == 404
+
+
+def test_jobs_resume_after_restart_and_expire(tmp_path):
+    root = tmp_path / "jobs"
+    first = jobs.JobManager(root, workers=0)
+    source = tmp_path / "archive.jsonl"
+    source.write_text("".join(json.dumps({"text": t}) + "\n" for t in _TEXTS), encoding="utf-8")
+    job_id = first._insert("resumed", source, True, {"ml": False})["id"]
+    # a previous process was killed mid-job
+    first._db.execute("UPDATE jobs SET status = 'running' WHERE id = ?", (job_id,))
+
+    second = jobs.JobManager(root, workers=1, batch_size=2, ttl=60)
+    second.start()
+    for _ in range(200):
+        if second.get(job_id)["status"] == "done":
+            break
+        time.sleep(0.02)
+    second.stop(timeout=5)
+    assert second.get(job_id)["processed"] == 3
+    assert len(second.results_page(job_id, 0, 10)) == 3
+
+    assert second.expire(now=time.time() + 3600) == 1
+    assert second.get(job_id) is None
+    assert not source.exists()
+
+
+def test_parquet_scoring_writes_flat_columns_in_input_order(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    from app import arrow_io
+    from app.analyzers.result import COLUMNS
+
+    texts = _TEXTS + ["too short", None] + _TEXTS
+    table = pa.table({"body": pa.array(texts, pa.large_string()), "post_id": [f"p{i}" for i in range(len(texts))]})
+    pq.write_table(table, tmp_path / "in.parquet")
+
+    rows = arrow_io.score_file(
+        tmp_path / "in.parquet", tmp_path / "out.parquet", "body", "post_id", batch_size=3, workers=0
+    )
+    out = pq.read_table(tmp_path / "out.parquet")
+
+    assert rows == len(texts) and out.num_rows == len(texts)
+    assert out.column_names == ["post_id", "error"] + list(COLUMNS)
+    assert out.column("post_id").to_pylist() == table.column("post_id").to_pylist()
+    errors = out.column("error").to_pylist()
+    assert errors[3].startswith("Text must be at least") and errors[4] == "Missing text"
+    expected = analyze_batch(_TEXTS + _TEXTS)
+    scored = [i for i, error in enumerate(errors) if error is None]
+    for i, result in zip(scored, expected):
+        row = result.to_row()
+        assert [out.column(c)[i].as_py() for c in COLUMNS[:-1]] == list(row[:-1])
+        assert out.column("engagement_bait_score")[i].as_py() is None
+    assert out.column("urgency_pressure.score")[4].as_py() is None
+
+
+def test_parquet_chunks_pickle_only_their_own_rows():
+    pa = pytest.importorskip("pyarrow")
+    import pickle
+
+    from app import arrow_io
+
+    texts = pa.array(["x" * 1000] * 10_000)
+    chunks = list(arrow_io.split_chunks(texts.slice(0)))
+
+    assert [len(c) for c in chunks] == [arrow_io.CHUNK_ROWS] * 39 + [10_000 - 39 * arrow_io.CHUNK_ROWS]
+    assert chunks[3].to_pylist() == texts.slice(3 * arrow_io.CHUNK_ROWS, arrow_io.CHUNK_ROWS).to_pylist()
+    assert len(pickle.dumps(chunks[3])) < 2 * arrow_io.CHUNK_ROWS * 1000
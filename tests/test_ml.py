@@ -0,0 +1,527 @@
+import json
+from collections import OrderedDict
+from pathlib import Path
+
+import pytest
+
+from app.lexicons import get_lexicons
+from app.ml.backends import get_backend
+from app.ml.local import HashingVectorizer, get_vectorizer
+from app.ml.scorer import compute_engagement_bait_result
+
+_BENCHMARK = json.loads(
+    (Path(__file__).resolve().parent.parent / "data" / "ml_benchmark_examples.json").read_text(encoding="utf-8")
+)
+
+
+def test_local_vectorizer_is_normalized_and_deterministic():
+    v = get_vectorizer()
+    a = v.transform("Act now before it is too late!")
+    b = v.transform("Act now before it is too late!")
+    assert a == b
+    assert len(a) == v.dim
+    assert abs(sum(x * x for x in a) - 1.0) < 1e-9
+
+
+def test_local_vectorizer_roundtrip():
+    v = HashingVectorizer.fit(["one two three", "three four five"], dim=64)
+    restored = HashingVectorizer.from_dict(v.to_dict())
+    assert restored.dim == 64
+    assert restored.transform("two three") == pytest.approx(v.transform("two three"), abs=1e-6)
+
+
+def test_local_backend_separates_bait_from_neutral():
+    scores = {"bait": [], "neutral": []}
+    for ex in _BENCHMARK:
+        score, backend = compute_engagement_bait_result(ex["text"], "local")
+        assert backend == "local"
+        if ex["label"] in scores:
+            scores[ex["label"]].append(score)
+    assert min(scores["bait"]) > max(scores["neutral"])
+
+
+def test_recorded_backend_replays_fixture(tmp_path, monkeypatch):
+    from app.ml import backends
+    from app.ml.recorded import RecordedBackend, write_fixture
+
+    seeds = json.loads((Path(__file__).resolve().parent.parent / "data" / "seed_examples.json").read_text("utf-8"))
+    texts = [ex["text"] for ex in seeds] + [ex["text"] for ex in _BENCHMARK]
+    local = get_backend("local")
+    fixture = tmp_path / "fixture.bin"
+    assert write_fixture(fixture, texts, local.embed_many, "local-ngrams") == len(set(texts))
+
+    monkeypatch.setattr(backends, "_BACKENDS", dict(backends._BACKENDS))
+    recorded = RecordedBackend(fixture, meta_name="local")
+    backends.register_backend(recorded)
+    for ex in _BENCHMARK:
+        score, name = compute_engagement_bait_result(ex["text"], "recorded")
+        assert name == "local"
+        # float16 storage: scores agree to within rounding
+        assert score == pytest.approx(compute_engagement_bait_result(ex["text"], "local")[0], abs=2e-3)
+    assert recorded.misses == 0
+    assert recorded.embed("never recorded") is None
+
+
+def test_unknown_backend_rejected():
+    with pytest.raises(ValueError):
+        get_backend("nope")
+
+
+class _FakeEmbeddings:
+    def __init__(self, dim: int = 8):
+        self.dim = dim
+        self.delay = 0.0
+        self.calls: list[dict] = []
+
+    def create(self, model, input, **kwargs):
+        import time
+        from types import SimpleNamespace
+
+        time.sleep(self.delay)
+        self.calls.append({"model": model, "input": input, **kwargs})
+        inputs = input if isinstance(input, list) else [input]
+        dim = kwargs.get("dimensions") or self.dim
+        data = []
+        for i, text in enumerate(inputs):
+            seed = sum(map(ord, text)) or 1
+            data.append(SimpleNamespace(index=i, embedding=[((seed * (j + 3)) % 97) / 97 - 0.5 for j in range(dim)]))
+        return SimpleNamespace(data=data)
+
+    @property
+    def with_raw_response(self):
+        from types import SimpleNamespace
+
+        def create(**kwargs):
+            return SimpleNamespace(headers={}, parse=lambda: self.create(**kwargs))
+
+        return SimpleNamespace(create=create)
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    from types import SimpleNamespace
+
+    from app.ml import embeddings
+
+    fake = _FakeEmbeddings()
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(embeddings, "_get_client", lambda: SimpleNamespace(embeddings=fake))
+    monkeypatch.setattr(embeddings, "_cache", OrderedDict())
+    monkeypatch.setattr(embeddings, "_batcher", None)
+    return fake
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_vector_store_roundtrip(tmp_path, dtype):
+    np = pytest.importorskip("numpy")
+    from app.ml.store import VectorStore, store_key
+
+    store = VectorStore(tmp_path / "vectors.bin", dim=4, dtype=dtype, capacity=8)
+    key = store_key("hello", "m", None)
+    assert store.get(key) is None
+    store.put(key, [0.5, -0.25, 0.125, 1.0])
+    # a second handle on the same file (another worker) sees the write
+    other = VectorStore(tmp_path / "vectors.bin", dim=4, dtype=dtype, capacity=8)
+    assert other.get(key) == pytest.approx([0.5, -0.25, 0.125, 1.0], abs=0.01)
+    assert len(other) == 1
+    values, _scale = other.find(key)
+    assert values.dtype == (np.float16 if dtype == "float16" else np.int8)
+
+
+def test_vector_store_readers_skip_a_slot_being_rewritten(tmp_path):
+    pytest.importorskip("numpy")
+    from app.ml.store import VectorStore, store_key
+
+    path = tmp_path / "vectors.bin"
+    path.write_bytes(b"an older layout")
+    store = VectorStore(path, dim=4, capacity=8)
+    assert not path.with_suffix(".bin.tmp").exists()
+    key = store_key("hello", "m", None)
+    store.put(key, [0.5, -0.25, 0.125, 1.0])
+    slot = next(s for s in range(8) if store._keys[s].any())
+    store._seqs[slot] += 1  # a writer in another process is mid-rewrite
+    assert store.find(key) is None
+    store._seqs[slot] += 1
+    assert store.get(key) == pytest.approx([0.5, -0.25, 0.125, 1.0], abs=0.01)
+
+
+def test_get_embedding_uses_store_and_dimensions(tmp_path, monkeypatch, fake_openai):
+    pytest.importorskip("numpy")
+    from app.ml import store
+    from app.ml.embeddings import get_embedding
+
+    monkeypatch.setenv("EMBEDDING_STORE_PATH", str(tmp_path / "vectors.bin"))
+    monkeypatch.setenv("EMBEDDING_DIMENSIONS", "16")
+    monkeypatch.setattr(store, "_store", None)
+
+    first = get_embedding("some text to embed")
+    second = get_embedding("some text to embed")
+    assert len(first) == 16
+    assert fake_openai.calls[0]["dimensions"] == 16
+    assert len(fake_openai.calls) == 1
+    assert second == pytest.approx(first, abs=0.01)
+
+
+def test_scores_use_the_full_precision_cache_before_the_store(tmp_path, monkeypatch, fake_openai):
+    pytest.importorskip("numpy")
+    from app.ml import embeddings, scorer, store
+
+    monkeypatch.setenv("EMBEDDING_STORE_PATH", str(tmp_path / "vectors.bin"))
+    monkeypatch.setenv("EMBEDDING_DIMENSIONS", "16")
+    monkeypatch.setattr(store, "_store", None)
+    monkeypatch.setitem(scorer._centroids, "openai", ([0.5] * 16, [-0.5] * 16))
+    text = "Act now. This is your last chance to share this with everyone you know."
+
+    first = scorer.compute_engagement_bait_results([text], "openai")
+    assert embeddings.lookup_quantized(text) is None  # still in the in-process cache
+    assert scorer.compute_engagement_bait_results([text], "openai") == first
+    embeddings._cache.clear()
+    assert embeddings.lookup_quantized(text) is not None
+
+
+def test_deadline_falls_back_to_heuristics_and_fills_cache(monkeypatch, fake_openai):
+    import time
+
+    from app.analyzers import analyze_text
+    from app.ml import embeddings, scorer
+
+    monkeypatch.setitem(scorer._centroids, "openai", ([0.5] * 8, [-0.5] * 8))
+    text = "Act now. This is your last chance. Everyone knows they are lying and you must share this immediately."
+    fake_openai.delay = 0.5
+
+    slow = analyze_text(text, ml=True, backend="openai", timeout_ms=20)
+    assert slow.engagement_bait_score is None
+    assert slow.meta.to_dict() == {
+        "embeddings_requested": True,
+        "embeddings_used": False,
+        "openai_available": True,
+        "vector_backend": "none",
+        "lexicon_version": get_lexicons().version,
+        "deadline_exceeded": True,
+    }
+
+    # the embedding keeps running and lands in the cache for the next request
+    for _ in range(100):
+        if embeddings.cached_embedding(text) is not None:
+            break
+        time.sleep(0.02)
+    assert embeddings.cached_embedding(text) is not None
+
+    fast = analyze_text(text, ml=True, backend="openai", timeout_ms=20)
+    assert isinstance(fast.engagement_bait_score, float)
+    assert fast.meta.vector_backend == "centroid"
+    assert fast.meta.deadline_exceeded is False
+    assert len(fake_openai.calls) == 1
+
+
+def test_batch_embeds_in_one_request_with_identical_scores(monkeypatch, fake_openai):
+    from app.analyzers import analyze_batch, analyze_text
+    from app.ml import scorer
+
+    monkeypatch.setitem(scorer._centroids, "openai", ([0.5] * 8, [-0.5] * 8))
+    texts = [ex["text"] for ex in _BENCHMARK[:5]]
+    batch = analyze_batch(texts, ml=True, backend="openai")
+    assert len(fake_openai.calls) == 1
+    assert fake_openai.calls[0]["input"] == texts
+
+    single = [analyze_text(text, ml=True, backend="openai") for text in texts]
+    assert len(fake_openai.calls) == 1  # served from the in-process cache
+    assert [r.to_payload() for r in batch] == [r.to_payload() for r in single]
+    assert all(r.meta.vector_backend == "centroid" for r in batch)
+
+
+def test_long_texts_are_chunked_and_pooled_in_one_request(monkeypatch, fake_openai):
+    from app.analyzers import analyze_batch
+    from app.ml import chunking, scorer
+
+    monkeypatch.setitem(scorer._centroids, "openai", ([0.5] * 8, [-0.5] * 8))
+    monkeypatch.setattr(chunking, "_encoding_loaded", True)  # byte fallback, tiktoken or not
+    monkeypatch.setattr(chunking, "_encoding", None)
+    monkeypatch.setenv("EMBEDDING_CHUNK_TOKENS", "150")
+    monkeypatch.setenv("EMBEDDING_MAX_CHUNKS", "3")
+    short = "Short enough for one input, though longer than fifty characters."
+    long = " ".join(f"word{i}" for i in range(40))  # 269 bytes: 2 chunks of <= 150
+    longer = " ".join(f"term{i}" for i in range(100))  # past 3 chunks, so the tail is dropped
+
+    results = analyze_batch([short, long, longer], ml=True, backend="openai")
+    assert len(fake_openai.calls) == 1
+    sent = fake_openai.calls[0]["input"]
+    assert len(sent) == 1 + 2 + 3 and all(len(text) <= 150 for text in sent)
+    assert [(r.meta.embedding_chunks, r.meta.embedding_truncation) for r in results] == [
+        (1, "none"), (2, "none"), (3, "head")
+    ]
+
+    plan = chunking.split(long)
+    assert "".join(plan.texts) == long
+    parts = [fake_openai.create("m", list(plan.texts)).data[i].embedding for i in range(2)]
+    total = sum(plan.weights)
+    mean = [sum(w / total * p[j] for w, p in zip(plan.weights, parts)) for j in range(8)]
+    norm = sum(x * x for x in mean) ** 0.5
+    from app.ml.embeddings import cached_embedding
+
+    assert cached_embedding(long) == pytest.approx([x / norm for x in mean])
+
+    # dense punctuation and CJK still fit: every token covers at least one byte
+    for text in ("1,000,000% " * 20, "点击这里马上就能看到结果" * 10):
+        plan = chunking.split(text)
+        assert "".join(plan.texts) == text
+        assert all(len(piece.encode()) <= 150 for piece in plan.texts)
+
+
+def test_micro_batcher_coalesces_concurrent_callers(monkeypatch, fake_openai):
+    import threading
+
+    from app.ml.embeddings import get_embedding
+
+    monkeypatch.setenv("EMBEDDING_BATCH_WINDOW_MS", "100")
+    texts = [f"concurrent caller number {i}" for i in range(8)]
+    results: dict[str, list[float]] = {}
+    start = threading.Barrier(len(texts))
+
+    def call(text):
+        start.wait()
+        results[text] = get_embedding(text)
+
+    threads = [threading.Thread(target=call, args=(text,)) for text in texts]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(fake_openai.calls) < len(texts)
+    expected = _FakeEmbeddings().create("m", texts).data
+    assert [results[text] for text in texts] == [item.embedding for item in expected]
+
+
+def test_micro_batcher_fails_only_the_bad_input(monkeypatch, fake_openai):
+    import httpx
+    import openai
+
+    from app.ml import embeddings
+
+    create = fake_openai.create
+
+    def picky_create(model, input, **kwargs):
+        if any("poison" in text for text in input):
+            request = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+            raise openai.BadRequestError("too long", response=httpx.Response(400, request=request), body=None)
+        return create(model, input, **kwargs)
+
+    monkeypatch.setattr(fake_openai, "create", picky_create)
+    monkeypatch.setenv("EMBEDDING_BATCH_WINDOW_MS", "200")
+    texts = [f"innocent caller number {i}" for i in range(6)] + ["poison pill"]
+    futures = [embeddings._get_batcher().submit(embeddings.embedding_key(t), t) for t in texts]
+
+    expected = _FakeEmbeddings().create("m", texts[:-1]).data
+    assert [f.result(timeout=5) for f in futures[:-1]] == [item.embedding for item in expected]
+    with pytest.raises(openai.BadRequestError):
+        futures[-1].result(timeout=5)
+
+
+def test_micro_batcher_survives_an_unexpected_error(monkeypatch, fake_openai):
+    from app.ml import embeddings
+
+    monkeypatch.setenv("EMBEDDING_BATCH_WINDOW_MS", "50")
+    batcher = embeddings._get_batcher()
+    estimate = embeddings.estimate_tokens
+    monkeypatch.setattr(embeddings, "estimate_tokens", lambda text: 1 // 0 if text == "boom" else estimate(text))
+
+    failed = batcher.submit(embeddings.embedding_key("boom"), "boom")
+    with pytest.raises(ZeroDivisionError):
+        failed.result(timeout=5)
+    # the batcher thread is still serving
+    text = "a text queued after the failure"
+    assert batcher.submit(embeddings.embedding_key(text), text).result(timeout=5) is not None
+
+
+def test_embedding_attempts_are_traced_and_linked_to_callers(monkeypatch, fake_openai):
+    pytest.importorskip("opentelemetry.sdk")
+    import httpx
+    import openai
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    from app import tracing
+    from app.ml import embeddings
+
+    from types import SimpleNamespace
+
+    raw = _FakeEmbeddings.with_raw_response.fget
+    failures = [openai.APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/embeddings"))]
+
+    def flaky_create(self, **kwargs):
+        if failures:
+            raise failures.pop()
+        return raw(self).create(**kwargs)
+
+    monkeypatch.setattr(
+        _FakeEmbeddings, "with_raw_response", property(lambda self: SimpleNamespace(create=lambda **kw: flaky_create(self, **kw)))
+    )
+    monkeypatch.setattr(embeddings.time, "sleep", lambda seconds: None)
+    exporter = InMemorySpanExporter()
+    tracing.install(exporter, processor=SimpleSpanProcessor)
+    try:
+        with tracing.span("request") as request:
+            assert embeddings.get_embeddings(["first traced text", "second traced text"])[0] is not None
+    finally:
+        tracing.shutdown()
+
+    spans = exporter.get_finished_spans()
+    attempts = sorted((s for s in spans if s.name == "embeddings.create"), key=lambda s: s.attributes["embeddings.attempt"])
+    assert [s.attributes["embeddings.attempt"] for s in attempts] == [1, 2]
+    assert attempts[0].attributes["error.type"] == "APIConnectionError"
+    assert "error.type" not in attempts[1].attributes
+    # the batched call runs on the batcher's thread, linked back to the request that queued it
+    batch = next(s for s in spans if s.name == "embeddings.batch")
+    assert {link.context.span_id for link in batch.links} == {request.get_span_context().span_id}
+    assert attempts[0].parent.span_id == batch.context.span_id
+    lookup = next(s for s in spans if s.name == "cache.lookup")
+    assert lookup.attributes["cache.hits"] == 0
+
+
+def test_token_bucket_follows_rate_limit_headers():
+    from app.ml.embeddings import TokenBucket, _parse_duration
+
+    now = [0.0]
+    bucket = TokenBucket(clock=lambda: now[0])
+    assert bucket.delay() == 0  # unlimited until the API reports limits
+    bucket.update({"x-ratelimit-limit-requests": "60", "x-ratelimit-remaining-requests": "0"})
+    assert bucket.delay() == pytest.approx(1.0)
+    now[0] += 1.0
+    assert bucket.delay() == 0
+    bucket.back_off(5)
+    assert bucket.delay() == pytest.approx(5.0)
+    assert _parse_duration("6m0s") == 360
+    assert _parse_duration("20ms") == pytest.approx(0.02)
+
+
+def test_rate_limiter_is_charged_real_tokens_not_the_byte_bound(monkeypatch):
+    from types import SimpleNamespace
+
+    from app.ml import chunking, embeddings
+
+    monkeypatch.setattr(chunking, "_encoding_loaded", True)  # no tiktoken
+    monkeypatch.setattr(chunking, "_encoding", None)
+    monkeypatch.setattr(embeddings, "_tokens_per_byte", 0.25)
+    texts = ["An ordinary English sentence about the weather today." * 20]
+    size = chunking.estimate_tokens(texts[0])
+    assert embeddings._pacing_tokens(texts) <= size / 4 + 1
+    # the API reports what the inputs really cost, and pacing follows it
+    for _ in range(50):
+        embeddings._calibrate(texts, SimpleNamespace(prompt_tokens=size // 5))
+    assert embeddings._pacing_tokens(texts) == pytest.approx(size / 5, rel=0.01)
+    embeddings._calibrate(texts, None)  # responses without usage change nothing
+    assert embeddings._pacing_tokens(texts) == pytest.approx(size / 5, rel=0.01)
+
+
+def test_near_duplicate_reuses_score_and_metrics(monkeypatch, fake_openai):
+    pytest.importorskip("numpy")
+    from app import neardup
+    from app.analyzers import analyze_batch, analyze_text
+    from app.ml import scorer
+
+    monkeypatch.setitem(scorer._centroids, "openai", ([0.5] * 8, [-0.5] * 8))
+    monkeypatch.setenv("NEARDUP_THRESHOLD", "0.8")
+    monkeypatch.setattr(neardup, "_index", None)
+    base = (
+        "BREAKING: They don't want you to know this. Share before it gets deleted! Everyone is "
+        "talking about the shocking truth the media is hiding from you right now."
+    )
+    original = analyze_text(base, ml=True, backend="openai")
+    assert "near_duplicate_reuse" not in original.meta.to_dict()
+
+    repost, unrelated = analyze_batch(
+        [base + " #wakeup", _BENCHMARK[0]["text"]], ml=True, backend="openai"
+    )
+    assert repost.engagement_bait_score == original.engagement_bait_score
+    assert repost.meta.near_duplicate_reuse == "score"
+    assert repost.meta.near_duplicate_similarity >= 0.8
+    assert repost.meta.vector_backend == "centroid"
+    assert unrelated.meta.near_duplicate_reuse is None
+    # only the base text and the unrelated text were embedded
+    assert [call["input"] for call in fake_openai.calls] == [[base], [_BENCHMARK[0]["text"]]]
+
+    monkeypatch.setenv("NEARDUP_REUSE", "all")
+    edited = analyze_text("🔥 " + base, ml=False)
+    assert edited.meta.near_duplicate_reuse == "metrics"
+    assert edited.to_row()[:-1] == original.to_row()[:-1]
+
+    # after a centroid feedback commit, scores from the old centroids are not reused
+    monkeypatch.setitem(scorer._centroid_versions, "openai", None)
+    scorer.use_centroids("openai", ([0.25] * 8, [-0.5] * 8), 2)
+    rescored = analyze_text(base + " #truth", ml=True, backend="openai")
+    assert rescored.meta.near_duplicate_reuse == "metrics"
+    assert rescored.engagement_bait_score != original.engagement_bait_score
+    again = analyze_text(base + " #truth!", ml=True, backend="openai")
+    assert again.meta.near_duplicate_reuse == "all"
+    assert again.engagement_bait_score == rescored.engagement_bait_score
+
+
+@pytest.fixture
+def centroid_db(tmp_path, monkeypatch):
+    from app.ml import centroids, scorer
+
+    monkeypatch.setenv("CENTROID_DB", str(tmp_path / "centroids.sqlite3"))
+    monkeypatch.setenv("CENTROID_REFRESH_SECONDS", "0")
+    monkeypatch.setattr(centroids, "_store", None)
+    for name in ("_centroids", "_centroid_versions", "_checked_at", "_centroid_arrays"):
+        monkeypatch.setattr(scorer, name, {})
+    return tmp_path / "centroids.sqlite3"
+
+
+def test_feedback_folds_only_new_texts_into_versioned_centroids(centroid_db, monkeypatch):
+    from app.ml import centroids, scorer
+
+    local = get_backend("local")
+    embedded: list[str] = []
+    monkeypatch.setattr(local, "embed_many", lambda texts: embedded.extend(texts) or [local.embed(t) for t in texts])
+    bait = "Share this before they delete it: the shocking truth the elites are hiding from you!"
+    neutral = [f"Item {i}: the council met on Tuesday and published the budget minutes online." for i in range(3)]
+    before, _ = compute_engagement_bait_result(bait, "local")
+    seeds = scorer.seed_examples()
+
+    embedded.clear()
+    r = centroids.add_feedback([(bait, "bait")] + [(t, "neutral") for t in neutral], "local")
+    assert (r["version"], r["added"], r["source"]) == (2, 4, "feedback")
+    counts = (r["bait_count"], r["neutral_count"])
+    assert len(embedded) == len(seeds) + 4  # the seeds once, to store version 1
+    assert scorer.centroid_version("local") == 2
+    assert compute_engagement_bait_result(bait, "local")[0] > before
+
+    # the running means equal the means over seeds plus feedback
+    labeled = seeds + [(bait, "bait")] + [(t, "neutral") for t in neutral]
+    expected = scorer._mean_embedding([local.embed(t) for t, label in labeled if label == "bait"])
+    assert centroids.load_current("local").bait == pytest.approx(expected, abs=1e-12)
+
+    embedded.clear()
+    r = centroids.add_feedback([(bait, "neutral"), (neutral[0], "neutral")], "local")
+    assert (r["version"], r["moved"], r["skipped"]) == (3, 1, 1)
+    assert embedded == [bait]
+    assert (r["bait_count"], r["neutral_count"]) == (counts[0] - 1, counts[1] + 1)
+
+    state = centroids.rollback("local")
+    assert state.version == 2 and scorer.centroid_version("local") == 2
+    assert [v["version"] for v in centroids.get_store().versions("local")] == [2, 1]
+    # the discarded relabel can be applied again, under a number never used before
+    r = centroids.add_feedback([(bait, "neutral")], "local")
+    assert (r["version"], r["moved"]) == (4, 1)
+    assert scorer.centroid_version("local") == 4
+    assert centroids.rollback("local").version == 2
+    assert [v["version"] for v in centroids.get_store().versions("local")] == [2, 1]
+
+
+def test_scorers_pick_up_versions_committed_elsewhere(centroid_db):
+    from app.ml import centroids, scorer
+
+    text = "Share this before they delete it: the shocking truth the elites are hiding from you!"
+    compute_engagement_bait_result(text, "local")
+    assert scorer.centroid_version("local") is None  # seed means
+
+    # another worker process commits a version through its own connection
+    other = centroids.CentroidStore(centroid_db)
+    vector = get_backend("local").embed(text)
+    other.commit("local", None, {"bait": (vector, 1), "neutral": ([-v for v in vector], 1)}, [], "feedback")
+
+    score, _ = compute_engagement_bait_result(text, "local")
+    assert scorer.centroid_version("local") == 1
+    assert score == pytest.approx(1.0)